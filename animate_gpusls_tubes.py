@@ -0,0 +1,161 @@
+import os
+import sys
+import time
+import shutil
+import subprocess
+import numpy as np
+
+import plot_gpusls_trajectories as gp
+from rollout_store import open_rollouts, iter_rollout_chunks
+from rollout_render import (
+    add_rollout_lines,
+    decimate_polylines,
+    finite_lengths,
+    tube_vertices,
+    add_tube_boxes,
+)
+
+# ============================
+# Receding-horizon tube history (every lowers_xy/uppers_xy step)
+# ============================
+# OUT is either a directory (PNG frame sequence) or a video file written by
+# piping raw frames into ffmpeg (.mp4 / .mov / .webm / .gif).
+OUT = os.path.join(gp.SCRIPT_DIR, "tube_steps")
+FPS = 10
+DPI = 150
+VIDEO_EXTS = (".mp4", ".mov", ".webm", ".gif")
+
+
+class FrameSink:
+    def __init__(self, out, size, fps):
+        self.out = out
+        self.count = 0
+        self.proc = None
+        if out.lower().endswith(VIDEO_EXTS):
+            ffmpeg = shutil.which("ffmpeg")
+            if ffmpeg is None:
+                raise RuntimeError(f"ffmpeg not found; cannot write {out} (use a directory for PNG frames)")
+            w, h = size
+            cmd = [
+                ffmpeg, "-y", "-loglevel", "error",
+                "-f", "rawvideo", "-pix_fmt", "rgba", "-s", f"{w}x{h}", "-r", str(fps), "-i", "-",
+                "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+            ]
+            if not out.lower().endswith(".gif"):
+                cmd += ["-pix_fmt", "yuv420p"]
+            self.proc = subprocess.Popen(cmd + [out], stdin=subprocess.PIPE)
+        else:
+            os.makedirs(out, exist_ok=True)
+
+    def write(self, rgba):
+        if self.proc is not None:
+            self.proc.stdin.write(rgba.tobytes())
+        else:
+            import matplotlib.image as mpimg
+
+            # fast zlib level: frames are intermediates for a video encoder
+            path = os.path.join(self.out, f"frame_{self.count:05d}.png")
+            mpimg.imsave(path, rgba, pil_kwargs={"compress_level": 1})
+        self.count += 1
+
+    def close(self):
+        if self.proc is not None:
+            self.proc.stdin.close()
+            if self.proc.wait() != 0:
+                raise RuntimeError(f"ffmpeg failed writing {self.out}")
+
+
+def export_tube_steps(out=OUT, steps=None, fps=FPS, dpi=DPI, show_rollouts=True):
+    if not os.path.exists(gp.NPZ_PATH):
+        raise FileNotFoundError(f"NPZ file not found: {gp.NPZ_PATH}")
+
+    print(f"[Loading] {gp.NPZ_PATH}")
+    npz = open_rollouts(gp.NPZ_PATH)
+    centers = np.asarray(npz["centers"])
+    radii = np.asarray(npz["radii"]).reshape(-1)
+    lowers_xy = np.asarray(npz["lowers_xy"])   # (n_steps, N+1, 2)
+    uppers_xy = np.asarray(npz["uppers_xy"])   # (n_steps, N+1, 2)
+    plans_xy = gp.maybe(npz, "plans_xy", None)
+    if steps is None:
+        steps = range(lowers_xy.shape[0])
+
+    # a bare Agg canvas: no pyplot figure, so the process-wide backend is
+    # left alone when this runs inside another tool
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    gp.apply_style()
+    fig = Figure(figsize=(6.5, 6.5), dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    # --- Static scene, built once ---
+    gp.draw_static(ax, centers, radii)
+    if show_rollouts:
+        for _, xs, _ in iter_rollout_chunks(gp.NPZ_PATH, "xs"):
+            polylines, _, _ = decimate_polylines(ax, xs, finite_lengths(xs), tol_px=gp.DECIMATE_TOL_PX)
+            add_rollout_lines(ax, polylines, color=gp.ROLLOUT_COLOR, linewidth=3.0, alpha=0.40, zorder=2)
+    gp.add_legend(ax)
+
+    # --- Per-step artists (updated in place) ---
+    tubes = add_tube_boxes(ax, np.zeros((0, 4, 2)), facecolor=gp.TUBE_FACE, alpha=gp.TUBE_ALPHA, zorder=1)
+    plan, = ax.plot([], [], color=gp.TUBE_FACE, linewidth=1.5, linestyle="--", zorder=1.5)
+    label = ax.text(0.02, 0.98, "", transform=ax.transAxes, ha="left", va="top", fontsize=14, zorder=9)
+    for a in (tubes, plan, label):
+        a.set_animated(True)
+
+    # Two cached layers: the background (axes, grid, ticks) below the tubes
+    # and a transparent overlay of every static artist stacked above them
+    # (rollouts, obstacles, markers, legend). A frame is background + tubes +
+    # plan + step label, then the overlay alpha-composited on the pixels it
+    # covers.
+    stacked = ax.collections + ax.patches + ax.lines + ax.texts + [ax.get_legend()]
+    overlay = [a for a in stacked if not a.get_animated() and a.get_zorder() > tubes.get_zorder()]
+
+    for a in overlay:
+        a.set_visible(False)
+    canvas.draw()
+    background = canvas.copy_from_bbox(fig.bbox)
+
+    for a in overlay:
+        a.set_visible(True)
+    ax.set_axis_off()
+    fig.patch.set_visible(False)
+    canvas.draw()
+    layer = np.array(canvas.buffer_rgba())
+    ax.set_axis_on()
+    fig.patch.set_visible(True)
+
+    covered = np.flatnonzero(layer[..., 3].reshape(-1))
+    ov_rgb = layer.reshape(-1, 4)[covered, :3].astype(np.uint32)
+    ov_a = layer.reshape(-1, 4)[covered, 3:].astype(np.uint32)
+
+    sink = FrameSink(out, canvas.get_width_height(), fps)
+    t0 = time.perf_counter()
+    try:
+        for k in steps:
+            lo, up = lowers_xy[k], uppers_xy[k]
+            tubes.set_verts(tube_vertices(lo, up, gp.tube_keep(ax, lo, up)))
+            if plans_xy is not None and len(plans_xy):
+                # steps past the last stored plan keep showing that plan
+                p = plans_xy[min(k, len(plans_xy) - 1)]
+                plan.set_data(p[:, 0], p[:, 1])
+            label.set_text(f"step {k}")
+
+            canvas.restore_region(background)
+            ax.draw_artist(tubes)
+            ax.draw_artist(plan)
+            ax.draw_artist(label)
+            frame = np.array(canvas.buffer_rgba())
+            px = frame.reshape(-1, 4)
+            px[covered, :3] = (ov_rgb * ov_a + px[covered, :3] * (255 - ov_a) + 127) // 255
+            sink.write(frame)
+    finally:
+        sink.close()
+
+    dt = time.perf_counter() - t0
+    print(f"[Saved] {sink.count} frames -> {out} ({dt:.2f}s, {sink.count / max(dt, 1e-9):.1f} frames/s)")
+
+
+if __name__ == "__main__":
+    export_tube_steps(sys.argv[1] if len(sys.argv) > 1 else OUT)
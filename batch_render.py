@@ -0,0 +1,296 @@
+import os
+import sys
+import glob
+import html
+import time
+import argparse
+import importlib
+import traceback
+import multiprocessing as mp
+import numpy as np
+
+# ============================
+# Headless batch rendering of many rollout files
+# ============================
+# Renders every scenario NPZ (or rollout_store directory) matched by the
+# given files / directories / globs with the trajectory figure scripts, in
+# one long-lived process per worker:
+#
+#   * the style (fonts, usetex cache) and the scenario-independent artists
+#     (axes, labels, start/goal markers, legend) are set up once per worker,
+#   * each file only adds its own artists (obstacles, tubes, rollouts,
+#     crashes) through the script's draw_scenario(), is saved, and has them
+#     removed again, so the figure is reused for the next file,
+#   * the plot window is fixed, so the tight bounding box of the static
+#     artists is measured once; each file only measures its own unclipped
+#     artists and widens the box where they stick out, instead of a layout
+#     pass per save.
+#
+# Every file gets <out>/<name>.pdf plus a small PNG thumbnail; the thumbnails
+# are tiled into a contact sheet and listed with their outcome counts in
+# <out>/index.html.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+OUT_DIR = os.path.join(SCRIPT_DIR, "batch_figures")
+
+# figure kind -> script module providing draw_frame / draw_scenario / add_legend
+KINDS = {
+    "deepreach": "plot_deepreach_trajectories",
+    "gpusls": "plot_gpusls_trajectories",
+}
+THUMB_DPI = 40
+THUMB_DIR = "thumbs"
+SHEET_COLUMNS = 6
+SHEET_GAP_PX = 8
+CONTACT_SHEET = "contact_sheet.png"
+INDEX_HTML = "index.html"
+# files handed to a worker at a time
+CHUNKSIZE = 4
+
+
+def expand_inputs(patterns):
+    # files, directories (their *.npz and *.store) and globs -> sorted paths
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern) and not pattern.rstrip("/").endswith(".store"):
+            matches = glob.glob(os.path.join(pattern, "*.npz")) + glob.glob(os.path.join(pattern, "*.store"))
+        else:
+            matches = glob.glob(pattern)
+        if not matches:
+            raise FileNotFoundError(f"No rollout files match {pattern!r}")
+        paths += [m.rstrip("/") for m in matches if not m.endswith((".segidx.npz", ".summary.npz"))]
+    return sorted(set(paths))
+
+
+def detect_kind(path):
+    # archives with robust tubes are GPU-SLS scenarios
+    from rollout_store import open_rollouts
+
+    source = open_rollouts(path)
+    try:
+        return "gpusls" if "lowers_xy" in source.files else "deepreach"
+    finally:
+        source.close()
+
+
+def output_names(paths):
+    # file stem, suffixed where two inputs share one
+    names, seen = [], {}
+    for p in paths:
+        stem = os.path.splitext(os.path.basename(p))[0]
+        seen[stem] = seen.get(stem, 0) + 1
+        names.append(stem if seen[stem] == 1 else f"{stem}_{seen[stem]}")
+    return names
+
+
+# ------------------------------------------------------------
+# Worker side: one reusable figure per figure kind
+# ------------------------------------------------------------
+_worker = {"figures": {}}
+
+
+def init_worker(out_dir, render_mode, thumbs):
+    os.environ["MPLBACKEND"] = "Agg"
+    sys.path.insert(0, SCRIPT_DIR)
+
+    import matplotlib
+    matplotlib.use("Agg")
+
+    _worker.update(out_dir=out_dir, render_mode=render_mode, thumbs=thumbs)
+
+
+def _figure(kind):
+    if kind not in _worker["figures"]:
+        import matplotlib.pyplot as plt
+
+        module = importlib.import_module(KINDS[kind])
+        module.apply_style()
+        fig, ax = plt.subplots(figsize=(6.5, 6.5))
+        module.draw_frame(ax)
+        module.add_legend(ax)
+        _worker["figures"][kind] = {"module": module, "fig": fig, "ax": ax,
+                                    "bbox": tight_bbox(fig), "view": ax.viewLim.frozen()}
+    return _worker["figures"][kind]
+
+
+def tight_bbox(fig, artists=None):
+    # Unpadded tight box in inches, as savefig(..., bbox_inches="tight")
+    # measures it, at the PDF's 72 dpi. artists=None lays out and measures the
+    # whole figure; otherwise only those artists are measured (no draw).
+    from matplotlib.transforms import Bbox
+
+    dpi = fig.dpi
+    fig.dpi = 72
+    try:
+        renderer = fig.canvas.get_renderer()
+        if artists is None:
+            fig.draw(renderer)
+            return fig.get_tightbbox(renderer).frozen()
+        boxes = [a.get_tightbbox(renderer) for a in artists]
+        boxes = [b for b in boxes if b is not None and 0 < b.width < np.inf and 0 < b.height < np.inf]
+        return Bbox.union(boxes).transformed(fig.dpi_scale_trans.inverted().frozen()) if boxes else None
+    finally:
+        fig.dpi = dpi
+
+
+def scenario_bbox(f, static):
+    # Padded tight box for the current file: the static box widened by the
+    # file's artists that are not clipped to the axes (the same selection
+    # Axes.get_tightbbox makes), or a full measurement if the view moved
+    import matplotlib.pyplot as plt
+    from matplotlib.transforms import Bbox
+
+    fig, ax = f["fig"], f["ax"]
+    if ax.viewLim.frozen().get_points().tolist() != f["view"].get_points().tolist():
+        bbox = tight_bbox(fig)
+    else:
+        added = [a for a in ax.get_default_bbox_extra_artists() if a not in static]
+        extra = tight_bbox(fig, added) if added else None
+        bbox = f["bbox"] if extra is None else Bbox.union([f["bbox"], extra])
+    return bbox.padded(plt.rcParams["savefig.pad_inches"])
+
+
+def render_one(job):
+    path, name, kind = job
+    t0 = time.perf_counter()
+    result = {"path": path, "name": name, "kind": kind, "pdf": None, "thumb": None, "error": None}
+    try:
+        f = _figure(kind)
+        fig, ax = f["fig"], f["ax"]
+        static = set(ax.get_children())
+        try:
+            stats = f["module"].draw_scenario(ax, path, _worker["render_mode"] or f["module"].RENDER_MODE)
+            bbox = scenario_bbox(f, static)
+
+            pdf = os.path.join(_worker["out_dir"], name + ".pdf")
+            fig.savefig(pdf, bbox_inches=bbox)
+            result["pdf"] = pdf
+            if _worker["thumbs"]:
+                thumb = os.path.join(_worker["out_dir"], THUMB_DIR, name + ".png")
+                fig.savefig(thumb, dpi=THUMB_DPI, bbox_inches=bbox)
+                result["thumb"] = thumb
+        finally:
+            # back to the scenario-independent figure for the next file
+            for a in ax.get_children():
+                if a not in static:
+                    a.remove()
+        result["rollouts"] = int(stats["rollouts"])
+        result["outcomes"] = [int(c) for c in stats["outcomes"]]
+    except Exception:
+        result["error"] = traceback.format_exc()
+    result["wall_s"] = time.perf_counter() - t0
+    return result
+
+
+# ------------------------------------------------------------
+# Contact sheet + index
+# ------------------------------------------------------------
+def write_contact_sheet(results, out_dir, columns=SHEET_COLUMNS, gap=SHEET_GAP_PX):
+    import matplotlib.image as mpimg
+
+    thumbs = [mpimg.imread(r["thumb"])[..., :3] for r in results if r["thumb"]]
+    if not thumbs:
+        return None
+    h = max(t.shape[0] for t in thumbs)
+    w = max(t.shape[1] for t in thumbs)
+    columns = min(columns, len(thumbs))
+    rows = -(-len(thumbs) // columns)
+    sheet = np.ones((rows * (h + gap) + gap, columns * (w + gap) + gap, 3), dtype=np.float32)
+    for i, t in enumerate(thumbs):
+        y = gap + (i // columns) * (h + gap)
+        x = gap + (i % columns) * (w + gap)
+        sheet[y:y + t.shape[0], x:x + t.shape[1]] = t
+    out = os.path.join(out_dir, CONTACT_SHEET)
+    mpimg.imsave(out, sheet)
+    return out
+
+
+def write_index(results, out_dir):
+    from rollout_outcomes import LABEL_NAMES
+
+    def rel(p):
+        return html.escape(os.path.relpath(p, out_dir))
+
+    header = "".join(f"<th>{name}</th>" for name in LABEL_NAMES.values())
+    rows = []
+    for r in results:
+        if r["error"] is not None:
+            rows.append(f"<tr><td></td><td>{html.escape(r['path'])}</td><td colspan='{len(LABEL_NAMES) + 2}'>"
+                        f"<pre>{html.escape(r['error'].strip().splitlines()[-1])}</pre></td></tr>")
+            continue
+        img = f"<a href='{rel(r['pdf'])}'><img src='{rel(r['thumb'])}'></a>" if r["thumb"] else ""
+        counts = "".join(f"<td>{c}</td>" for c in r["outcomes"])
+        rows.append(f"<tr><td>{img}</td><td><a href='{rel(r['pdf'])}'>{html.escape(r['name'])}</a><br>"
+                    f"<small>{html.escape(r['path'])}</small></td><td>{r['rollouts']}</td>{counts}"
+                    f"<td>{r['wall_s']:.2f}</td></tr>")
+
+    out = os.path.join(out_dir, INDEX_HTML)
+    with open(out, "w") as f:
+        f.write("<!DOCTYPE html>\n<html><head><meta charset='utf-8'><title>Rollout scenarios</title>\n"
+                "<style>body{font-family:sans-serif} table{border-collapse:collapse} "
+                "td,th{border:1px solid #ccc;padding:4px;text-align:right} td:nth-child(2){text-align:left}"
+                "</style></head><body>\n")
+        if os.path.exists(os.path.join(out_dir, CONTACT_SHEET)):
+            f.write(f"<p><a href='{CONTACT_SHEET}'>contact sheet</a></p>\n")
+        f.write(f"<table>\n<tr><th></th><th>scenario</th><th>rollouts</th>{header}<th>render [s]</th></tr>\n")
+        f.write("\n".join(rows))
+        f.write("\n</table>\n</body></html>\n")
+    return out
+
+
+def render_batch(inputs, out_dir=OUT_DIR, kind=None, workers=None, render_mode=None, thumbs=True):
+    # kind=None detects it per file; render_mode=None keeps each script's default
+    paths = expand_inputs(inputs)
+    names = output_names(paths)
+    kinds = [kind or detect_kind(p) for p in paths]
+    jobs = list(zip(paths, names, kinds))
+    os.makedirs(os.path.join(out_dir, THUMB_DIR) if thumbs else out_dir, exist_ok=True)
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+    print(f"[Batch] {len(jobs)} files on {workers} workers -> {out_dir}")
+    t0 = time.perf_counter()
+    results = []
+    if workers == 1:
+        # no pool: the calling process renders (and keeps its figures)
+        init_worker(out_dir, render_mode, thumbs)
+        stream = map(render_one, jobs)
+    else:
+        ctx = mp.get_context("spawn")
+        pool = ctx.Pool(processes=workers, initializer=init_worker, initargs=(out_dir, render_mode, thumbs))
+        stream = pool.imap_unordered(render_one, jobs, chunksize=CHUNKSIZE)
+    try:
+        for r in stream:
+            results.append(r)
+            if r["error"] is None:
+                print(f"[Rendered] {r['name']}: {r['rollouts']} rollouts ({r['wall_s']:.2f}s)")
+            else:
+                print(f"[FAILED] {r['path']}\n{r['error']}")
+    finally:
+        if workers > 1:
+            pool.close()
+            pool.join()
+    total = time.perf_counter() - t0
+
+    results.sort(key=lambda r: paths.index(r["path"]))
+    sheet = write_contact_sheet(results, out_dir) if thumbs else None
+    index = write_index(results, out_dir)
+    ok = [r for r in results if r["error"] is None]
+    print(f"[Batch] {len(ok)}/{len(results)} rendered in {total:.2f}s "
+          f"({total / max(len(results), 1):.3f}s per file, serial sum {sum(r['wall_s'] for r in results):.2f}s)")
+    if sheet:
+        print(f"[Saved] {sheet}")
+    print(f"[Saved] {index}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render many rollout files with the trajectory figure scripts.")
+    parser.add_argument("inputs", nargs="+", help="NPZ files, rollout stores, directories or globs")
+    parser.add_argument("--out", default=OUT_DIR)
+    parser.add_argument("--kind", choices=sorted(KINDS), help="figure script (default: detected per file)")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--mode", choices=("batched", "density"), help="render_mode of the figure scripts")
+    parser.add_argument("--no-thumbs", action="store_true", help="skip thumbnails and the contact sheet")
+    args = parser.parse_args()
+
+    results = render_batch(args.inputs, args.out, args.kind, args.workers, args.mode, not args.no_thumbs)
+    sys.exit(1 if any(r["error"] for r in results) else 0)
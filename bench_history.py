@@ -0,0 +1,287 @@
+import os
+import sys
+import json
+import math
+import sqlite3
+import hashlib
+import argparse
+import datetime
+import itertools
+import subprocess
+import numpy as np
+
+# ============================
+# Append-only solver timing history
+# ============================
+# Every solver_bench.py report is appended to one SQLite file as a run
+# (timestamp, machine fingerprint, git commit) plus one row per
+# (solver, horizon, n_vars) cell with its raw samples. Nothing is updated or
+# deleted, so any two runs can be compared later and the spread over all runs
+# can be drawn as history bands on the scaling chart.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_PATH = os.path.join(SCRIPT_DIR, "solver_history.sqlite")
+
+# A cell is a regression when the new samples are slower with one-sided
+# Mann-Whitney p < ALPHA *and* the median grew by more than MIN_SLOWDOWN.
+# Cells with too few samples for the exact test to ever reach ALPHA (3 vs 3
+# at 0.05) are reported as "insufficient" rather than "ok".
+ALPHA = 0.05
+MIN_SLOWDOWN = 1.05
+# Exact U distribution up to this many rank assignments, normal approx above
+EXACT_MAX_COMBINATIONS = 20000
+BAND_PERCENTILES = (10, 50, 90)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created TEXT NOT NULL,
+    machine TEXT NOT NULL,
+    machine_info TEXT NOT NULL,
+    git_commit TEXT NOT NULL,
+    config TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cells (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    solver TEXT NOT NULL,
+    horizon INTEGER NOT NULL,
+    n_vars INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    median_ms REAL,
+    iqr_ms REAL,
+    samples_ms TEXT
+);
+CREATE INDEX IF NOT EXISTS cells_key ON cells(solver, horizon, n_vars, run_id);
+CREATE INDEX IF NOT EXISTS runs_machine ON runs(machine, git_commit);
+"""
+
+
+def connect(path=HISTORY_PATH):
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    return db
+
+
+def machine_fingerprint(info):
+    # Stable across runs on one box; python/numpy versions are deliberately
+    # left out so an upgrade shows up as a comparison, not a new machine.
+    key = json.dumps({k: info.get(k) for k in ("hostname", "platform", "processor", "cpu_count")}, sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()[:12]
+
+
+def git_commit(cwd=SCRIPT_DIR):
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short=12", "HEAD"], cwd=cwd,
+                             capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=cwd,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return sha + ("-dirty" if dirty else "")
+
+
+def ingest(report, db, commit=None):
+    # -> run id of the appended run
+    info = report.get("machine", {})
+    config = {k: report.get(k) for k in ("warmup", "repeats", "timeout_s", "horizons", "n_vars")}
+    cur = db.execute(
+        "INSERT INTO runs (created, machine, machine_info, git_commit, config) VALUES (?, ?, ?, ?, ?)",
+        (report.get("created") or datetime.datetime.now().isoformat(timespec="seconds"),
+         machine_fingerprint(info), json.dumps(info), commit or git_commit(), json.dumps(config)),
+    )
+    run_id = cur.lastrowid
+    db.executemany(
+        "INSERT INTO cells VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [(run_id, r["solver"], r["horizon"], r["n_vars"], r["status"], r["median_ms"], r["iqr_ms"],
+          None if r.get("samples_ms") is None else json.dumps(r["samples_ms"]))
+         for r in report["results"]],
+    )
+    db.commit()
+    return run_id
+
+
+def list_runs(db, machine=None):
+    sql = "SELECT id, created, machine, git_commit FROM runs"
+    args = ()
+    if machine:
+        sql += " WHERE machine = ?"
+        args = (machine,)
+    return db.execute(sql + " ORDER BY id", args).fetchall()
+
+
+def run_cells(db, run_id):
+    # -> {(solver, horizon, n_vars): (status, samples array or None)}
+    rows = db.execute(
+        "SELECT solver, horizon, n_vars, status, samples_ms FROM cells WHERE run_id = ?", (run_id,)
+    )
+    return {
+        (s, h, n): (status, None if samples is None else np.array(json.loads(samples), dtype=float))
+        for s, h, n, status, samples in rows
+    }
+
+
+# ------------------------------------------------------------
+# Mann-Whitney U (one-sided: is `new` stochastically larger than `base`?)
+# ------------------------------------------------------------
+def _ranks(x):
+    # average ranks (1-based) with ties
+    order = np.argsort(x, kind="mergesort")
+    sx = x[order]
+    ranks = np.empty(len(x))
+    ranks[order] = np.arange(1, len(x) + 1)
+    _, first, counts = np.unique(sx, return_index=True, return_counts=True)
+    for f, c in zip(first, counts):
+        if c > 1:
+            ranks[order[f:f + c]] = f + (c + 1) / 2
+    return ranks, counts
+
+
+def mann_whitney_greater(base, new):
+    # -> (U of new, p-value for H1: new > base)
+    base = np.asarray(base, dtype=float)
+    new = np.asarray(new, dtype=float)
+    n1, n2 = len(base), len(new)
+    if n1 == 0 or n2 == 0:
+        return float("nan"), float("nan")
+    ranks, tie_counts = _ranks(np.concatenate([base, new]))
+    u = ranks[n1:].sum() - n2 * (n2 + 1) / 2
+
+    if math.comb(n1 + n2, n2) <= EXACT_MAX_COMBINATIONS:
+        # exact permutation distribution of the rank sum (handles ties)
+        hits = count = 0
+        observed = ranks[n1:].sum()
+        for idx in itertools.combinations(range(n1 + n2), n2):
+            count += 1
+            if ranks[list(idx)].sum() >= observed - 1e-9:
+                hits += 1
+        return float(u), hits / count
+
+    mu = n1 * n2 / 2
+    n = n1 + n2
+    tie_term = ((tie_counts ** 3 - tie_counts).sum()) / (n * (n - 1))
+    sigma = math.sqrt(n1 * n2 / 12 * ((n + 1) - tie_term))
+    if sigma == 0:
+        return float(u), 1.0
+    z = (u - mu - 0.5) / sigma   # continuity correction
+    return float(u), 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def min_p_value(n1, n2):
+    # smallest p the exact test can return for these sample sizes (all of
+    # one side ranked above the other); 1/20 at 3 vs 3
+    return 1 / math.comb(n1 + n2, n1) if n1 and n2 else 1.0
+
+
+def compare(db, base_run, new_run, alpha=ALPHA, min_slowdown=MIN_SLOWDOWN):
+    # -> list of dicts, one per cell present in both runs, with a verdict of
+    # "regression", "improvement", "new-timeout", "new-error", "recovered", "ok" or
+    # "insufficient" (too few samples for any p < alpha)
+    base, new = run_cells(db, base_run), run_cells(db, new_run)
+    out = []
+    for key in sorted(set(base) & set(new)):
+        (bs, bx), (ns, nx) = base[key], new[key]
+        row = {"solver": key[0], "horizon": key[1], "n_vars": key[2],
+               "base_ms": float("nan"), "new_ms": float("nan"), "ratio": float("nan"), "p": float("nan")}
+        if bs == "ok" and ns != "ok":
+            # skipped cells were cut after a shorter horizon timed out
+            row["verdict"] = "new-timeout" if ns in ("timeout", "skipped") else "new-error"
+        elif bs != "ok" and ns == "ok":
+            row["verdict"] = "recovered"
+        elif bs == "ok" and ns == "ok":
+            row["base_ms"], row["new_ms"] = float(np.median(bx)), float(np.median(nx))
+            row["ratio"] = row["new_ms"] / row["base_ms"]
+            _, p_slow = mann_whitney_greater(bx, nx)
+            _, p_fast = mann_whitney_greater(nx, bx)
+            row["p"] = p_slow
+            if min_p_value(len(bx), len(nx)) >= alpha:
+                row["verdict"] = "insufficient"
+            elif p_slow < alpha and row["ratio"] > min_slowdown:
+                row["verdict"] = "regression"
+            elif p_fast < alpha and row["ratio"] < 1 / min_slowdown:
+                row["verdict"] = "improvement"
+                row["p"] = p_fast
+            else:
+                row["verdict"] = "ok"
+        else:
+            continue
+        out.append(row)
+    return out
+
+
+# ------------------------------------------------------------
+# History bands for time_comparisons.py
+# ------------------------------------------------------------
+def history_bands(db, n_vars=None, machine=None, percentiles=BAND_PERCENTILES):
+    # -> {solver: (horizon array, (P, H) percentile array of per-run medians)}
+    sql = ("SELECT c.solver, c.horizon, c.median_ms FROM cells c JOIN runs r ON r.id = c.run_id "
+           "WHERE c.status = 'ok' AND c.n_vars = ?")
+    if n_vars is None:
+        n_vars = db.execute("SELECT MAX(n_vars) FROM cells").fetchone()[0]
+    args = [n_vars]
+    if machine:
+        sql += " AND r.machine = ?"
+        args.append(machine)
+    per = {}
+    for solver, h, med in db.execute(sql, args):
+        per.setdefault(solver, {}).setdefault(h, []).append(med)
+    bands = {}
+    for solver, by_h in per.items():
+        hs = np.array(sorted(by_h))
+        bands[solver] = (hs, np.array([np.percentile(by_h[h], percentiles) for h in hs]).T)
+    return bands
+
+
+def _default_pair(db, machine):
+    runs = list_runs(db, machine)
+    if len(runs) < 2:
+        raise SystemExit(f"need two runs to compare, history has {len(runs)}")
+    return runs[-2][0], runs[-1][0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solver timing history and regression check.")
+    parser.add_argument("--db", default=HISTORY_PATH)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("ingest", help="append a solver_bench.py report")
+    p.add_argument("timings", nargs="?", default=os.path.join(SCRIPT_DIR, "solver_timings.json"))
+    p.add_argument("--commit", default=None)
+    p = sub.add_parser("runs", help="list stored runs")
+    p.add_argument("--machine", default=None)
+    p = sub.add_parser("compare", help="flag slowdowns between two runs (default: last two on this machine)")
+    p.add_argument("base", nargs="?", type=int)
+    p.add_argument("new", nargs="?", type=int)
+    p.add_argument("--alpha", type=float, default=ALPHA)
+    p.add_argument("--min-slowdown", type=float, default=MIN_SLOWDOWN)
+    args = parser.parse_args()
+
+    db = connect(args.db)
+    if args.cmd == "ingest":
+        with open(args.timings) as f:
+            run_id = ingest(json.load(f), db, args.commit)
+        print(f"[History] run {run_id} appended to {args.db}")
+
+    elif args.cmd == "runs":
+        for run_id, created, machine, commit in list_runs(db, args.machine):
+            print(f"{run_id:>5}  {created}  machine={machine}  commit={commit}")
+
+    else:
+        if args.base is None or args.new is None:
+            from solver_bench import machine_info
+            base_run, new_run = _default_pair(db, machine_fingerprint(machine_info()))
+        else:
+            base_run, new_run = args.base, args.new
+        rows = compare(db, base_run, new_run, args.alpha, args.min_slowdown)
+        flagged = [r for r in rows if r["verdict"] in ("regression", "new-timeout", "new-error")]
+        unknown = [r for r in rows if r["verdict"] == "insufficient"]
+        print(f"[Compare] run {base_run} -> run {new_run}: {len(rows)} cells, {len(flagged)} flagged")
+        for r in rows:
+            if r["verdict"] in ("ok", "insufficient"):
+                continue
+            print(f"  {r['verdict']:<12} {r['solver']:<24} n_vars={r['n_vars']:<4} horizon={r['horizon']:<5} "
+                  f"{r['base_ms']:10.3f} -> {r['new_ms']:10.3f} ms  x{r['ratio']:.2f}  p={r['p']:.3g}")
+        if unknown:
+            # e.g. --repeats 3 on both sides: p >= 1/20 whatever the timings
+            need = next(n for n in itertools.count(1) if min_p_value(n, n) < args.alpha)
+            print(f"[Compare] {len(unknown)} cells have too few samples to reach p < {args.alpha:g} "
+                  f"and were not checked; re-run solver_bench.py with --repeats {need} or more")
+        # 2: nothing flagged, but not everything could be checked
+        sys.exit(1 if flagged else 2 if unknown else 0)
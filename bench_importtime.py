@@ -0,0 +1,80 @@
+import os
+import sys
+import subprocess
+
+# ============================
+# Cold-start import-time report
+# ============================
+# Runs `python -X importtime -c "import <module>"` in a fresh interpreter per
+# module (best of REPEATS) and parses the per-module timings that CPython
+# writes to stderr:
+#
+#   import time: self [us] | cumulative | imported package
+#   import time:       512 |       1024 |   numpy
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+MODULES = [
+    "time_comparisons",
+    "decision_variable_scalings",
+    "plot_min_distance",
+    "plot_deepreach_trajectories",
+    "plot_gpusls_trajectories",
+]
+# reference points for what a deferred import saves
+BASELINES = ["numpy", "matplotlib.pyplot"]
+REPEATS = 3
+TOP = 5
+
+
+def parse_importtime(stderr):
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cum_us), depth))
+    return rows
+
+
+def import_profile(module):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SCRIPT_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr.strip().splitlines()[-1]}")
+    return parse_importtime(proc.stderr)
+
+
+def measure(module, repeats=REPEATS):
+    # Total = sum of self times (the cumulative column of nested entries
+    # would double count). Keeps the fastest run to reduce OS noise.
+    best = None
+    for _ in range(repeats):
+        rows = import_profile(module)
+        total = sum(r[1] for r in rows)
+        if best is None or total < best[0]:
+            best = (total, rows)
+    total, rows = best
+    top_level = sorted((r for r in rows if r[3] == 1), key=lambda r: -r[2])[:TOP]
+    return total, top_level
+
+
+def main(modules=None):
+    modules = modules or BASELINES + MODULES
+    width = max(len(m) for m in modules)
+    print(f"{'module':<{width}}  {'import [ms]':>11}  heaviest top-level imports (cumulative ms)")
+    for m in modules:
+        try:
+            total, top = measure(m)
+        except RuntimeError as e:
+            print(f"{m:<{width}}  {'error':>11}  {e}")
+            continue
+        heavy = ", ".join(f"{name} {cum / 1000:.1f}" for name, _, cum, _ in top)
+        print(f"{m:<{width}}  {total / 1000:>11.1f}  {heavy}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or None)
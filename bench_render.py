@@ -0,0 +1,489 @@
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import importlib
+import tempfile
+import multiprocessing as mp
+import numpy as np
+
+# ============================
+# Trajectory figure rendering benchmark
+# ============================
+# Synthetic rollout files are generated in the exact layouts the trajectory
+# scripts read, over a grid of N (rollouts), T (steps) and K (obstacles):
+#
+#   deepreach  paths (N, T, 3) float32 NaN-padded, lengths, statuses,
+#              goal_point, obs_center, obs_radius, dt (one obstacle: the
+#              layout has no room for more, so only K=1 cells exist)
+#   gpusls     xs / disturbed (N, T, 3) NaN-padded, stop_steps, x_goal,
+#              goal_tol, plans_xy / lowers_xy / uppers_xy (1, T+1, 2),
+#              centers / radii / obstacles for K obstacles, scalars
+#
+# Rollouts drive from the start box towards the goal with a per-rollout
+# heading bias and a random walk, steer away from nearby obstacles, stop on
+# arrival and are truncated at their first collision, so outcome mixes and
+# path shapes resemble the real data.
+# Files are written once per (kind, N, T, K, seed) under bench_data/.
+#
+# Every (plotting path, cell) is timed in its own process like solver_bench:
+# the script's draw_frame / draw_scenario / add_legend / savefig run WARMUP +
+# REPEATS times on a fresh figure, and the instrument.py phases give the
+# per-stage samples
+#
+#   load      archive metadata + streamed chunk reads
+#   classify  outcome labelling
+#   render    obstacles, tubes, rollouts, crash markers, legend
+#   save      fig.savefig to PDF
+#
+# The report (render_timings.json) is plotted as scaling curves over N x T,
+# and --baseline compares it with an earlier report from the same machine,
+# cell by cell and stage by stage (bench_history's Mann-Whitney test), so a
+# new render mode can be checked against the one it replaces (--against).
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(SCRIPT_DIR, "bench_data")
+TIMINGS_PATH = os.path.join(SCRIPT_DIR, "render_timings.json")
+SCALING_PDF = os.path.join(SCRIPT_DIR, "render_scaling.pdf")
+
+# plotting path -> (figure kind, render_mode); kinds as in batch_render.KINDS
+PATHS = {
+    "deepreach/batched": ("deepreach", "batched"),
+    "deepreach/density": ("deepreach", "density"),
+    "deepreach/per_rollout": ("deepreach", "per_rollout"),
+    "gpusls/batched": ("gpusls", "batched"),
+    "gpusls/density": ("gpusls", "density"),
+}
+N_GRID = [30, 300, 3000]
+T_GRID = [110, 440]
+K_GRID = [1, 8]
+WARMUP = 1
+REPEATS = 5
+TIMEOUT_S = 300.0
+SEED = 0
+STAGES = ("load", "classify", "render", "save", "total")
+# instrument phases summed into each stage
+STAGE_PHASES = {
+    "load": ("load",),
+    "classify": ("classify",),
+    "render": ("decorations", "tubes", "rollouts", "crashes", "legend"),
+    "save": ("savefig",),
+}
+
+# Scene geometry of the checked-in archives
+START_XY = (-0.75, -0.75)
+START_HALF_EXTENT = 0.05
+HORIZON_S = 11.0
+SPEED = 0.28
+HEADING_BIAS = 0.35       # rad, std of the per-rollout heading offset
+HEADING_NOISE = 0.6       # rad / sqrt(s), heading random walk
+TURN_GAIN = 1.5           # 1/s, steering back towards the goal
+AVOID_GAIN = 1.2          # weight of the push away from an obstacle at contact
+AVOID_RANGE = 0.1         # m, decay length of that push
+SCENES = {
+    "deepreach": {"goal": (1.0, 0.4), "goal_tol": 0.05},
+    "gpusls": {"goal": (1.0, 0.6), "goal_tol": 0.2},
+}
+OBSTACLE_RADIUS = 0.3
+TUBE_WIDTH = (0.02, 0.12)
+
+
+# ------------------------------------------------------------
+# Synthetic data
+# ------------------------------------------------------------
+def make_obstacles(K, rng, goal):
+    # K=1 is the checked-in scene (one 0.3 m obstacle at the origin); more
+    # obstacles are scattered over the plot window, clear of start and goal
+    if K == 1:
+        return np.zeros((1, 2)), np.array([OBSTACLE_RADIUS])
+    centers, radii = [], []
+    while len(centers) < K:
+        c = rng.uniform((-0.7, -0.9), (1.1, 0.5))
+        r = OBSTACLE_RADIUS / np.sqrt(K) * rng.uniform(0.6, 1.2)
+        if min(np.hypot(*(c - START_XY)), np.hypot(*(c - goal))) > r + 0.15:
+            centers.append(c)
+            radii.append(r)
+    return np.array(centers), np.array(radii)
+
+
+def simulate(N, T, goal, goal_tol, centers, radii, rng):
+    # -> (xs (N, T, 3) with NaN after arrival, lengths (N,), dt); rollouts
+    # steer towards the goal and away from nearby obstacles, imperfectly
+    dt = HORIZON_S / T
+    goal = np.asarray(goal, dtype=float)
+    p = np.asarray(START_XY) + rng.uniform(-START_HALF_EXTENT, START_HALF_EXTENT, (N, 2))
+    bias = rng.normal(0.0, HEADING_BIAS, N)
+    theta = np.arctan2(goal[1] - p[:, 1], goal[0] - p[:, 0]) + bias
+    xs = np.full((N, T, 3), np.nan)
+    lengths = np.full(N, T, dtype=np.int32)
+    running = np.ones(N, dtype=bool)
+    for t in range(T):
+        xs[running, t, :2] = p[running]
+        xs[running, t, 2] = theta[running]
+        arrived = running & (np.hypot(*(p - goal).T) < goal_tol)
+        lengths[arrived] = t + 1
+        running &= ~arrived
+        if not running.any():
+            break
+        to_goal = np.arctan2(goal[1] - p[:, 1], goal[0] - p[:, 0]) + bias
+        away = p[:, None] - centers                                   # (N, K, 2)
+        dist = np.hypot(away[..., 0], away[..., 1])
+        push = (AVOID_GAIN * np.exp(-(dist - radii) / AVOID_RANGE) / np.maximum(dist, 1e-9))[..., None] * away
+        wanted = np.stack([np.cos(to_goal), np.sin(to_goal)], axis=1) + push.sum(axis=1)
+        err = (np.arctan2(wanted[:, 1], wanted[:, 0]) - theta + np.pi) % (2 * np.pi) - np.pi
+        theta = theta + TURN_GAIN * err * dt + rng.normal(0.0, HEADING_NOISE * np.sqrt(dt), N)
+        p = p + SPEED * dt * np.stack([np.cos(theta), np.sin(theta)], axis=1)
+    return xs, lengths, dt
+
+
+def truncate_at_collision(xs, lengths, centers, radii):
+    # rollouts stop at their first obstacle contact, like the recorded ones
+    from rollout_outcomes import COLLIDED, classify
+
+    labels, index = classify(xs, lengths, centers, radii)
+    hit = labels == COLLIDED
+    lengths = np.where(hit, index + 1, lengths).astype(np.int32)
+    xs[np.arange(xs.shape[1]) >= lengths[:, None]] = np.nan
+    return xs, lengths, hit
+
+
+def deepreach_archive(N, T, rng):
+    scene = SCENES["deepreach"]
+    centers, radii = make_obstacles(1, rng, scene["goal"])
+    xs, lengths, dt = simulate(N, T, scene["goal"], scene["goal_tol"], centers, radii, rng)
+    xs, lengths, hit = truncate_at_collision(xs, lengths, centers, radii)
+    arrived = np.hypot(*(xs[np.arange(N), lengths - 1, :2] - scene["goal"]).T) < scene["goal_tol"]
+    statuses = np.where(hit, "COLLISION", np.where(arrived, "SUCCESS", "TIMEOUT")).astype(object)
+    return {
+        "paths": xs.astype(np.float32),
+        "lengths": lengths,
+        "statuses": statuses,
+        "goal_point": np.array(scene["goal"], dtype=float),
+        "obs_center": centers[0],
+        "obs_radius": np.float64(radii[0]),
+        "dt": np.float64(dt),
+    }
+
+
+def gpusls_archive(N, T, K, rng, seed=SEED):
+    scene = SCENES["gpusls"]
+    centers, radii = make_obstacles(K, rng, scene["goal"])
+    xs, lengths, dt = simulate(N, T, scene["goal"], scene["goal_tol"], centers, radii, rng)
+    xs, lengths, _ = truncate_at_collision(xs, lengths, centers, radii)
+    disturbed = xs + rng.normal(0.0, 0.002, xs.shape)
+
+    # nominal plan start -> goal with a tube widening along the horizon
+    s = np.linspace(0.0, 1.0, T + 1)[:, None]
+    plan = (1 - s) * np.asarray(START_XY) + s * np.asarray(scene["goal"])
+    width = TUBE_WIDTH[0] + (TUBE_WIDTH[1] - TUBE_WIDTH[0]) * s
+    return {
+        "xs": xs,
+        "disturbed": disturbed,
+        "stop_steps": lengths,
+        "goal_tol": np.float64(scene["goal_tol"]),
+        "x_goal": np.array([*scene["goal"], 0.0]),
+        "plans_xy": plan[None],
+        "lowers_xy": (plan - width)[None],
+        "uppers_xy": (plan + width)[None],
+        "centers": centers,
+        "radii": radii,
+        "obstacles": np.column_stack([centers, radii]),
+        "dt": np.float64(dt),
+        "N": np.int64(T),
+        "T_steps": np.int64(T),
+        "V_CONST": np.float64(SPEED),
+        "E_mag": np.float64(0.0),
+        "alpha_sim": np.float64(1.0),
+        "num_random": np.int64(N),
+        "num_adv": np.int64(0),
+        "seed": np.int64(seed),
+    }
+
+
+def data_path(kind, N, T, K, seed=SEED, data_dir=DATA_DIR):
+    return os.path.join(data_dir, f"{kind}_N{N}_T{T}_K{K}_seed{seed}.npz")
+
+
+def ensure_data(kind, N, T, K, seed=SEED, data_dir=DATA_DIR):
+    # -> path of the synthetic archive, generated on first use
+    path = data_path(kind, N, T, K, seed, data_dir)
+    if os.path.exists(path):
+        return path
+    os.makedirs(data_dir, exist_ok=True)
+    rng = np.random.default_rng([seed, N, T, K])
+    members = deepreach_archive(N, T, rng) if kind == "deepreach" else gpusls_archive(N, T, K, rng, seed)
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, **members)
+    os.replace(tmp, path)
+    print(f"[Data] {os.path.basename(path)} ({os.path.getsize(path) / 2**20:.1f} MB)")
+    return path
+
+
+def cells(paths, n_grid, t_grid, k_grid):
+    # -> [(path name, N, T, K)]; the deepreach layout holds one obstacle
+    out = []
+    for name in paths:
+        kind = PATHS[name][0]
+        for K in (k_grid if kind == "gpusls" else [1]):
+            for T in t_grid:
+                for N in n_grid:
+                    out.append((name, N, T, K))
+    return out
+
+
+# ------------------------------------------------------------
+# Timing
+# ------------------------------------------------------------
+def _time_cell(name, data_file, warmup, repeats, conn):
+    try:
+        os.environ["MPLBACKEND"] = "Agg"
+        sys.path.insert(0, SCRIPT_DIR)
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        import instrument
+        from batch_render import KINDS
+
+        kind, mode = PATHS[name]
+        module = importlib.import_module(KINDS[kind])
+        module.apply_style()
+        samples = {stage: [] for stage in STAGES}
+        artists = pdf_bytes = None
+        with tempfile.TemporaryDirectory() as tmp:
+            pdf = os.path.join(tmp, "figure.pdf")
+            for i in range(warmup + repeats):
+                instrument.start(name)
+                t0 = time.perf_counter()
+                fig, ax = plt.subplots(figsize=(6.5, 6.5))
+                module.draw_frame(ax)
+                module.draw_scenario(ax, data_file, mode)
+                with instrument.phase("legend"):
+                    module.add_legend(ax)
+                if artists is None:
+                    artists = instrument.count_artists(fig)
+                with instrument.phase("savefig"):
+                    fig.savefig(pdf, bbox_inches="tight")
+                plt.close(fig)
+                total = time.perf_counter() - t0
+                if i < warmup:
+                    continue
+                phases = instrument.snapshot()["phases"]
+                for stage, keys in STAGE_PHASES.items():
+                    samples[stage].append(sum(phases[k]["wall_s"] for k in keys if k in phases) * 1e3)
+                samples["total"].append(total * 1e3)
+            pdf_bytes = os.path.getsize(pdf)
+        conn.send(("ok", {"samples_ms": samples, "artists": artists, "pdf_bytes": pdf_bytes}))
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+def time_cell(name, data_file, warmup=WARMUP, repeats=REPEATS, timeout_s=TIMEOUT_S):
+    ctx = mp.get_context("fork" if "fork" in mp.get_all_start_methods() else "spawn")
+    recv, send = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_time_cell, args=(name, data_file, warmup, repeats, send))
+    proc.start()
+    send.close()
+    status, payload = "timeout", None
+    if recv.poll(timeout_s):
+        try:
+            status, payload = recv.recv()
+        except EOFError:
+            status, payload = "error", "worker exited without a result"
+    if proc.is_alive():
+        proc.terminate()
+    proc.join()
+    return status, payload
+
+
+def run_benchmark(paths=None, n_grid=N_GRID, t_grid=T_GRID, k_grid=K_GRID, warmup=WARMUP, repeats=REPEATS,
+                  timeout_s=TIMEOUT_S, seed=SEED, data_dir=DATA_DIR):
+    from solver_bench import machine_info, summarize
+
+    paths = list(paths or PATHS)
+    results = []
+    timed_out = set()
+    for name, N, T, K in cells(paths, sorted(n_grid), sorted(t_grid), sorted(k_grid)):
+        # time grows with N: once a cell times out, larger N at the same
+        # (path, T, K) are skipped
+        if (name, T, K) in timed_out:
+            status, payload = "skipped", None
+        else:
+            data_file = ensure_data(PATHS[name][0], N, T, K, seed, data_dir)
+            status, payload = time_cell(name, data_file, warmup, repeats, timeout_s)
+            if status == "timeout":
+                timed_out.add((name, T, K))
+        row = {"path": name, "N": int(N), "T": int(T), "K": int(K), "status": status,
+               "error": payload if status == "error" else None, "stages": {}}
+        if status == "ok":
+            row["artists"] = payload["artists"]["artists"]
+            row["collection_paths"] = payload["artists"]["collection_paths"]
+            row["pdf_bytes"] = payload["pdf_bytes"]
+            for stage, samples in payload["samples_ms"].items():
+                med, iqr = summarize(samples)
+                row["stages"][stage] = {"median_ms": med, "iqr_ms": iqr, "samples_ms": samples}
+        results.append(row)
+        shown = ("  ".join(f"{s} {row['stages'][s]['median_ms']:8.1f}" for s in STAGES) + " ms"
+                 if status == "ok" else status)
+        print(f"[Bench] {name:<22} N={N:<6} T={T:<5} K={K:<3} {shown}")
+    return {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "machine": machine_info(),
+        "warmup": warmup,
+        "repeats": repeats,
+        "timeout_s": timeout_s,
+        "seed": seed,
+        "grid": {"N": sorted(int(n) for n in n_grid), "T": sorted(int(t) for t in t_grid),
+                 "K": sorted(int(k) for k in k_grid)},
+        "results": results,
+    }
+
+
+def save_results(report, path=TIMINGS_PATH):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=1)
+
+
+def load_results(path=TIMINGS_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+# ------------------------------------------------------------
+# Scaling curves
+# ------------------------------------------------------------
+def plot_scaling(report, out=SCALING_PDF):
+    # one panel per stage: median time vs rollout vertices (N x T), one line
+    # per plotting path and T (solid: fewest obstacles, dashed: most)
+    import matplotlib.pyplot as plt
+
+    ok = [r for r in report["results"] if r["status"] == "ok"]
+    paths = list(dict.fromkeys(r["path"] for r in ok))
+    colors = {p: f"C{i}" for i, p in enumerate(paths)}
+    ks = report["grid"]["K"]
+    ts = report["grid"]["T"]
+    markers = dict(zip(ts, "os^Dv<>"))
+
+    fig, axes = plt.subplots(1, len(STAGES), figsize=(4 * len(STAGES), 4), sharex=True)
+    for ax, stage in zip(axes, STAGES):
+        for p in paths:
+            for T in ts:
+                for K in (min(ks), max(ks)):
+                    rows = sorted((r for r in ok if r["path"] == p and r["T"] == T and r["K"] == K),
+                                  key=lambda r: r["N"])
+                    if not rows:
+                        continue
+                    x = [r["N"] * r["T"] for r in rows]
+                    y = [r["stages"][stage]["median_ms"] for r in rows]
+                    label = f"{p} T={T}" + (f" K={K}" if len(ks) > 1 and p.startswith("gpusls") else "")
+                    ax.plot(x, y, marker=markers.get(T, "o"), color=colors[p],
+                            linestyle="--" if K != min(ks) else "-", label=label)
+        ax.set_xscale("log")
+        ax.set_yscale("log")
+        ax.set_title(stage)
+        ax.set_xlabel("rollout vertices N x T")
+        ax.grid(True, which="both", linestyle="--", linewidth=0.5, alpha=0.5)
+    axes[0].set_ylabel("median time [ms]")
+    axes[0].legend(fontsize="x-small")
+    fig.tight_layout()
+    fig.savefig(out, bbox_inches="tight")
+    plt.close(fig)
+    return out
+
+
+# ------------------------------------------------------------
+# Baseline comparison
+# ------------------------------------------------------------
+def compare(base, new, against=None):
+    # -> one dict per (cell, stage) timed in both reports; against maps a new
+    # path name to the baseline path it is judged against (default: itself)
+    from bench_history import ALPHA, MIN_SLOWDOWN, mann_whitney_greater, min_p_value
+
+    against = against or {}
+    base_cells = {(r["path"], r["N"], r["T"], r["K"]): r for r in base["results"] if r["status"] == "ok"}
+    out = []
+    for r in new["results"]:
+        b = base_cells.get((against.get(r["path"], r["path"]), r["N"], r["T"], r["K"]))
+        if r["status"] != "ok" or b is None:
+            continue
+        for stage in STAGES:
+            bx, nx = b["stages"][stage]["samples_ms"], r["stages"][stage]["samples_ms"]
+            base_ms, new_ms = float(np.median(bx)), float(np.median(nx))
+            ratio = new_ms / base_ms if base_ms > 0 else float("nan")
+            _, p_slow = mann_whitney_greater(bx, nx)
+            _, p_fast = mann_whitney_greater(nx, bx)
+            if min_p_value(len(bx), len(nx)) >= ALPHA:
+                verdict = "insufficient"
+            elif p_slow < ALPHA and ratio > MIN_SLOWDOWN:
+                verdict = "regression"
+            elif p_fast < ALPHA and ratio < 1 / MIN_SLOWDOWN:
+                verdict = "improvement"
+            else:
+                verdict = "ok"
+            out.append({"path": r["path"], "base_path": b["path"], "N": r["N"], "T": r["T"], "K": r["K"],
+                        "stage": stage, "base_ms": base_ms, "new_ms": new_ms, "ratio": ratio, "verdict": verdict})
+    return out
+
+
+def same_machine(base, new):
+    from bench_history import machine_fingerprint
+
+    return machine_fingerprint(base["machine"]) == machine_fingerprint(new["machine"])
+
+
+def _int_list(s):
+    return [int(v) for v in s.split(",") if v]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the trajectory figure paths on synthetic rollout files.")
+    parser.add_argument("--paths", type=lambda s: s.split(","), default=None,
+                        help=f"comma-separated subset of: {', '.join(PATHS)}")
+    parser.add_argument("--n", type=_int_list, default=N_GRID, help="rollout counts")
+    parser.add_argument("--t", type=_int_list, default=T_GRID, help="steps per rollout")
+    parser.add_argument("--k", type=_int_list, default=K_GRID, help="obstacle counts (gpusls)")
+    parser.add_argument("--warmup", type=int, default=WARMUP)
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--timeout", type=float, default=TIMEOUT_S, help="seconds per cell")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--out", default=TIMINGS_PATH)
+    parser.add_argument("--plot", default=SCALING_PDF, help="scaling curves PDF ('' to skip)")
+    parser.add_argument("--baseline", metavar="REPORT.json", help="earlier report to compare against")
+    parser.add_argument("--against", metavar="PATH",
+                        help="baseline plotting path the new paths are compared with (default: the same path)")
+    args = parser.parse_args()
+
+    unknown = [p for p in (args.paths or []) + ([args.against] if args.against else []) if p not in PATHS]
+    if unknown:
+        parser.error(f"unknown plotting paths: {unknown}")
+
+    report = run_benchmark(args.paths, args.n, args.t, args.k, args.warmup, args.repeats, args.timeout,
+                           args.seed, args.data_dir)
+    save_results(report, args.out)
+    print(f"[Saved] {args.out}")
+    if args.plot:
+        print(f"[Saved] {plot_scaling(report, args.plot)}")
+
+    if args.baseline:
+        base = load_results(args.baseline)
+        if not same_machine(base, report):
+            print(f"[Compare] WARNING: {args.baseline} was recorded on another machine")
+        against = {p: args.against for p in args.paths or PATHS} if args.against else None
+        rows = compare(base, report, against)
+        for row in rows:
+            if row["verdict"] != "ok" or row["stage"] == "total":
+                vs = "" if row["base_path"] == row["path"] else f" vs {row['base_path']}"
+                print(f"[Compare] {row['path']}{vs} N={row['N']} T={row['T']} K={row['K']} {row['stage']:<8} "
+                      f"{row['base_ms']:9.1f} -> {row['new_ms']:9.1f} ms (x{row['ratio']:.2f}) {row['verdict']}")
+        regressions = [r for r in rows if r["verdict"] == "regression"]
+        unknown = [r for r in rows if r["verdict"] == "insufficient"]
+        print(f"[Compare] {len(rows)} stage timings, {len(regressions)} regressions")
+        if unknown:
+            from bench_history import ALPHA
+
+            print(f"[Compare] {len(unknown)} stage timings have too few repeats to reach p < {ALPHA:g} "
+                  f"and were not checked; use more --repeats")
+        sys.exit(1 if regressions else 2 if unknown else 0)
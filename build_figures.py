@@ -0,0 +1,186 @@
+import os
+import ast
+import sys
+import time
+import runpy
+import argparse
+import resource
+import traceback
+import multiprocessing as mp
+
+import instrument
+from figure_cache import FigureCache
+
+# ============================
+# Paper figure build driver
+# ============================
+# Every figure script runs in its own fresh (spawned) worker process with a
+# headless Agg backend, so the figure set builds in parallel across all
+# cores and per-figure peak RSS is not polluted by earlier jobs.
+#
+# --profile DIR renders every requested figure (no cache restores) with the
+# instrument.py phase profiler on and writes one <script>.profile.json per
+# figure into DIR (cProfile dumps too when FIGURE_CPROFILE=1).
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The worker's own modules (and the usetex cache) can change any figure
+WORKER_DEPS = ["instrument.py", "figure_cache.py", "tex_cache.py"]
+# script -> PDFs it writes and data it reads (relative to SCRIPT_DIR). The
+# local modules it imports are found by local_deps(); both feed the
+# incremental cache key. The solver plots read no data: they draw their
+# paper tables unless run with --measured, which a build never passes.
+JOBS = {
+    "time_comparisons.py": {
+        "outputs": ["solver_scaling_log.pdf"],
+    },
+    "decision_variable_scalings.py": {
+        "outputs": ["3d_polynomial_surface_loglike.pdf"],
+    },
+    "plot_min_distance.py": {
+        "outputs": ["minimum_distance_vs_time.pdf"],
+        "inputs": ["minimum_distance_np.npy", "sls_vs_deepreach.npz", "sls_vs_deepreach.store"],
+    },
+    "plot_deepreach_trajectories.py": {
+        "outputs": ["deepreach.pdf"],
+        "inputs": ["rollouts_xy_data_test.npz", "rollouts_xy_data_test.store"],
+    },
+    "plot_gpusls_trajectories.py": {
+        "outputs": ["deepreach_with_tubes.pdf"],
+        "inputs": ["sls_vs_deepreach.npz", "sls_vs_deepreach.store"],
+    },
+}
+
+
+def local_deps(script):
+    # Modules of SCRIPT_DIR that `script` imports, transitively; imports
+    # inside functions (the lazily imported helpers) count too
+    found, todo = set(), [script]
+    while todo:
+        path = os.path.join(SCRIPT_DIR, todo.pop())
+        with open(path) as f:
+            tree = ast.parse(f.read(), path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [a.name for a in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                dep = name.split(".")[0] + ".py"
+                if dep != script and dep not in found and os.path.exists(os.path.join(SCRIPT_DIR, dep)):
+                    found.add(dep)
+                    todo.append(dep)
+    return sorted(found)
+
+
+def _abs(paths):
+    return [os.path.join(SCRIPT_DIR, p) for p in paths]
+
+
+def run_job(script):
+    os.environ["MPLBACKEND"] = "Agg"
+    os.chdir(SCRIPT_DIR)
+    sys.path.insert(0, SCRIPT_DIR)
+
+    import matplotlib
+    matplotlib.use("Agg")
+
+    t0 = time.perf_counter()
+    instrument.start(script)
+    error = None
+    try:
+        runpy.run_path(os.path.join(SCRIPT_DIR, script), run_name="__main__")
+    except SystemExit as e:
+        # sys.exit() in a figure script; only a non-zero status fails the job
+        if e.code not in (None, 0):
+            error = f"SystemExit: {e.code}"
+    except Exception:
+        error = traceback.format_exc()
+    wall = time.perf_counter() - t0
+    profile = instrument.write_report()
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_bytes = rss if sys.platform == "darwin" else rss * 1024
+    return {"script": script, "wall_s": wall, "peak_rss_bytes": rss_bytes, "error": error, "profile": profile}
+
+
+def build(scripts=None, workers=None, force=False, profile=None):
+    scripts = list(scripts or JOBS)
+    unknown = [s for s in scripts if s not in JOBS]
+    if unknown:
+        raise ValueError(f"Unknown figure jobs: {unknown}")
+    if profile:
+        # inherited by the spawned workers; a restored figure measures nothing
+        os.environ[instrument.PROFILE_ENV] = os.path.abspath(profile)
+        force = True
+
+    # --- Incremental cache: only figures whose inputs changed are rendered ---
+    cache = FigureCache()
+    cache.evict(JOBS)
+    keys, todo = {}, []
+    for script in scripts:
+        job = JOBS[script]
+        keys[script] = cache.job_key(
+            os.path.join(SCRIPT_DIR, script),
+            _abs(sorted(set(local_deps(script)) | set(WORKER_DEPS))),
+            _abs(job.get("inputs", [])),
+        )
+        if not force and cache.restore(script, keys[script], _abs(job["outputs"])):
+            print(f"[Cached] {script}")
+        else:
+            todo.append(script)
+
+    results = []
+    t0 = time.perf_counter()
+    if todo:
+        workers = max(1, min(workers or os.cpu_count() or 1, len(todo)))
+        print(f"[Build] {len(todo)} figures on {workers} workers")
+        ctx = mp.get_context("spawn")
+        with ctx.Pool(processes=workers, maxtasksperchild=1) as pool:
+            results = list(pool.imap_unordered(run_job, todo))
+    total = time.perf_counter() - t0
+
+    for r in results:
+        outputs = _abs(JOBS[r["script"]]["outputs"])
+        if r["error"] is None and all(map(os.path.exists, outputs)):
+            cache.store(r["script"], keys[r["script"]], outputs)
+    cache.save()
+
+    if results:
+        results.sort(key=lambda r: scripts.index(r["script"]))
+        report(results, total)
+    return results
+
+
+def report(results, total):
+    width = max(len(r["script"]) for r in results)
+    print()
+    print(f"{'figure':<{width}}  {'wall [s]':>9}  {'peak RSS [MB]':>13}  status")
+    for r in results:
+        status = "ok" if r["error"] is None else "FAILED"
+        print(f"{r['script']:<{width}}  {r['wall_s']:>9.2f}  {r['peak_rss_bytes'] / 2**20:>13.1f}  {status}")
+    serial = sum(r["wall_s"] for r in results)
+    print(f"{'total (parallel)':<{width}}  {total:>9.2f}  (serial sum {serial:.2f}s)")
+
+    for r in results:
+        if r.get("profile"):
+            print(f"[Profile] {r['profile']}")
+    for r in results:
+        if r["error"] is not None:
+            print(f"\n[FAILED] {r['script']}\n{r['error']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the paper figures in parallel, skipping unchanged ones.")
+    parser.add_argument("scripts", nargs="*", metavar="SCRIPT",
+                        help=f"figure scripts to build (default: all of {', '.join(JOBS)})")
+    parser.add_argument("--force", action="store_true", help="render even if the cached figure is up to date")
+    parser.add_argument("--profile", metavar="DIR", help="write per-figure phase profiles into DIR (implies --force)")
+    args = parser.parse_args()
+    unknown = [s for s in args.scripts if s not in JOBS]
+    if unknown:
+        parser.error(f"unknown figure scripts: {', '.join(unknown)}")
+    results = build(args.scripts or None, force=args.force, profile=args.profile)
+    sys.exit(1 if any(r["error"] for r in results) else 0)
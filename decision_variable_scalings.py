@@ -1,15 +1,13 @@
+import os
+import sys
 import numpy as np
-import matplotlib.pyplot as plt
-from mpl_toolkits.mplot3d import Axes3D  # noqa: F401
-from matplotlib.ticker import FuncFormatter, MaxNLocator, FixedLocator
 
-from sklearn.preprocessing import PolynomialFeatures
-from sklearn.linear_model import LinearRegression
+import instrument
 
 # -----------------------------
-# Matplotlib styling (PDF vector-safe)
+# Matplotlib styling (PDF vector-safe; applied in main, pyplot is imported lazily)
 # -----------------------------
-plt.rcParams.update({
+RC_PARAMS = {
     "font.size": 18,
     "font.family": "serif",
     "font.serif": ["cmr10"],
@@ -17,7 +15,19 @@ plt.rcParams.update({
     "text.usetex": False,
     "pdf.fonttype": 42,   # embed fonts (Type 42)
     "ps.fonttype": 42,
-})
+}
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PDF_OUT = "3d_polynomial_surface_loglike.pdf"
+# Written by solver_bench.py and plotted only with `--measured`; by default
+# the hard-coded paper table below is drawn
+TIMINGS_PATH = os.path.join(SCRIPT_DIR, "solver_timings.json")
+# solver whose grid is fitted (None: first in the file)
+GRID_SOLVER = None
+# scaling_model kind fitted to the grid ("quad" is the degree-2 polynomial in
+# log10 space); `--extrapolate` also draws the fit out to this horizon
+FIT_KIND = "quad"
+EXTRAPOLATE_HORIZON = 1e4
 
 # -----------------------------
 # Log-like tick helpers for 3D
@@ -28,6 +38,8 @@ def pow10_major_formatter(val, pos=None):
     return ""
 
 def set_loglike_ticks_3d(ax, minor=True):
+    from matplotlib.ticker import FuncFormatter, MaxNLocator, FixedLocator
+
     ax.xaxis.set_major_locator(MaxNLocator(integer=True))
     ax.yaxis.set_major_locator(MaxNLocator(integer=True))
     ax.zaxis.set_major_locator(MaxNLocator(integer=True))
@@ -96,47 +108,89 @@ data = np.array([
     [100, 100,  16.5], [100, 500,  40.95], [100, 1000, 72.97], [100, 2000, 138],
 ])
 
-x, y, z = data[:, 0], data[:, 1], data[:, 2]
-xL, yL, zL = np.log10(x), np.log10(y), np.log10(z)
-
-# ------------------------------------------------------------
-# Polynomial regression in log space
-# ------------------------------------------------------------
-X_log = np.column_stack([xL, yL])
-poly = PolynomialFeatures(degree=2, include_bias=True)
-model = LinearRegression().fit(poly.fit_transform(X_log), zL)
-
-XiL, YiL = np.meshgrid(
-    np.linspace(xL.min(), xL.max(), 60),
-    np.linspace(yL.min(), yL.max(), 60),
-)
-
-ZiL = model.predict(
-    poly.transform(np.column_stack([XiL.ravel(), YiL.ravel()]))
-).reshape(XiL.shape)
-
-# ------------------------------------------------------------
-# 2) Surface plot (vector PDF)
-# ------------------------------------------------------------
-fig = plt.figure(figsize=(9.0, 9.0))
-ax = fig.add_subplot(projection="3d")
-ax.view_init(elev=25, azim=20)
-
-ax.plot_surface(XiL, YiL, ZiL, alpha=0.6, linewidth=0)
-ax.scatter(xL, yL, zL, color="k", s=50)
-ax.invert_xaxis()
-
-style_3d_axes(
-    ax,
-    "Solve Time vs Horizon vs Decision Variables",
-    "Decision Variables",
-    "Horizon",
-    "Solve Time (ms)",
-)
-
-set_loglike_ticks_3d(ax)
-save_pdf(fig, "3d_polynomial_surface_loglike.pdf")
-plt.close(fig)
-
-print("Saved vector PDFs:")
-print("  - 3d_polynomial_surface_loglike.pdf")
+def load_data(timings_path=None, solver=GRID_SOLVER):
+    # -> (M, 3) rows of (decision vars, horizon, solve time ms); timings_path
+    # None is the paper table, otherwise a solver_bench.py report that must exist
+    if timings_path is None:
+        print("[Data] hard-coded paper table")
+        return data
+    if not os.path.exists(timings_path):
+        raise FileNotFoundError(f"{timings_path} not found; run solver_bench.py first")
+    import solver_bench
+
+    print(f"[Data] measured: {timings_path}")
+    return solver_bench.grid_table(solver_bench.load_results(timings_path), solver)
+
+
+def main(timings_path=None, extrapolate_to=None):
+    import scaling_model
+
+    with instrument.phase("load"):
+        data = load_data(timings_path)
+
+    with instrument.phase("setup"):
+        import matplotlib.pyplot as plt
+        from mpl_toolkits.mplot3d import Axes3D  # noqa: F401
+
+        plt.rcParams.update(RC_PARAMS)
+
+    x, y, z = data[:, 0], data[:, 1], data[:, 2]
+    xL, yL, zL = np.log10(x), np.log10(y), np.log10(z)
+
+    # ------------------------------------------------------------
+    # Polynomial regression in log space
+    # ------------------------------------------------------------
+    with instrument.phase("fit"):
+        # the surface only needs the point fit; no CI is drawn
+        model = scaling_model.fit_grid(data, FIT_KIND, n_boot=0)
+
+        XiL, YiL = np.meshgrid(
+            np.linspace(xL.min(), xL.max(), 60),
+            np.linspace(yL.min(), yL.max(), 60),
+        )
+
+        ZiL = np.log10(model.predict(10 ** YiL, 10 ** XiL))
+
+    # ------------------------------------------------------------
+    # 2) Surface plot (vector PDF)
+    # ------------------------------------------------------------
+    with instrument.phase("artists"):
+        fig = plt.figure(figsize=(9.0, 9.0))
+        ax = fig.add_subplot(projection="3d")
+        ax.view_init(elev=25, azim=20)
+
+        ax.plot_surface(XiL, YiL, ZiL, alpha=0.6, linewidth=0)
+        ax.scatter(xL, yL, zL, color="k", s=50)
+        if extrapolate_to and np.log10(extrapolate_to) > yL.max():
+            XeL, YeL = np.meshgrid(
+                np.linspace(xL.min(), xL.max(), 12),
+                np.linspace(yL.max(), np.log10(extrapolate_to), 12),
+            )
+            ZeL = np.log10(model.predict(10 ** YeL, 10 ** XeL))
+            ax.plot_wireframe(XeL, YeL, ZeL, color="C0", linewidth=0.6, linestyle="--", alpha=0.6)
+        ax.invert_xaxis()
+
+    with instrument.phase("layout"):
+        style_3d_axes(
+            ax,
+            "Solve Time vs Horizon vs Decision Variables",
+            "Decision Variables",
+            "Horizon",
+            "Solve Time (ms)",
+        )
+
+        set_loglike_ticks_3d(ax)
+    instrument.record_figure(fig, PDF_OUT)
+    with instrument.phase("savefig"):
+        save_pdf(fig, PDF_OUT)
+    plt.close(fig)
+
+    print("Saved vector PDFs:")
+    print(f"  - {PDF_OUT}")
+
+
+if __name__ == "__main__":
+    main(
+        timings_path=TIMINGS_PATH if "--measured" in sys.argv[1:] else None,
+        extrapolate_to=EXTRAPOLATE_HORIZON if "--extrapolate" in sys.argv[1:] else None,
+    )
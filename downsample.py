@@ -0,0 +1,211 @@
+import os
+import json
+import argparse
+import numpy as np
+
+# ============================
+# Min/max-preserving downsampling of long time series
+# ============================
+# A plot cannot show more than one vertical span per pixel column, so a
+# trace is reduced to the smallest and largest sample of every column
+# before it is drawn. Both points keep their exact value and sample index,
+# so a minimum-distance dip lands on the same time and depth as in the raw
+# trace; the result is at most 2 points per column whatever the length.
+#
+# For files that are zoomed repeatedly, a pyramid of per-bucket min/max
+# (with sample indices) is built once at bucket sizes FACTOR, FACTOR^2, ...
+# and saved next to the series as <file>.pyramid/ (one memmapped .npy per
+# level, rebuilt when the source's size or mtime changes). A window of any
+# size is then answered from the coarsest level that still has one bucket
+# per column, plus the raw samples of the two partial buckets at its edges:
+# O(columns * FACTOR) work instead of O(samples in the window).
+#
+# NaN samples are gaps and are skipped.
+FACTOR = 8
+SIDECAR_SUFFIX = ".pyramid"
+PYRAMID_VERSION = 1
+META = "meta.json"
+LEVEL_DTYPE = np.dtype([("lo", "f8"), ("hi", "f8"), ("ilo", "i8"), ("ihi", "i8")])
+
+
+def sidecar_path_for(path):
+    return path.rstrip(os.sep) + SIDECAR_SUFFIX
+
+
+def source_stamp(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def bucket_minmax(values, size, first=0):
+    # Consecutive buckets of `size` samples (last one partial)
+    #   -> LEVEL_DTYPE records; ilo/ihi are sample indices (offset by
+    #   `first`), -1 for all-NaN buckets
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    nb = -(-n // size)
+    lo_in = np.full(nb * size, np.inf)
+    hi_in = np.full(nb * size, -np.inf)
+    lo_in[:n] = values
+    hi_in[:n] = values
+    nan = np.isnan(lo_in)
+    lo_in[nan] = np.inf
+    hi_in[nan] = -np.inf
+    lo_in = lo_in.reshape(nb, size)
+    hi_in = hi_in.reshape(nb, size)
+
+    rows = np.arange(nb)
+    out = np.empty(nb, dtype=LEVEL_DTYPE)
+    jlo = lo_in.argmin(axis=1)
+    jhi = hi_in.argmax(axis=1)
+    out["lo"] = lo_in[rows, jlo]
+    out["hi"] = hi_in[rows, jhi]
+    empty = ~np.isfinite(out["lo"])
+    out["ilo"] = np.where(empty, -1, first + rows * size + jlo)
+    out["ihi"] = np.where(empty, -1, first + rows * size + jhi)
+    return out
+
+
+def merge_buckets(level, factor):
+    # Records of one level -> the next coarser level (factor buckets each)
+    nb = -(-len(level) // factor)
+    pad = np.empty(nb * factor, dtype=LEVEL_DTYPE)
+    pad[:len(level)] = level
+    pad[len(level):] = (np.inf, -np.inf, -1, -1)
+    pad = pad.reshape(nb, factor)
+
+    rows = np.arange(nb)
+    jlo = pad["lo"].argmin(axis=1)
+    jhi = pad["hi"].argmax(axis=1)
+    out = np.empty(nb, dtype=LEVEL_DTYPE)
+    out["lo"] = pad["lo"][rows, jlo]
+    out["ilo"] = pad["ilo"][rows, jlo]
+    out["hi"] = pad["hi"][rows, jhi]
+    out["ihi"] = pad["ihi"][rows, jhi]
+    return out
+
+
+def reduce_columns(index, values, i0, i1, n_cols):
+    # Candidate points (sample index, value) in [i0, i1) -> the min and max
+    # point of every one of n_cols equal columns, sorted by index
+    keep = (index >= i0) & (index < i1) & ~np.isnan(values)
+    index, values = index[keep], values[keep]
+    if len(index) == 0:
+        return index.astype(np.int64), values
+    col = (index - i0) * n_cols // (i1 - i0)
+    order = np.lexsort((values, col))
+    col = col[order]
+    starts = np.flatnonzero(np.r_[True, col[1:] != col[:-1]])
+    ends = np.r_[starts[1:], len(col)] - 1
+    picked = np.unique(np.concatenate((order[starts], order[ends])))
+    picked = picked[np.argsort(index[picked], kind="stable")]
+    return index[picked], values[picked]
+
+
+def minmax_downsample(values, n_cols, first=0):
+    # In-memory series (samples first, first + 1, ...) -> (sample indices,
+    # values) with at most 2 points per column; short series pass through
+    values = np.asarray(values)
+    n = len(values)
+    index = first + np.arange(n)
+    if n <= 2 * n_cols:
+        keep = ~np.isnan(values)
+        return index[keep], values[keep]
+    b = bucket_minmax(values, -(-n // n_cols), first)
+    b = b[b["ilo"] >= 0]
+    return reduce_columns(np.r_[b["ilo"], b["ihi"]], np.r_[b["lo"], b["hi"]], first, first + n, n_cols)
+
+
+class Pyramid:
+    def __init__(self, values, levels, factor=FACTOR):
+        self.values = values          # level 0: the raw samples (memmap when loaded)
+        self.levels = levels          # levels[k]: buckets of factor ** (k + 1) samples
+        self.factor = factor
+
+    def __len__(self):
+        return len(self.values)
+
+    @classmethod
+    def build(cls, values, factor=FACTOR):
+        levels = []
+        if len(values) > factor:
+            levels.append(bucket_minmax(values, factor))
+            while len(levels[-1]) > factor:
+                levels.append(merge_buckets(levels[-1], factor))
+        return cls(values, levels, factor)
+
+    def save(self, directory, stamp=None):
+        os.makedirs(directory, exist_ok=True)
+        for k, level in enumerate(self.levels):
+            np.save(os.path.join(directory, f"level_{k:02d}.npy"), level)
+        meta = {"version": PYRAMID_VERSION, "factor": self.factor, "levels": len(self.levels),
+                "samples": len(self.values), "stamp": stamp}
+        with open(os.path.join(directory, META), "w") as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, directory, values):
+        with open(os.path.join(directory, META)) as f:
+            meta = json.load(f)
+        levels = [np.load(os.path.join(directory, f"level_{k:02d}.npy"), mmap_mode="r")
+                  for k in range(meta["levels"])]
+        return cls(values, levels, meta["factor"])
+
+    def window(self, i0, i1, n_cols):
+        # Samples [i0, i1) -> (sample indices, values), at most 2 per column
+        i0, i1 = max(int(i0), 0), min(int(i1), len(self.values))
+        if i1 <= i0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        n = i1 - i0
+        if n <= 2 * n_cols:
+            return minmax_downsample(np.asarray(self.values[i0:i1]), n_cols, i0)
+
+        # coarsest level with at least one bucket per column
+        k = -1
+        while k + 1 < len(self.levels) and n // self.factor ** (k + 2) >= n_cols:
+            k += 1
+        if k < 0:
+            return minmax_downsample(np.asarray(self.values[i0:i1]), n_cols, i0)
+        size = self.factor ** (k + 1)
+        b0, b1 = -(-i0 // size), i1 // size
+        full = np.asarray(self.levels[k][b0:b1])
+        full = full[full["ilo"] >= 0]
+        head = bucket_minmax(np.asarray(self.values[i0:b0 * size]), size, i0)
+        tail = bucket_minmax(np.asarray(self.values[b1 * size:i1]), size, b1 * size)
+        parts = [p[p["ilo"] >= 0] for p in (head, full, tail)]
+        b = np.concatenate(parts)
+        return reduce_columns(np.r_[b["ilo"], b["ihi"]], np.r_[b["lo"], b["hi"]], i0, i1, n_cols)
+
+
+def load_or_build(path, factor=FACTOR, rebuild=False, save=True):
+    # 1-D .npy series -> Pyramid over its memmapped samples. A fresh sidecar
+    # is reused either way; save=False builds a missing one in memory only.
+    values = np.load(path, mmap_mode="r")
+    sidecar = sidecar_path_for(path)
+    stamp = source_stamp(path)
+    meta_path = os.path.join(sidecar, META)
+    if not rebuild and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta["version"] == PYRAMID_VERSION and meta["stamp"] == stamp and meta["factor"] == factor:
+            return Pyramid.load(sidecar, values)
+    pyramid = Pyramid.build(np.asarray(values), factor)
+    pyramid.values = values
+    if save:
+        pyramid.save(sidecar, stamp)
+        print(f"[Pyramid] {len(values)} samples, {len(pyramid.levels)} levels (x{factor}) -> {sidecar}")
+    return pyramid
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build / query the min-max pyramid of a 1-D .npy series.")
+    parser.add_argument("path")
+    parser.add_argument("--rebuild", action="store_true")
+    parser.add_argument("--window", nargs=2, type=int, metavar=("I0", "I1"), help="sample range to reduce")
+    parser.add_argument("--columns", type=int, default=1000)
+    args = parser.parse_args()
+
+    pyramid = load_or_build(args.path, rebuild=args.rebuild)
+    i0, i1 = args.window or (0, len(pyramid))
+    index, values = pyramid.window(i0, i1, args.columns)
+    print(f"[Window] samples [{i0}, {i1}) -> {len(index)} points; min {values.min():.6f} at {index[values.argmin()]}")
@@ -0,0 +1,120 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+
+# ============================
+# Content-hashed incremental figure cache
+# ============================
+# A figure's key hashes everything that can change its PDF: the script source
+# (rcParams block and figure parameters included), the local modules it
+# imports, its input data files and the matplotlib version. Rendered outputs
+# are kept per key under .figure_cache/<script>/<key>/ so that going back to a
+# previous state restores the PDFs without rendering. Only the most recently
+# used MAX_ENTRIES_PER_JOB keys of each figure are kept.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(SCRIPT_DIR, ".figure_cache")
+INDEX = "index.json"
+MAX_ENTRIES_PER_JOB = 3
+HASH_CHUNK_BYTES = 8 << 20
+
+
+def sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class FigureCache:
+    def __init__(self, root=CACHE_DIR, max_entries_per_job=MAX_ENTRIES_PER_JOB):
+        self.root = root
+        self.max_entries_per_job = max_entries_per_job
+        os.makedirs(root, exist_ok=True)
+        try:
+            with open(os.path.join(root, INDEX)) as f:
+                self.index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.index = {}
+        self.index.setdefault("files", {})   # path -> [size, mtime_ns, sha256]
+        self.index.setdefault("jobs", {})    # script -> {key: last_used}
+
+    def file_digest(self, path):
+        # Large rollout archives are only re-hashed when size/mtime change.
+        # Store directories are hashed through their members.
+        if os.path.isdir(path):
+            h = hashlib.sha256()
+            for name in sorted(os.listdir(path)):
+                h.update(name.encode())
+                h.update(self.file_digest(os.path.join(path, name)).encode())
+            return h.hexdigest()
+
+        st = os.stat(path)
+        path = os.path.abspath(path)
+        memo = self.index["files"].get(path)
+        if memo and memo[0] == st.st_size and memo[1] == st.st_mtime_ns:
+            return memo[2]
+        digest = sha256_file(path)
+        self.index["files"][path] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def job_key(self, script, deps=(), inputs=()):
+        import matplotlib
+
+        h = hashlib.sha256()
+        h.update(f"matplotlib={matplotlib.__version__}".encode())
+        for path in [script, *deps, *inputs]:
+            h.update(os.path.basename(path).encode())
+            h.update(self.file_digest(path).encode() if os.path.exists(path) else b"<missing>")
+        return h.hexdigest()[:32]
+
+    def _entry_dir(self, script, key):
+        return os.path.join(self.root, os.path.splitext(os.path.basename(script))[0], key)
+
+    def restore(self, script, key, outputs):
+        # True if every output of this key is cached; outputs in the working
+        # tree are replaced only when their content differs.
+        entry = self._entry_dir(script, key)
+        cached = [os.path.join(entry, os.path.basename(o)) for o in outputs]
+        if key not in self.index["jobs"].get(script, {}) or not all(map(os.path.exists, cached)):
+            return False
+        for src, dst in zip(cached, outputs):
+            if not os.path.exists(dst) or sha256_file(dst) != sha256_file(src):
+                shutil.copy2(src, dst)
+        self.index["jobs"][script][key] = time.time()
+        return True
+
+    def store(self, script, key, outputs):
+        entry = self._entry_dir(script, key)
+        os.makedirs(entry, exist_ok=True)
+        for o in outputs:
+            shutil.copy2(o, os.path.join(entry, os.path.basename(o)))
+        self.index["jobs"].setdefault(script, {})[key] = time.time()
+        self._evict_job(script)
+
+    def _evict_job(self, script):
+        keys = self.index["jobs"].get(script, {})
+        stale = sorted(keys, key=keys.get, reverse=True)[self.max_entries_per_job:]
+        for key in stale:
+            shutil.rmtree(self._entry_dir(script, key), ignore_errors=True)
+            del keys[key]
+
+    def evict(self, live_scripts):
+        # Drop figures that are no longer built and file hashes of inputs
+        # that no longer exist.
+        for script in list(self.index["jobs"]):
+            if script not in live_scripts:
+                for key in list(self.index["jobs"][script]):
+                    shutil.rmtree(self._entry_dir(script, key), ignore_errors=True)
+                del self.index["jobs"][script]
+        for path in list(self.index["files"]):
+            if not os.path.exists(path):
+                del self.index["files"][path]
+
+    def save(self):
+        tmp = os.path.join(self.root, INDEX + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(tmp, os.path.join(self.root, INDEX))
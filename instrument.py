@@ -0,0 +1,249 @@
+import os
+import sys
+import json
+import time
+import atexit
+import cProfile
+import argparse
+import datetime
+import resource
+import tracemalloc
+import contextlib
+
+# ============================
+# Per-phase profiling of figure builds
+# ============================
+# The figure scripts wrap their work in named phases
+#
+#   with instrument.phase("savefig"):
+#       fig.savefig(...)
+#
+# and every phase accumulates its call count, wall and CPU time and, while
+# tracemalloc runs, the net bytes it allocated and its peak traced memory
+# above the level it started at (numpy buffers are traced too). Nested phases
+# are recorded as "outer/inner"; an outer phase's peak includes its inner
+# ones. record_figure() counts a figure's artists (and the paths inside its
+# collections) just before it is saved.
+#
+# Phases only cost two clock reads unless FIGURE_PROFILE names a directory:
+# then tracemalloc runs for the whole process and a JSON report
+# <dir>/<script>.profile.json is written at exit. FIGURE_CPROFILE=1 also
+# dumps one cProfile file per top-level phase (<dir>/<script>.<phase>.prof,
+# for snakeviz / pstats). Wall times under tracemalloc are inflated;
+# FIGURE_PROFILE_MEMORY=0 keeps the report timing-only.
+#
+#   python instrument.py REPORT.json              per-phase table
+#   python instrument.py BASE.json NEW.json       regression check (exit 1)
+PROFILE_ENV = "FIGURE_PROFILE"
+CPROFILE_ENV = "FIGURE_CPROFILE"
+MEMORY_ENV = "FIGURE_PROFILE_MEMORY"
+REPORT_SUFFIX = ".profile.json"
+REPORT_VERSION = 1
+# A phase regresses when it is MIN_SLOWDOWN x slower *and* at least
+# MIN_DELTA_S slower than the baseline (sub-ms phases are clock noise)
+MIN_SLOWDOWN = 1.2
+MIN_DELTA_S = 0.05
+
+_state = {"name": None, "t0": None, "phases": {}, "figures": {}, "stack": [], "profiles": {},
+          "out_dir": None, "cprofile": False, "memory": False, "written": False, "atexit": False}
+
+
+def enabled():
+    return _state["out_dir"] is not None
+
+
+def start(name=None, out_dir=None):
+    # Resets the run; name defaults to the running script's stem and out_dir
+    # to $FIGURE_PROFILE (None: phases are timed but no report is written)
+    if name is None:
+        name = os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0] or "python"
+    out_dir = out_dir or os.environ.get(PROFILE_ENV) or None
+    _state.update(name=os.path.splitext(os.path.basename(name))[0], t0=time.perf_counter(), phases={},
+                  figures={}, stack=[], profiles={}, out_dir=out_dir, written=False,
+                  cprofile=out_dir is not None and os.environ.get(CPROFILE_ENV, "") not in ("", "0"),
+                  memory=out_dir is not None and os.environ.get(MEMORY_ENV, "1") != "0")
+    if _state["memory"] and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if out_dir is not None and not _state["atexit"]:
+        atexit.register(_write_at_exit)
+        _state["atexit"] = True
+
+
+def _ensure_started():
+    if _state["t0"] is None:
+        start()
+
+
+@contextlib.contextmanager
+def phase(name):
+    _ensure_started()
+    stack = _state["stack"]
+    key = "/".join([f["key"] for f in stack[-1:]] + [name])
+    frame = {"key": key, "peak": 0}
+    memory = _state["memory"] and tracemalloc.is_tracing()
+    if memory:
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            # the reset below would lose the enclosing phase's peak so far
+            stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+        tracemalloc.reset_peak()
+        frame["start"] = current
+    profile = None
+    if _state["cprofile"] and not stack:
+        profile = _state["profiles"].setdefault(name, cProfile.Profile())
+    stack.append(frame)
+
+    t0, c0 = time.perf_counter(), time.process_time()
+    if profile is not None:
+        profile.enable()
+    try:
+        yield
+    finally:
+        if profile is not None:
+            profile.disable()
+        wall, cpu = time.perf_counter() - t0, time.process_time() - c0
+        stack.pop()
+        rec = _state["phases"].setdefault(key, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0,
+                                               "alloc_bytes": None, "peak_bytes": None})
+        rec["calls"] += 1
+        rec["wall_s"] += wall
+        rec["cpu_s"] += cpu
+        if memory:
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, frame["peak"])
+            rec["alloc_bytes"] = (rec["alloc_bytes"] or 0) + current - frame["start"]
+            rec["peak_bytes"] = max(rec["peak_bytes"] or 0, peak - frame["start"])
+            if stack:
+                stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+
+
+def timed(iterable, name):
+    # Yields from iterable with the time spent producing each item (e.g.
+    # reading a streamed chunk) recorded as phase `name`
+    it = iter(iterable)
+    while True:
+        with phase(name):
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+        yield item
+
+
+def count_artists(fig):
+    from matplotlib.collections import Collection
+
+    artists = fig.findobj()
+    by_type = {}
+    for a in artists:
+        by_type[type(a).__name__] = by_type.get(type(a).__name__, 0) + 1
+    paths = sum(len(a.get_paths()) for a in artists if isinstance(a, Collection))
+    return {"artists": len(artists), "collection_paths": paths,
+            "by_type": dict(sorted(by_type.items(), key=lambda kv: -kv[1]))}
+
+
+def record_figure(fig, name=None):
+    _ensure_started()
+    name = os.path.basename(name) if name else f"figure_{len(_state['figures'])}"
+    _state["figures"][name] = count_artists(fig)
+    return _state["figures"][name]
+
+
+def snapshot():
+    # -> the report of the current run as a JSON-serializable dict
+    _ensure_started()
+    import numpy as np
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    report = {
+        "version": REPORT_VERSION,
+        "script": _state["name"],
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "argv": sys.argv[1:],
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "total_wall_s": time.perf_counter() - _state["t0"],
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        "peak_rss_bytes": rss if sys.platform == "darwin" else rss * 1024,
+        "tracemalloc": _state["memory"],
+        "phases": {k: dict(v) for k, v in _state["phases"].items()},
+        "figures": dict(_state["figures"]),
+    }
+    if "matplotlib" in sys.modules:
+        report["matplotlib"] = sys.modules["matplotlib"].__version__
+    if "tex_cache" in sys.modules:
+        report["tex"] = sys.modules["tex_cache"].stats()
+    return report
+
+
+def write_report(out_dir=None):
+    # -> path of the JSON report (plus cProfile dumps), None when disabled
+    out_dir = out_dir or _state["out_dir"]
+    if out_dir is None:
+        return None
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, _state["name"] + REPORT_SUFFIX)
+    with open(path, "w") as f:
+        json.dump(snapshot(), f, indent=1)
+    for name, profile in _state["profiles"].items():
+        profile.dump_stats(os.path.join(out_dir, f"{_state['name']}.{name.replace('/', '_')}.prof"))
+    _state["written"] = True
+    return path
+
+
+def _write_at_exit():
+    if not _state["written"] and enabled():
+        print(f"[Profile] {write_report()}")
+
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def format_report(report):
+    lines = [f"{report['script']}: {report['total_wall_s']:.3f}s total, "
+             f"peak RSS {report['peak_rss_bytes'] / 2**20:.1f} MB"]
+    width = max([len(k) for k in report["phases"]] + [5])
+    lines.append(f"  {'phase':<{width}}  {'calls':>6}  {'wall [s]':>9}  {'cpu [s]':>8}  {'alloc [MB]':>10}  {'peak [MB]':>9}")
+    for key, rec in report["phases"].items():
+        mem = ("" if rec["alloc_bytes"] is None
+               else f"  {rec['alloc_bytes'] / 2**20:>10.2f}  {rec['peak_bytes'] / 2**20:>9.2f}")
+        lines.append(f"  {key:<{width}}  {rec['calls']:>6}  {rec['wall_s']:>9.3f}  {rec['cpu_s']:>8.3f}{mem}")
+    for name, fig in report["figures"].items():
+        top = ", ".join(f"{t}={n}" for t, n in list(fig["by_type"].items())[:4])
+        lines.append(f"  [{name}] {fig['artists']} artists, {fig['collection_paths']} collection paths ({top})")
+    if report.get("tex"):
+        lines.append(f"  [tex] {report['tex']}")
+    return "\n".join(lines)
+
+
+def compare(base, new, min_slowdown=MIN_SLOWDOWN, min_delta_s=MIN_DELTA_S):
+    # -> [(phase, base wall, new wall, regressed?)] over the phases of both
+    rows = []
+    for key in [k for k in new["phases"] if k in base["phases"]]:
+        b, n = base["phases"][key]["wall_s"], new["phases"][key]["wall_s"]
+        rows.append((key, b, n, n > b * min_slowdown and n - b > min_delta_s))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show a figure profile report or compare two of them.")
+    parser.add_argument("reports", nargs="+", metavar="REPORT.json", help="one report, or BASE NEW")
+    parser.add_argument("--min-slowdown", type=float, default=MIN_SLOWDOWN)
+    parser.add_argument("--min-delta", type=float, default=MIN_DELTA_S, help="seconds")
+    args = parser.parse_args()
+
+    if len(args.reports) == 1:
+        print(format_report(load_report(args.reports[0])))
+        sys.exit(0)
+    if len(args.reports) != 2:
+        parser.error("expected one report, or BASE and NEW")
+    base, new = map(load_report, args.reports)
+    rows = compare(base, new, args.min_slowdown, args.min_delta)
+    width = max([len(r[0]) for r in rows] + [5])
+    print(f"{'phase':<{width}}  {'base [s]':>9}  {'new [s]':>9}  {'ratio':>6}")
+    for key, b, n, regressed in rows:
+        ratio = n / b if b > 0 else float("inf")
+        print(f"{key:<{width}}  {b:>9.3f}  {n:>9.3f}  {ratio:>6.2f}{'  REGRESSION' if regressed else ''}")
+    sys.exit(1 if any(r[3] for r in rows) else 0)
@@ -0,0 +1,420 @@
+import os
+import sys
+import time
+import queue
+import socket
+import argparse
+import threading
+import numpy as np
+
+from downsample import minmax_downsample
+from plot_min_distance import RC_PARAMS, NPY_PATH, DT, OBSTACLE_RADIUS
+
+# ============================
+# Live min-distance telemetry plot
+# ============================
+# Watches the min-distance-vs-time trace of plot_min_distance.py while the
+# controller runs. Samples (one per control step, DT apart) arrive from
+#
+#   --pipe            stdin, e.g. `controller | python live_min_distance.py --pipe`
+#   --socket H:P      one TCP client connecting to a listening socket
+#   --file PATH       a text file that keeps growing (tail -f)
+#   --replay [NPY]    the offline .npy fed at --speed x real time (testing)
+#
+# as text, one sample per line (with several fields, e.g. "t d", the last
+# one is the distance). Samples go into a fixed-size NumPy ring buffer, so
+# memory stays bounded however long the run is. Frames are capped at
+# TARGET_FPS and blitted: the axes, ticks, grid and threshold line are only
+# re-rendered when the x/y range has to grow, otherwise a frame redraws just
+# the trace and the status text. The trace is reduced to one min/max pair
+# per horizontal pixel before drawing (downsample.minmax_downsample), so a
+# frame costs O(pixels) of artists however many samples are on screen, and
+# every dip below the threshold stays visible.
+TARGET_FPS = 30
+# ring buffer capacity in samples (~5.8 h at 100 Hz)
+BUFFER_SAMPLES = 1 << 21
+# None: show the whole run (x range doubles as it fills); else a window of
+# this many seconds that pages forward by half its width
+WINDOW_S = None
+INITIAL_SPAN_S = 10.0
+Y_LIMITS = (0.0, 1.5)
+# longest sleep between polls of the source
+POLL_S = 0.005
+# samples per read when replaying as fast as possible (--speed 0)
+REPLAY_CHUNK = 4096
+READ_BYTES = 1 << 16
+
+
+class RingBuffer:
+    # Last `capacity` samples of an unbounded stream; sample i (counted from
+    # the start of the stream) lives at data[i % capacity]
+    def __init__(self, capacity=BUFFER_SAMPLES, dtype=np.float64):
+        self.data = np.empty(capacity, dtype=dtype)
+        self.total = 0
+
+    def __len__(self):
+        return min(self.total, len(self.data))
+
+    @property
+    def start(self):
+        # stream index of the oldest sample still held
+        return self.total - len(self)
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.data.dtype).ravel()
+        n, cap = len(values), len(self.data)
+        if n >= cap:
+            self.data[:] = values[-cap:]
+            self.data[:] = np.roll(self.data, (self.total + n) % cap)
+        else:
+            i = self.total % cap
+            first = min(n, cap - i)
+            self.data[i:i + first] = values[:first]
+            self.data[:n - first] = values[first:]
+        self.total += n
+
+    def view(self, start=0, stop=None):
+        # -> (stream index of the first sample, samples [start, stop)); a
+        # view when the range does not wrap, else one copy
+        start = max(start, self.start)
+        stop = self.total if stop is None else min(stop, self.total)
+        if stop <= start:
+            return start, self.data[:0]
+        cap = len(self.data)
+        i, j = start % cap, (stop - 1) % cap + 1
+        if i < j:
+            return start, self.data[i:j]
+        return start, np.concatenate((self.data[i:], self.data[:j]))
+
+
+# ------------------------------------------------------------
+# Sources: read() -> new samples (possibly none); done once exhausted
+# ------------------------------------------------------------
+class LineParser:
+    # bytes -> samples; keeps a partial last line for the next feed. Lines
+    # whose last field is not a number (headers, log lines, garbled writes)
+    # are skipped and counted instead of stopping the stream.
+    def __init__(self):
+        self.rest = b""
+        self.skipped = 0
+        self.last_skipped = None
+
+    def feed(self, data, final=False):
+        data = self.rest + data
+        lines = data.split(b"\n")
+        self.rest = b"" if final else lines.pop()
+        last = [f[-1] for f in (line.replace(b",", b" ").split() for line in lines) if f]
+        try:
+            return np.array(last, dtype=np.float64)
+        except ValueError:
+            pass
+        # slow path, only for a feed with a bad line in it
+        values = []
+        for field in last:
+            try:
+                values.append(float(field))
+            except ValueError:
+                if self.skipped == 0:
+                    print(f"[Live] skipping non-numeric line ending in {field[:40]!r}")
+                self.skipped += 1
+                self.last_skipped = field
+        return np.array(values, dtype=np.float64)
+
+
+class ReplaySource:
+    # The offline trace at `speed` x real time (speed <= 0: as fast as the
+    # plot loop can take it)
+    def __init__(self, path=NPY_PATH, dt=DT, speed=1.0):
+        self.values = np.load(path).ravel()
+        self.dt = dt
+        self.speed = speed
+        self.pos = 0
+        self.t0 = None
+
+    @property
+    def done(self):
+        return self.pos >= len(self.values)
+
+    def read(self):
+        if self.speed <= 0:
+            stop = self.pos + REPLAY_CHUNK
+        else:
+            if self.t0 is None:
+                self.t0 = time.perf_counter()
+            stop = int((time.perf_counter() - self.t0) * self.speed / self.dt) + 1
+        stop = min(stop, len(self.values))
+        out = self.values[self.pos:stop]
+        self.pos = max(self.pos, stop)
+        return out
+
+    def close(self):
+        pass
+
+
+class StreamSource:
+    # A blocking byte stream (pipe, socket) drained by a reader thread, so
+    # the plot loop never waits on it; `opener` runs in that thread and
+    # returns the binary file object to read
+    def __init__(self, opener, name="stream"):
+        self.name = name
+        self.queue = queue.Queue()
+        self.parser = LineParser()
+        self.eof = False
+        self.error = None
+        self.thread = threading.Thread(target=self._run, args=(opener,), daemon=True)
+        self.thread.start()
+
+    def _run(self, opener):
+        try:
+            f = opener()
+            read = getattr(f, "read1", f.read)
+            while True:
+                data = read(READ_BYTES)
+                if not data:
+                    break
+                self.queue.put(data)
+        except OSError as e:
+            self.error = e
+        finally:
+            self.queue.put(None)
+
+    @property
+    def done(self):
+        return self.eof
+
+    def read(self):
+        chunks = []
+        while True:
+            try:
+                data = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if data is None:
+                self.eof = True
+                if self.error is not None:
+                    print(f"[Live] {self.name}: {self.error}")
+                break
+            chunks.append(data)
+        return self.parser.feed(b"".join(chunks), final=self.eof)
+
+    def close(self):
+        pass
+
+
+class FileTailSource:
+    # A text file another process appends to; never done by itself
+    def __init__(self, path):
+        self.path = path
+        self.f = None
+        self.parser = LineParser()
+        self.done = False
+
+    def read(self):
+        if self.f is None:
+            if not os.path.exists(self.path):
+                return np.zeros(0)
+            self.f = open(self.path, "rb")
+        return self.parser.feed(self.f.read())
+
+    def close(self):
+        if self.f is not None:
+            self.f.close()
+
+
+def pipe_source():
+    return StreamSource(lambda: sys.stdin.buffer, "stdin")
+
+
+def socket_source(address):
+    # listens on HOST:PORT and reads the first client that connects
+    host, port = address.rsplit(":", 1)
+    server = socket.create_server((host, int(port)))
+    print(f"[Live] listening on {host}:{port}")
+
+    def accept():
+        conn, peer = server.accept()
+        server.close()
+        print(f"[Live] client {peer[0]}:{peer[1]}")
+        return conn.makefile("rb")
+
+    return StreamSource(accept, f"socket {address}")
+
+
+# ------------------------------------------------------------
+# Blitted plot
+# ------------------------------------------------------------
+class LivePlot:
+    def __init__(self, dt=DT, threshold=OBSTACLE_RADIUS, window_s=WINDOW_S, capacity=BUFFER_SAMPLES):
+        import matplotlib.pyplot as plt
+
+        plt.rcParams.update(RC_PARAMS)
+        self.plt = plt
+        self.dt = dt
+        self.threshold = threshold
+        self.window_s = window_s
+        self.buffer = RingBuffer(capacity)
+        self.min_value = np.inf
+        self.n_below = 0
+        # value range of the samples pushed since the last frame
+        self.pending = (np.inf, -np.inf)
+
+        self.fig, self.ax = plt.subplots(figsize=(8, 4))
+        ax = self.ax
+        self.line, = ax.plot([], [], label="Min distance to obstacle", animated=True)
+        ax.axhline(threshold, linestyle="--", linewidth=2, label=f"Obstacle radius ({threshold} m)")
+        self.status = ax.text(0.01, 0.97, "", transform=ax.transAxes, ha="left", va="top", fontsize=12,
+                              animated=True)
+        ax.set_xlim(0.0, window_s or INITIAL_SPAN_S)
+        ax.set_ylim(*Y_LIMITS)
+        ax.grid(True, axis="y")
+        ax.grid(True, axis="x")
+        ax.set_xlabel("Time [s]")
+        ax.set_ylabel("Distance [m]")
+        ax.legend(loc="lower right")
+        self.fig.tight_layout()
+
+        self.background = None
+        self.frames = self.relayouts = 0
+        self.draw_s = 0.0
+
+    def push(self, values):
+        if len(values) == 0:
+            return
+        self.buffer.extend(values)
+        finite = values[np.isfinite(values)]
+        if len(finite):
+            lo, hi = float(finite.min()), float(finite.max())
+            self.min_value = min(self.min_value, lo)
+            self.n_below += int(np.count_nonzero(finite < self.threshold))
+            self.pending = (min(self.pending[0], lo), max(self.pending[1], hi))
+
+    def _ranges(self):
+        # -> True if the x or y range had to change (full redraw needed)
+        t_end = self.buffer.total * self.dt
+        x0, x1 = self.ax.get_xlim()
+        changed = False
+        if t_end > x1:
+            if self.window_s is None:
+                while x1 < t_end:
+                    x1 *= 2
+            else:
+                x0 = t_end - 0.5 * self.window_s
+                x1 = x0 + self.window_s
+            self.ax.set_xlim(x0, x1)
+            changed = True
+
+        # the y range only grows, so only new samples can push it out
+        lo, hi = self.pending
+        self.pending = (np.inf, -np.inf)
+        y0, y1 = self.ax.get_ylim()
+        if lo < y0 or hi > y1:
+            pad = 0.1 * (max(hi, y1) - min(lo, y0))
+            self.ax.set_ylim(min(y0, lo - pad), max(y1, hi + pad))
+            changed = True
+        return changed
+
+    def draw(self):
+        t = time.perf_counter()
+        canvas = self.fig.canvas
+        if self._ranges() or self.background is None:
+            canvas.draw()
+            self.background = canvas.copy_from_bbox(self.ax.bbox)
+            self.relayouts += 1
+
+        x0, x1 = self.ax.get_xlim()
+        start, values = self.buffer.view(int(np.ceil(x0 / self.dt)), int(np.floor(x1 / self.dt)) + 1)
+        # columns covered by the samples, at one per horizontal pixel
+        n_cols = max(int(self.ax.bbox.width * len(values) * self.dt / (x1 - x0)), 1)
+        index, y = minmax_downsample(values, n_cols, start)
+        self.line.set_data(index * self.dt, y)
+        self.status.set_text(
+            f"t = {self.buffer.total * self.dt:.2f} s   min = {self.min_value:.3f} m   "
+            f"below threshold: {self.n_below * self.dt:.2f} s"
+        )
+
+        canvas.restore_region(self.background)
+        self.ax.draw_artist(self.line)
+        self.ax.draw_artist(self.status)
+        canvas.blit(self.ax.bbox)
+        canvas.flush_events()
+        self.frames += 1
+        self.draw_s += time.perf_counter() - t
+
+    def run(self, source, fps=TARGET_FPS, duration=None, idle_timeout=None):
+        plt = self.plt
+        plt.show(block=False)
+        period = 1.0 / fps
+        t_start = last_data = next_frame = time.perf_counter()
+        try:
+            while plt.fignum_exists(self.fig.number):
+                new = source.read()
+                now = time.perf_counter()
+                if len(new):
+                    self.push(new)
+                    last_data = now
+                if now >= next_frame:
+                    self.draw()
+                    # frames that could not be drawn in time are dropped
+                    next_frame = max(next_frame + period, time.perf_counter())
+                if source.done:
+                    break
+                if duration is not None and now - t_start >= duration:
+                    break
+                if idle_timeout is not None and now - last_data >= idle_timeout:
+                    break
+                time.sleep(max(0.0, min(next_frame - time.perf_counter(), POLL_S)))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            source.close()
+        if plt.fignum_exists(self.fig.number):
+            self.draw()
+
+        wall = time.perf_counter() - t_start
+        print(f"[Live] {self.buffer.total} samples ({self.buffer.total * self.dt:.2f} s) in {wall:.2f} s, "
+              f"{self.frames} frames ({self.frames / max(wall, 1e-9):.1f} fps, "
+              f"{1e3 * self.draw_s / max(self.frames, 1):.2f} ms/frame, {self.relayouts} full redraws)")
+        print(f"[Live] min distance {self.min_value:.4f} m, {self.n_below * self.dt:.2f} s below {self.threshold} m")
+        parser = getattr(source, "parser", None)
+        if parser is not None and parser.skipped:
+            print(f"[Live] skipped {parser.skipped} non-numeric lines (last ending in {parser.last_skipped[:40]!r})")
+
+    def save(self, path):
+        # the final trace as a static figure, at the saved figure's width
+        for a in (self.line, self.status):
+            a.set_animated(False)
+        self.fig.savefig(path, bbox_inches="tight")
+        for a in (self.line, self.status):
+            a.set_animated(True)
+        print(f"[Saved] {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Live min-distance-vs-time plot.")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--replay", nargs="?", const=NPY_PATH, metavar="NPY")
+    src.add_argument("--pipe", action="store_true", help="read samples from stdin")
+    src.add_argument("--socket", metavar="HOST:PORT", help="listen for one TCP client")
+    src.add_argument("--file", metavar="PATH", help="follow a growing text file")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed (x real time, <= 0: unthrottled)")
+    parser.add_argument("--dt", type=float, default=DT)
+    parser.add_argument("--window", type=float, default=WINDOW_S, help="seconds shown (default: whole run)")
+    parser.add_argument("--fps", type=float, default=TARGET_FPS)
+    parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    parser.add_argument("--idle-timeout", type=float, help="stop after this many seconds without data")
+    parser.add_argument("--save", metavar="PDF", help="write the final trace here")
+    args = parser.parse_args()
+
+    if args.replay:
+        source = ReplaySource(args.replay, args.dt, args.speed)
+    elif args.pipe:
+        source = pipe_source()
+    elif args.socket:
+        source = socket_source(args.socket)
+    else:
+        source = FileTailSource(args.file)
+
+    live = LivePlot(dt=args.dt, window_s=args.window)
+    live.run(source, fps=args.fps, duration=args.duration, idle_timeout=args.idle_timeout)
+    if args.save:
+        live.save(args.save)
@@ -1,19 +1,50 @@
 import os
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib as mpl
-from matplotlib.lines import Line2D
-from matplotlib.patches import Patch
+
+import tex_cache
+import instrument
+from rollout_store import open_rollouts, iter_rollout_chunks
+from rollout_outcomes import COLLIDED, LABEL_NAMES, classify, event_points, scene_from
+from rollout_render import (
+    rollout_polylines,
+    add_rollout_lines,
+    decimate_polylines,
+    rasterize_segments,
+    density_bytes_per_value,
+    add_density_image,
+)
 
 # ============================
-# Hard-coded NPZ path
+# Hard-coded NPZ path (a rollout_store directory also works)
 # ============================
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 NPZ_PATH = os.path.join(SCRIPT_DIR, "rollouts_xy_data_test.npz")
 PDF_OUT = os.path.join(SCRIPT_DIR, "deepreach.pdf")
 
-
-plt.rcParams.update({
+# "batched": one LineCollection + one crash scatter for all rollouts; every
+#            kept vertex stays on the axes until savefig, so memory grows with
+#            the total (decimated) vertex count
+# "density": rollouts accumulated into one occupancy image (vector overlays);
+#            the only mode whose memory is bounded by MAX_CHUNK_BYTES
+# "per_rollout": one ax.plot / ax.scatter per rollout (original behaviour)
+RENDER_MODE = "batched"
+# Goal radius for archives that do not store goal_tol (rollouts_xy_data_test
+# stops its SUCCESS rollouts within 0.05 of goal_point)
+GOAL_TOL = 0.05
+# Screen-space simplification tolerance for batched rollouts (None disables)
+DECIMATE_TOL_PX = 0.5
+# (ny, nx) occupancy grid over the plot window for render_mode="density"
+DENSITY_GRID = (400, 500)
+# Upper bound on the working set of one streamed chunk of rollouts (density
+# mode also caps its per-chunk segment samples at the same budget)
+MAX_CHUNK_BYTES = 256 << 20
+# Summary conditions selecting the rollouts to draw, e.g. ["collided"] or
+# ["min_clearance < 0.1"] (see rollout_summary.py); None draws all
+ROLLOUT_FILTER = None
+
+
+# Applied by apply_style(); pyplot is only imported once inputs are loaded
+RC_PARAMS = {
     "font.size": 14,
     "font.family": "serif",
     "font.serif": ["cmr10"],
@@ -21,7 +52,15 @@ plt.rcParams.update({
     "text.usetex": True,
     "pdf.fonttype": 42,   # embed fonts in PDF
     "ps.fonttype": 42,
-})
+}
+
+
+def apply_style():
+    import matplotlib.pyplot as plt
+
+    plt.rcParams.update(RC_PARAMS)
+    if RC_PARAMS["text.usetex"]:
+        tex_cache.configure()
 
 
 def maybe(npz, key, default=None):
@@ -29,6 +68,8 @@ def maybe(npz, key, default=None):
 
 
 def draw_circle(ax, center, radius):
+    import matplotlib.pyplot as plt
+
     c = plt.Circle(
         center,
         radius,
@@ -42,6 +83,8 @@ def draw_circle(ax, center, radius):
 
 
 def draw_goal(ax, goal_point, goal_tol):
+    import matplotlib.pyplot as plt
+
     g = plt.Circle(
         goal_point,
         goal_tol,
@@ -61,6 +104,8 @@ def draw_goal(ax, goal_point, goal_tol):
 
 
 def draw_init_box(ax, init_center, init_half_extents):
+    import matplotlib.pyplot as plt
+
     cx, cy = init_center
     hx, hy = init_half_extents
     r = plt.Rectangle(
@@ -95,80 +140,16 @@ def draw_labeled_point(ax, xy, label, *, color="black", marker="o", text_dx=0.03
     )
 
 
-def main():
-    if not os.path.exists(NPZ_PATH):
-        raise FileNotFoundError(f"NPZ file not found: {NPZ_PATH}")
-
-    print(f"[Loading] {NPZ_PATH}")
-    npz = np.load(NPZ_PATH, allow_pickle=True)
-
-    paths = npz["paths"]          # (N, T, 3)
-    lengths = npz["lengths"]      # (N,)
-
-    goal_point = maybe(npz, "goal_point")
-    goal_tol = maybe(npz, "goal_tol")
-    obs_center = maybe(npz, "obs_center")
-    obs_radius = maybe(npz, "obs_radius")
-    init_center = maybe(npz, "init_center")
-    init_half_extents = maybe(npz, "init_half_extents")
-
-    N, T, D = paths.shape
-    assert D == 3, f"Expected paths[...,3], got {paths.shape}"
-
-    fig, ax = plt.subplots(figsize=(6.5, 6.5))
+def draw_frame(ax):
+    # Everything that does not depend on the scenario file: start/goal
+    # markers, labels and the fixed plot window
 
     # draw_labeled_point(ax, (-0.75, -0.75), "Start", color="black")
     # draw_labeled_point(ax, (1.0, 0.4), "Goal", color="black", marker="*")
     draw_labeled_point(ax, (-0.75, -0.75), "Start", color="black", marker="o", text_dx=0.03, text_dy=0.04)
     draw_labeled_point(ax, (1.0, 0.4), "Goal", color="black", marker="*", text_dx=-0.06, text_dy=0.05)
 
-    # Decorations
-    if obs_center is not None and obs_radius is not None:
-        draw_circle(
-            ax,
-            (float(obs_center[0]), float(obs_center[1])),
-            float(obs_radius),
-        )
-
-    if init_center is not None and init_half_extents is not None:
-        draw_init_box(ax, init_center, init_half_extents)
-
-    if goal_point is not None and goal_tol is not None:
-        draw_goal(
-            ax,
-            (float(goal_point[0]), float(goal_point[1])),
-            float(goal_tol),
-        )
-
-    # Plot trajectories
-    for i in range(N):
-        Li = int(lengths[i])
-        if Li <= 0:
-            continue
-
-        traj = paths[i, :Li]
-        x, y = traj[:, 0], traj[:, 1]
-
-        ax.plot(
-            x,
-            y,
-            color="#ff7f0e",
-            linewidth=3.0,
-            alpha=0.4,
-            zorder=2,
-        )
-
-        # ---- crash criterion ----
-        if x[-1] < 0.8:
-            ax.scatter(
-                x[-1],
-                y[-1],
-                marker="X",
-                s=80,
-                color="darkred",
-                zorder=7,
-            )
-
+    # Axes first: decimation works in screen space
     ax.set_aspect("equal", adjustable="box")
     ax.set_xlabel("$p_x$", fontsize=20)
     ax.set_ylabel("$p_y$", fontsize=20)
@@ -176,6 +157,11 @@ def main():
     ax.set_xlim(-0.8, 1.2)
     ax.set_ylim(-1, 0.6)
 
+
+def add_legend(ax):
+    from matplotlib.lines import Line2D
+    from matplotlib.patches import Patch
+
     legend_handles = [
         Patch(
             facecolor="red",
@@ -202,7 +188,7 @@ def main():
         ),
     ]
 
-    ax.legend(
+    return ax.legend(
         handles=legend_handles,
         loc="lower right",
         fontsize=16,
@@ -210,11 +196,199 @@ def main():
         ncol=1,
         framealpha=0.9,
     )
-    fig.savefig(PDF_OUT, bbox_inches="tight")
+
+
+def draw_scenario(
+    ax,
+    npz_path,
+    render_mode=RENDER_MODE,
+    rollout_range=None,
+    time_range=None,
+    decimate_tol_px=DECIMATE_TOL_PX,
+    max_chunk_bytes=MAX_CHUNK_BYTES,
+    rollout_filter=ROLLOUT_FILTER,
+):
+    # Adds the artists of one rollout file (obstacle, init box, goal,
+    # rollouts, crash markers) to an axes prepared by draw_frame
+    #   -> {"rollouts", "outcomes", "removed", "vertices"}
+    with instrument.phase("load"):
+        npz = open_rollouts(npz_path)
+
+        # paths (N, T, 3) / lengths (N,) are streamed in chunks below
+        goal_point = maybe(npz, "goal_point")
+        goal_tol = maybe(npz, "goal_tol")
+        obs_center = maybe(npz, "obs_center")
+        obs_radius = maybe(npz, "obs_radius")
+        init_center = maybe(npz, "init_center")
+        init_half_extents = maybe(npz, "init_half_extents")
+        scene = scene_from(npz, GOAL_TOL)
+        npz.close()
+
+    # Decorations
+    with instrument.phase("decorations"):
+        if obs_center is not None and obs_radius is not None:
+            draw_circle(
+                ax,
+                (float(obs_center[0]), float(obs_center[1])),
+                float(obs_radius),
+            )
+
+        if init_center is not None and init_half_extents is not None:
+            draw_init_box(ax, init_center, init_half_extents)
+
+        if goal_point is not None and goal_tol is not None:
+            draw_goal(
+                ax,
+                (float(goal_point[0]), float(goal_point[1])),
+                float(goal_tol),
+            )
+
+    # Plot trajectories, one bounded chunk of rollouts at a time. Only the
+    # (decimated) artists, the density grid and crash points outlive a chunk;
+    # in batched mode those artists hold every kept vertex until savefig.
+    if render_mode not in ("batched", "density", "per_rollout"):
+        raise ValueError(f"Unknown render_mode: {render_mode!r}")
+
+    extent = (*ax.get_xlim(), *ax.get_ylim())
+    counts = np.zeros(DENSITY_GRID, dtype=np.int64)
+    crash_xy = []
+    outcome_counts = np.zeros(len(LABEL_NAMES), dtype=np.int64)
+    n_rollouts = n_removed = n_in = 0
+    bytes_per_value = density_bytes_per_value(3) if render_mode == "density" else 64
+
+    if rollout_filter:
+        # filter on the per-rollout summary, then read only the matches
+        from rollout_summary import load_or_build, iter_selected
+
+        with instrument.phase("summary"):
+            selected = load_or_build(npz_path, "paths", GOAL_TOL).select(*rollout_filter)
+        chunks = iter_selected(
+            npz_path,
+            selected,
+            "paths",
+            "lengths",
+            max_chunk_bytes=max_chunk_bytes,
+            bytes_per_value=bytes_per_value,
+            rollout_range=rollout_range,
+            time_range=time_range,
+        )
+    else:
+        chunks = iter_rollout_chunks(
+            npz_path,
+            "paths",
+            "lengths",
+            max_chunk_bytes=max_chunk_bytes,
+            bytes_per_value=bytes_per_value,
+            rollout_range=rollout_range,
+            time_range=time_range,
+        )
+    for _, paths, lengths in instrument.timed(chunks, "load"):
+        N, T, D = paths.shape
+        assert D == 3, f"Expected paths[...,3], got {paths.shape}"
+        n_rollouts += N
+
+        with instrument.phase("rollouts"):
+            if render_mode == "density":
+                counts += rasterize_segments(paths, lengths, extent, DENSITY_GRID, max_bytes=max_chunk_bytes)
+            elif render_mode == "batched":
+                if decimate_tol_px is None:
+                    polylines = rollout_polylines(paths, lengths)
+                else:
+                    polylines, removed, total = decimate_polylines(ax, paths, lengths, tol_px=decimate_tol_px)
+                    n_removed += removed
+                    n_in += total
+                add_rollout_lines(
+                    ax,
+                    polylines,
+                    color="#ff7f0e",
+                    linewidth=3.0,
+                    alpha=0.4,
+                    zorder=2,
+                )
+            else:
+                for i in range(N):
+                    Li = int(lengths[i])
+                    if Li <= 0:
+                        continue
+
+                    traj = paths[i, :Li]
+                    ax.plot(
+                        traj[:, 0],
+                        traj[:, 1],
+                        color="#ff7f0e",
+                        linewidth=3.0,
+                        alpha=0.4,
+                        zorder=2,
+                    )
+
+        # ---- outcomes: crash markers sit at the first obstacle contact ----
+        with instrument.phase("classify"):
+            labels, index = classify(paths, lengths, **scene)
+        outcome_counts += np.bincount(labels, minlength=len(LABEL_NAMES))
+        crash_xy.append(event_points(paths, index)[labels == COLLIDED])
+
+    if render_mode == "density":
+        with instrument.phase("rollouts"):
+            add_density_image(ax, counts, extent, color="#ff7f0e", zorder=2)
+
+    crash_xy = np.concatenate(crash_xy) if crash_xy else np.zeros((0, 2))
+    with instrument.phase("crashes"):
+        if len(crash_xy):
+            ax.scatter(
+                crash_xy[:, 0],
+                crash_xy[:, 1],
+                marker="X",
+                s=80,
+                color="darkred",
+                zorder=7,
+            )
+    return {"rollouts": n_rollouts, "outcomes": outcome_counts, "removed": n_removed, "vertices": n_in}
+
+
+def main(
+    render_mode=RENDER_MODE,
+    rollout_range=None,
+    time_range=None,
+    decimate_tol_px=DECIMATE_TOL_PX,
+    max_chunk_bytes=MAX_CHUNK_BYTES,
+    rollout_filter=ROLLOUT_FILTER,
+):
+    if not os.path.exists(NPZ_PATH):
+        raise FileNotFoundError(f"NPZ file not found: {NPZ_PATH}")
+
+    print(f"[Loading] {NPZ_PATH}")
+    with instrument.phase("setup"):
+        import matplotlib.pyplot as plt
+
+        apply_style()
+        fig, ax = plt.subplots(figsize=(6.5, 6.5))
+        draw_frame(ax)
+    stats = draw_scenario(
+        ax, NPZ_PATH, render_mode, rollout_range, time_range, decimate_tol_px, max_chunk_bytes, rollout_filter
+    )
+
+    if stats["vertices"]:
+        print(f"[Decimate] removed {stats['removed']}/{stats['vertices']} vertices (tol={decimate_tol_px}px)")
+    print(f"[Outcomes] {stats['rollouts']} rollouts: " + ", ".join(
+        f"{name}={stats['outcomes'][code]}" for code, name in LABEL_NAMES.items()
+    ))
+
+    with instrument.phase("legend"):
+        add_legend(ax)
+    instrument.record_figure(fig, PDF_OUT)
+    with instrument.phase("savefig"):
+        fig.savefig(PDF_OUT, bbox_inches="tight")
     plt.close(fig)
 
     print(f"[Saved] {PDF_OUT}")
+    if RC_PARAMS["text.usetex"]:
+        print(f"[TexCache] {tex_cache.summary()}")
 
 
 if __name__ == "__main__":
-    main()
+    import sys
+
+    # --where COND (repeatable), e.g. --where collided --where "min_clearance < 0.1"
+    args = sys.argv[1:]
+    where = [args[i + 1] for i, a in enumerate(args[:-1]) if a == "--where"]
+    main(rollout_filter=where or ROLLOUT_FILTER)
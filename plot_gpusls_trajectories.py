@@ -1,18 +1,63 @@
 import os
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.lines import Line2D
-from matplotlib.patches import Patch, Rectangle
-from matplotlib.collections import PatchCollection
+
+import tex_cache
+import instrument
+from rollout_store import open_rollouts, iter_rollout_chunks
+from rollout_outcomes import COLLIDED, LABEL_NAMES, classify, event_points, scene_from
+from rollout_render import (
+    rollout_polylines,
+    add_rollout_lines,
+    decimate_polylines,
+    finite_lengths,
+    rasterize_segments,
+    density_bytes_per_value,
+    add_density_image,
+    valid_tube_mask,
+    tube_keep_mask,
+    tube_vertices,
+    add_tube_boxes,
+)
 
 # ============================
-# Hard-coded NPZ path
+# Hard-coded NPZ path (a rollout_store directory also works)
 # ============================
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 NPZ_PATH = os.path.join(SCRIPT_DIR, "sls_vs_deepreach.npz")
 PDF_OUT = os.path.join(SCRIPT_DIR, "deepreach_with_tubes.pdf")
 
-plt.rcParams.update({
+# "batched": rollouts as one LineCollection per chunk; every kept vertex stays
+#            on the axes until savefig, so memory grows with the total
+#            (decimated) vertex count
+# "density": rollouts accumulated into one occupancy image (vector overlays);
+#            the only mode whose memory is bounded by MAX_CHUNK_BYTES
+RENDER_MODE = "batched"
+# Screen-space simplification tolerance for rollouts (None disables)
+DECIMATE_TOL_PX = 0.5
+# (ny, nx) occupancy grid over the plot window for render_mode="density"
+DENSITY_GRID = (400, 500)
+# Screen-space motion (px) below which consecutive tube boxes are merged
+TUBE_TOL_PX = 1.0
+# Upper bound on the working set of one streamed chunk of rollouts (density
+# mode also caps its per-chunk segment samples at the same budget)
+MAX_CHUNK_BYTES = 256 << 20
+# Summary conditions selecting the rollouts to draw, e.g. ["collided"] or
+# ["min_clearance < 0.1"] (see rollout_summary.py); None draws all
+ROLLOUT_FILTER = None
+
+# Your desired annotations
+START_XY = (-0.75, -0.75)
+GOAL_XY = (1.0, 0.4)
+
+# --- Styling ---
+ROLLOUT_COLOR = "#ff7f0e"   # muted orange
+CRASH_COLOR = "darkred"
+TUBE_FACE = "tab:blue"      # tubes color (fill)
+TUBE_ALPHA = 0.12
+TUBE_STRIDE = "auto"        # or an int (1 = every rectangle, 2/3 = fewer)
+
+# Applied by apply_style(); pyplot is only imported once inputs are loaded
+RC_PARAMS = {
     "font.size": 14,
     "font.family": "serif",
     "font.serif": ["cmr10"],
@@ -20,7 +65,15 @@ plt.rcParams.update({
     "text.usetex": True,
     "pdf.fonttype": 42,
     "ps.fonttype": 42,
-})
+}
+
+
+def apply_style():
+    import matplotlib.pyplot as plt
+
+    plt.rcParams.update(RC_PARAMS)
+    if RC_PARAMS["text.usetex"]:
+        tex_cache.configure()
 
 
 def maybe(npz, key, default=None):
@@ -28,6 +81,8 @@ def maybe(npz, key, default=None):
 
 
 def draw_circle(ax, center, radius):
+    import matplotlib.pyplot as plt
+
     c = plt.Circle(
         center,
         radius,
@@ -60,117 +115,58 @@ def draw_labeled_point(ax, xy, label, *, color="black", marker="o", text_dx=0.03
     )
 
 
-def main():
-    if not os.path.exists(NPZ_PATH):
-        raise FileNotFoundError(f"NPZ file not found: {NPZ_PATH}")
-
-    print(f"[Loading] {NPZ_PATH}")
-    npz = np.load(NPZ_PATH, allow_pickle=True)
-
-    # --- Required arrays (from your saver) ---
-    xs = np.asarray(npz["xs"])                 # (N_rollouts, T, 3) or (T, 3)
-    centers = np.asarray(npz["centers"])       # (K, 2)
-    radii = np.asarray(npz["radii"]).reshape(-1)
-
-    lowers_xy = np.asarray(npz["lowers_xy"])   # (n_steps, N+1, 2)
-    uppers_xy = np.asarray(npz["uppers_xy"])   # (n_steps, N+1, 2)
-    plans_xy  = maybe(npz, "plans_xy", None)   # optional
-
-    # If you saved only one tube set, step_idx=0 is correct
-    step_idx = 0
-    step_idx = int(np.clip(step_idx, 0, lowers_xy.shape[0] - 1))
-
-    # Normalize xs to (N_rollouts, T, 3)
-    if xs.ndim == 2 and xs.shape[1] == 3:
-        xs = xs[None, :, :]
-    if xs.ndim != 3 or xs.shape[2] != 3:
-        raise ValueError(f"Expected xs shape (N_rollouts, T, 3). Got {xs.shape}")
-
-    n_rollouts, T, _ = xs.shape
-
-    # Your desired annotations
-    start_xy = (-0.75, -0.75)
-    goal_xy = (1.0, 0.4)
+def draw_frame(ax):
+    # Everything that does not depend on the scenario file
+    # --- Start / Goal annotations ---
+    draw_labeled_point(ax, START_XY, "Start", color="black", marker="o", text_dx=0.03, text_dy=-0.1)
+    draw_labeled_point(ax, GOAL_XY, "Goal", color="black", marker="*", text_dx=-0.06, text_dy=0.03)
 
-    # --- Styling ---
-    rollout_color = "#ff7f0e"   # muted orange
-    crash_color = "darkred"
-    tube_face = "tab:blue"      # tubes color (fill)
-    tube_alpha = 0.12
-    tube_stride = 1             # increase to 2/3 if you want fewer rectangles
+    # --- Axes styling ---
+    ax.set_aspect("equal", adjustable="box")
+    ax.set_xlabel("$p_x$", fontsize=20)
+    ax.set_ylabel("$p_y$", fontsize=20)
+    ax.grid(True, alpha=0.3)
 
-    fig, ax = plt.subplots(figsize=(6.5, 6.5))
+    # Match your framing (edit if desired)
+    ax.set_xlim(-0.8, 1.2)
+    ax.set_ylim(-1, 0.6)
 
-    # --- Start / Goal annotations ---
-    draw_labeled_point(ax, start_xy, "Start", color="black", marker="o", text_dx=0.03, text_dy=-0.1)
-    draw_labeled_point(ax, goal_xy, "Goal", color="black", marker="*", text_dx=-0.06, text_dy=0.03)
 
-    # --- Obstacles ---
+def draw_obstacles(ax, centers, radii):
     if centers.size and radii.size:
         for c, r in zip(centers, radii):
             draw_circle(ax, (float(c[0]), float(c[1])), float(r))
 
-    # --- Tubes (from lowers/uppers at chosen step) ---
-    lo = lowers_xy[step_idx]  # (N+1, 2)
-    up = uppers_xy[step_idx]  # (N+1, 2)
 
-    rects = []
-    stride = max(1, int(tube_stride))
-    for k in range(0, lo.shape[0], stride):
-        w = up[k, 0] - lo[k, 0]
-        h = up[k, 1] - lo[k, 1]
-        if not np.isfinite(w) or not np.isfinite(h):
-            continue
-        if w <= 0.0 or h <= 0.0:
-            continue
-        rects.append(Rectangle((lo[k, 0], lo[k, 1]), w, h))
-
-    tube_boxes = PatchCollection(
-        rects,
-        facecolor=tube_face,
-        edgecolor="none",
-        alpha=tube_alpha,
-        zorder=1,
-    )
-    ax.add_collection(tube_boxes)
+def draw_static(ax, centers, radii):
+    draw_frame(ax)
+    draw_obstacles(ax, centers, radii)
 
-    # --- Optional: planned nominal (if present) ---
 
-    # --- Rollouts + crash markers ---
-    for i in range(n_rollouts):
-        x = xs[i, :, 0]
-        y = xs[i, :, 1]
-
-        ax.plot(
-            x,
-            y,
-            color=rollout_color,
-            linewidth=3.0,
-            alpha=0.40,
-            zorder=2,
-        )
+def tube_keep(ax, lo, up, tube_stride=TUBE_STRIDE):
+    # Boxes of one tube set (lo/up: (N+1, 2)) that get drawn
+    if tube_stride == "auto":
+        return tube_keep_mask(ax, lo, up, tol_px=TUBE_TOL_PX)
+    keep = np.zeros(lo.shape[0], dtype=bool)
+    keep[::max(1, int(tube_stride))] = True
+    return keep & valid_tube_mask(lo, up)
 
-    # --- Axes styling ---
-    ax.set_aspect("equal", adjustable="box")
-    ax.set_xlabel("$p_x$", fontsize=20)
-    ax.set_ylabel("$p_y$", fontsize=20)
-    ax.grid(True, alpha=0.3)
 
-    # Match your framing (edit if desired)
-    ax.set_xlim(-0.8, 1.2)
-    ax.set_ylim(-1, 0.6)
+def add_legend(ax):
+    from matplotlib.lines import Line2D
+    from matplotlib.patches import Patch
 
     # --- Legend (Obstacle / Crashes / DeepReach rollouts / Robust tubes) ---
     # You asked earlier for 3 items; now that we're plotting tubes, I’m including it as a 4th.
     # If you want ONLY 3 entries, tell me which one to drop.
     legend_handles = [
         Patch(facecolor="red", edgecolor="darkred", alpha=0.25, label="Obstacle"),
-        Line2D([], [], marker="X", linestyle="None", color=crash_color, markersize=9, label="Crashes"),
-        Line2D([], [], color=rollout_color, linewidth=3.0, alpha=0.75, label="GPU-SLS\nrollouts"),
-        Patch(facecolor=tube_face, edgecolor="none", alpha=min(0.35, tube_alpha * 3.0), label="Robust tubes"),
+        Line2D([], [], marker="X", linestyle="None", color=CRASH_COLOR, markersize=9, label="Crashes"),
+        Line2D([], [], color=ROLLOUT_COLOR, linewidth=3.0, alpha=0.75, label="GPU-SLS\nrollouts"),
+        Patch(facecolor=TUBE_FACE, edgecolor="none", alpha=min(0.35, TUBE_ALPHA * 3.0), label="Robust tubes"),
     ]
 
-    ax.legend(
+    return ax.legend(
         handles=legend_handles,
         loc="lower right",
         fontsize=16,
@@ -181,10 +177,180 @@ def main():
         framealpha=0.9,
     )
 
-    fig.savefig(PDF_OUT, bbox_inches="tight")
+
+def draw_scenario(
+    ax,
+    npz_path,
+    render_mode=RENDER_MODE,
+    rollout_range=None,
+    time_range=None,
+    decimate_tol_px=DECIMATE_TOL_PX,
+    max_chunk_bytes=MAX_CHUNK_BYTES,
+    rollout_filter=ROLLOUT_FILTER,
+):
+    # Adds the artists of one rollout file (obstacles, tubes, rollouts, crash
+    # markers) to an axes prepared by draw_frame
+    #   -> {"rollouts", "outcomes", "removed", "vertices"}
+    with instrument.phase("load"):
+        npz = open_rollouts(npz_path)
+
+        # --- Required arrays (from your saver) ---
+        # xs (N_rollouts, T, 3) or (T, 3) is streamed in chunks below
+        centers = np.asarray(npz["centers"])       # (K, 2)
+        radii = np.asarray(npz["radii"]).reshape(-1)
+
+        lowers_xy = np.asarray(npz["lowers_xy"])   # (n_steps, N+1, 2)
+        uppers_xy = np.asarray(npz["uppers_xy"])   # (n_steps, N+1, 2)
+        plans_xy  = maybe(npz, "plans_xy", None)   # optional
+        scene = scene_from(npz)                    # obstacles + x_goal / goal_tol
+        npz.close()
+
+    # If you saved only one tube set, step_idx=0 is correct
+    step_idx = 0
+    step_idx = int(np.clip(step_idx, 0, lowers_xy.shape[0] - 1))
+
+    with instrument.phase("decorations"):
+        draw_obstacles(ax, centers, radii)
+
+    # --- Tubes (from lowers/uppers at chosen step) ---
+    lo = lowers_xy[step_idx]  # (N+1, 2)
+    up = uppers_xy[step_idx]  # (N+1, 2)
+
+    with instrument.phase("tubes"):
+        keep = tube_keep(ax, lo, up)
+        add_tube_boxes(
+            ax,
+            tube_vertices(lo, up, keep),
+            facecolor=TUBE_FACE,
+            alpha=TUBE_ALPHA,
+            zorder=1,
+        )
+
+    # --- Optional: planned nominal (if present) ---
+
+    # --- Rollouts + crash markers ---
+    # Streamed in bounded chunks; NaN-padded tails end each rollout. In
+    # batched mode the line artists hold every kept vertex until savefig.
+    if render_mode not in ("batched", "density"):
+        raise ValueError(f"Unknown render_mode: {render_mode!r}")
+
+    extent = (*ax.get_xlim(), *ax.get_ylim())
+    counts = np.zeros(DENSITY_GRID, dtype=np.int64)
+    crash_xy = []
+    outcome_counts = np.zeros(len(LABEL_NAMES), dtype=np.int64)
+    n_rollouts = n_removed = n_in = 0
+    bytes_per_value = density_bytes_per_value(3) if render_mode == "density" else 64
+
+    if rollout_filter:
+        # filter on the per-rollout summary, then read only the matches
+        from rollout_summary import load_or_build, iter_selected
+
+        with instrument.phase("summary"):
+            selected = load_or_build(npz_path, "xs", None).select(*rollout_filter)
+        chunks = iter_selected(
+            npz_path,
+            selected,
+            "xs",
+            max_chunk_bytes=max_chunk_bytes,
+            bytes_per_value=bytes_per_value,
+            rollout_range=rollout_range,
+            time_range=time_range,
+        )
+    else:
+        chunks = iter_rollout_chunks(
+            npz_path,
+            "xs",
+            max_chunk_bytes=max_chunk_bytes,
+            bytes_per_value=bytes_per_value,
+            rollout_range=rollout_range,
+            time_range=time_range,
+        )
+    for _, xs, _ in instrument.timed(chunks, "load"):
+        # chunks are always (n, T, D); (T, 3) files come through as n=1
+        if xs.ndim != 3 or xs.shape[2] != 3:
+            raise ValueError(f"Expected xs shape (N_rollouts, T, 3). Got {xs.shape}")
+        lengths = finite_lengths(xs)
+        n_rollouts += len(xs)
+
+        with instrument.phase("classify"):
+            labels, index = classify(xs, lengths, **scene)
+        outcome_counts += np.bincount(labels, minlength=len(LABEL_NAMES))
+        crash_xy.append(event_points(xs, index)[labels == COLLIDED])
+
+        with instrument.phase("rollouts"):
+            if render_mode == "density":
+                counts += rasterize_segments(xs, lengths, extent, DENSITY_GRID, max_bytes=max_chunk_bytes)
+                continue
+
+            if decimate_tol_px is None:
+                polylines = rollout_polylines(xs, lengths)
+            else:
+                polylines, removed, total = decimate_polylines(ax, xs, lengths, tol_px=decimate_tol_px)
+                n_removed += removed
+                n_in += total
+            add_rollout_lines(
+                ax,
+                polylines,
+                color=ROLLOUT_COLOR,
+                linewidth=3.0,
+                alpha=0.40,
+                zorder=2,
+            )
+
+    if render_mode == "density":
+        with instrument.phase("rollouts"):
+            add_density_image(ax, counts, extent, color=ROLLOUT_COLOR, zorder=2)
+    crash_xy = np.concatenate(crash_xy) if crash_xy else np.zeros((0, 2))
+    with instrument.phase("crashes"):
+        if len(crash_xy):
+            ax.scatter(crash_xy[:, 0], crash_xy[:, 1], marker="X", s=80, color=CRASH_COLOR, zorder=7)
+
+    return {"rollouts": n_rollouts, "outcomes": outcome_counts, "removed": n_removed, "vertices": n_in}
+
+
+def main(
+    render_mode=RENDER_MODE,
+    rollout_range=None,
+    time_range=None,
+    decimate_tol_px=DECIMATE_TOL_PX,
+    max_chunk_bytes=MAX_CHUNK_BYTES,
+    rollout_filter=ROLLOUT_FILTER,
+):
+    if not os.path.exists(NPZ_PATH):
+        raise FileNotFoundError(f"NPZ file not found: {NPZ_PATH}")
+
+    print(f"[Loading] {NPZ_PATH}")
+    with instrument.phase("setup"):
+        import matplotlib.pyplot as plt
+
+        apply_style()
+        fig, ax = plt.subplots(figsize=(6.5, 6.5))
+        draw_frame(ax)
+    stats = draw_scenario(
+        ax, NPZ_PATH, render_mode, rollout_range, time_range, decimate_tol_px, max_chunk_bytes, rollout_filter
+    )
+
+    if stats["vertices"]:
+        print(f"[Decimate] removed {stats['removed']}/{stats['vertices']} vertices (tol={decimate_tol_px}px)")
+    print(f"[Outcomes] {stats['rollouts']} rollouts: " + ", ".join(
+        f"{name}={stats['outcomes'][code]}" for code, name in LABEL_NAMES.items()
+    ))
+
+    with instrument.phase("legend"):
+        add_legend(ax)
+    instrument.record_figure(fig, PDF_OUT)
+    with instrument.phase("savefig"):
+        fig.savefig(PDF_OUT, bbox_inches="tight")
     plt.close(fig)
     print(f"[Saved] {PDF_OUT}")
+    if RC_PARAMS["text.usetex"]:
+        print(f"[TexCache] {tex_cache.summary()}")
 
 
 if __name__ == "__main__":
-    main()
+    import sys
+
+    # --where COND (repeatable), e.g. --where collided --where "min_clearance < 0.1"
+    args = sys.argv[1:]
+    where = [args[i + 1] for i, a in enumerate(args[:-1]) if a == "--where"]
+    main(rollout_filter=where or ROLLOUT_FILTER)
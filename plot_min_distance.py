@@ -1,11 +1,12 @@
+import sys
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.ticker import MultipleLocator
+
+import instrument
 
 # -----------------------------
-# Matplotlib styling (paper-ready)
+# Matplotlib styling (paper-ready; applied in main, pyplot is imported lazily)
 # -----------------------------
-plt.rcParams.update({
+RC_PARAMS = {
     "font.size": 18,
     "font.family": "serif",
     "font.serif": ["cmr10"],
@@ -13,42 +14,128 @@ plt.rcParams.update({
     "text.usetex": False,
     "pdf.fonttype": 42,   # embed fonts (Type 42)
     "ps.fonttype": 42,
-})
+}
 
-# -----------------------------
-# Load data
-# -----------------------------
-min_distance = np.load("minimum_distance_np.npy")
+NPY_PATH = "minimum_distance_np.npy"
+PDF_OUT = "minimum_distance_vs_time.pdf"
+DT = 0.01
+OBSTACLE_RADIUS = 0.6
 
-dt = 0.01
-t = np.arange(len(min_distance)) * dt
+# The curve is reduced to the min/max of every print pixel column
+# (downsample.py) before plotting; traces with fewer than 2 samples per
+# column are plotted as is. Only zoomed plots (TIME_WINDOW / --window) save
+# the pyramid next to NPY_PATH; the default figure builds it in memory
+FIG_SIZE = (8, 4)
+DOWNSAMPLE_DPI = 300
+# (t0, t1) in seconds to zoom to, None for the whole trace
+TIME_WINDOW = None
+# 2 s ticks up to this span, automatic ticks beyond
+FIXED_TICK_MAX_SPAN_S = 60.0
 
-# -----------------------------
-# Plot
-# -----------------------------
-plt.figure(figsize=(8, 4))
-plt.plot(t, min_distance, label="Min distance to obstacle")
-plt.axhline(0.6, linestyle="--", linewidth=2, label="Obstacle radius (0.6 m)")
+# "curve":    the precomputed single min-distance curve in NPY_PATH
+# "envelope": safety_metrics over every rollout in ROLLOUT_PATH (signed
+#             distance to the nearest obstacle, min and percentile band)
+MODE = "curve"
+ROLLOUT_PATH = "sls_vs_deepreach.npz"
+ENVELOPE_PDF_OUT = "minimum_distance_envelope.pdf"
+ENVELOPE_BAND = (5, 95)
 
-ax = plt.gca()
 
-# X-axis ticks and limits
-ax.xaxis.set_major_locator(MultipleLocator(2.0))
-ax.set_xlim(t.min(), t.max())
+def plot_curve(plt, time_window=TIME_WINDOW):
+    import downsample
 
-# Major grid lines on both axes
-ax.grid(True, axis="y")
-ax.grid(True, axis="x")
+    with instrument.phase("load"):
+        pyramid = downsample.load_or_build(NPY_PATH, save=time_window is not None)
+    if time_window is None:
+        i0, i1 = 0, len(pyramid)
+    else:
+        i0, i1 = int(np.ceil(time_window[0] / DT)), int(np.floor(time_window[1] / DT)) + 1
+    with instrument.phase("downsample"):
+        index, min_distance = pyramid.window(i0, i1, int(FIG_SIZE[0] * DOWNSAMPLE_DPI))
+    t = index * DT
 
-plt.xlabel("Time [s]")
-plt.ylabel("Distance [m]")
-plt.legend()
-plt.tight_layout()
+    with instrument.phase("artists"):
+        plt.figure(figsize=FIG_SIZE)
+        plt.plot(t, min_distance, label="Min distance to obstacle")
+        plt.axhline(OBSTACLE_RADIUS, linestyle="--", linewidth=2, label=f"Obstacle radius ({OBSTACLE_RADIUS} m)")
+    return t, "Time [s]"
+
+
+def plot_envelope(plt, rollout_path=ROLLOUT_PATH):
+    import safety_metrics
+
+    lo_q, hi_q = ENVELOPE_BAND
+    with instrument.phase("load"):
+        m = safety_metrics.compute(rollout_path, percentiles=(lo_q, 50, hi_q))
+    print(f"[Safety] {rollout_path}")
+    print(m.summary())
+    t = m.time[m.count > 0]
+    steps = m.count > 0
+
+    with instrument.phase("artists"):
+        plt.figure(figsize=(8, 4))
+        plt.fill_between(t, m.percentiles[lo_q][steps], m.percentiles[hi_q][steps], alpha=0.3, linewidth=0,
+                         label=f"{lo_q}-{hi_q}th percentile ({m.n_rollouts} rollouts)")
+        plt.plot(t, m.percentiles[50][steps], linewidth=1.5, label="Median clearance")
+        plt.plot(t, m.min[steps], linewidth=2, label="Min clearance")
+        plt.axhline(0.0, color="k", linestyle="--", linewidth=2, label="Obstacle boundary")
+        if m.violated.any():
+            plt.plot(m.violation_times, np.zeros(m.violated.sum()), "x", color="darkred", markersize=8,
+                     markeredgewidth=2, linestyle="None", label="First violation")
+    # archives without dt are plotted against the step index
+    return t, m.time_label
+
+
+def main(mode=MODE, rollout_path=ROLLOUT_PATH, time_window=TIME_WINDOW):
+    with instrument.phase("setup"):
+        import matplotlib.pyplot as plt
+        from matplotlib.ticker import MultipleLocator
+
+        plt.rcParams.update(RC_PARAMS)
+
+    # -----------------------------
+    # Plot
+    # -----------------------------
+    if mode == "envelope":
+        t, xlabel = plot_envelope(plt, rollout_path)
+        pdf_out = ENVELOPE_PDF_OUT
+    else:
+        t, xlabel = plot_curve(plt, time_window)
+        pdf_out = PDF_OUT
+
+    ax = plt.gca()
+
+    with instrument.phase("layout"):
+        # X-axis ticks and limits
+        x0, x1 = (t.min(), t.max()) if time_window is None else time_window
+        if x1 - x0 <= FIXED_TICK_MAX_SPAN_S:
+            ax.xaxis.set_major_locator(MultipleLocator(2.0))
+        ax.set_xlim(x0, x1)
+
+        # Major grid lines on both axes
+        ax.grid(True, axis="y")
+        ax.grid(True, axis="x")
+
+        plt.xlabel(xlabel)
+        plt.ylabel("Distance [m]")
+        plt.legend()
+        plt.tight_layout()
+
+    # -----------------------------
+    # Save to PDF
+    # -----------------------------
+    instrument.record_figure(plt.gcf(), pdf_out)
+    with instrument.phase("savefig"):
+        plt.savefig(pdf_out, bbox_inches="tight")
+
+    # Optional: also display interactively
+    # plt.show()
 
-# -----------------------------
-# Save to PDF
-# -----------------------------
-plt.savefig("minimum_distance_vs_time.pdf", bbox_inches="tight")
 
-# Optional: also display interactively
-# plt.show()
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    window = TIME_WINDOW
+    if "--window" in args:
+        i = args.index("--window")
+        window = (float(args[i + 1]), float(args[i + 2]))
+    main(mode="envelope" if "--envelope" in args else MODE, time_window=window)
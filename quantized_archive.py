@@ -0,0 +1,226 @@
+import os
+import json
+import argparse
+import itertools
+import numpy as np
+
+from rollout_store import RolloutStore, iter_npz_rows, iter_npz_rows_at, member_shape, row_groups
+
+# ============================
+# Reduced-precision rollout archives
+# ============================
+# The trajectory / tube members are only ever drawn in a ~2 m window, so
+# float64 (or even float32) carries far more precision than a printed figure
+# can show. The writer re-encodes them as either
+#
+#   "float32"  a plain cast, or
+#   "int16"    16-bit codes on the member's per-component [min, max] range,
+#              delta-encoded along the time axis (mod 2^16) so the zip
+#              compressor sees mostly small values; NaNs go to a packed
+#              per-rollout bitmask,
+#
+# and refuses any encoding whose round-trip error exceeds MAX_ERROR (an int16
+# member falls back to float32, then to the original dtype). The codec
+# parameters live in a JSON "__codec__" member; open_rollouts() wraps such
+# archives in QuantizedArchive, which dequantizes transparently, so every
+# loader in the repo reads them unchanged.
+CODEC_KEY = "__codec__"
+QUANTIZED_KEYS = ("paths", "xs", "lowers_xy", "uppers_xy", "plans_xy", "vertices")
+MODES = ("int16", "float32")
+# default absolute error bound in data units (m): ~1/10 of a print pixel for
+# a 2 m window in a 6.5 in figure at 300 dpi
+MAX_ERROR = 1e-4
+QMAX = 65534
+
+
+def _rows(arr):
+    # (T, C) members are one row; (N, T, ..., C) members are N rows
+    return arr[None] if arr.ndim == 2 else arr
+
+
+def encode_int16(arr):
+    # -> (delta codes uint16, packed NaN mask or None, lo, scale, max error)
+    a = _rows(np.asarray(arr, dtype=np.float64))
+    finite = np.isfinite(a)
+    axes = tuple(range(a.ndim - 1))
+    # range of the finite values; a component with none (all NaN) is coded
+    # as lo=0, scale=1 and decoded entirely from the NaN mask
+    lo = np.min(a, axis=axes, where=finite, initial=np.inf)
+    hi = np.max(a, axis=axes, where=finite, initial=-np.inf)
+    empty = ~np.isfinite(lo)
+    lo[empty] = 0.0
+    hi[empty] = 0.0
+    scale = (hi - lo) / QMAX
+    scale[scale == 0] = 1.0
+
+    q = np.rint((np.where(finite, a, lo) - lo) / scale).astype(np.uint16)
+    err = np.abs(q * scale + lo - a)[finite].max(initial=0.0)
+    if np.isinf(a).any():
+        # the mask only restores NaN, so +-inf cannot be int16-coded
+        err = np.inf
+
+    d = q.copy()
+    d[:, 1:] -= q[:, :-1]          # wraps mod 2^16; undone by a uint16 cumsum
+    nan = None if finite.all() else np.packbits(~finite.reshape(len(a), -1), axis=1)
+    return d, nan, lo, scale, float(err)
+
+
+def dequantize_rows(d, nan, spec, out, scratch):
+    # Decodes a block of rows into the preallocated `out` (any float dtype)
+    # using `scratch` (uint16, same shape) for the running sum
+    np.cumsum(d, axis=1, dtype=np.uint16, out=scratch)
+    np.multiply(scratch, np.asarray(spec["scale"]), out=out, casting="same_kind")
+    out += np.asarray(spec["lo"], dtype=out.dtype)
+    if nan is not None:
+        row = int(np.prod(out.shape[1:]))
+        mask = np.unpackbits(nan, axis=1, count=row).view(bool).reshape(out.shape)
+        out[mask] = np.nan
+    return out
+
+
+def write_archive(src, dst, mode="int16", max_error=MAX_ERROR, keys=QUANTIZED_KEYS, compress=True):
+    # -> {key: (encoding, max error, stored bytes)} for the re-encoded members
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+    z = np.load(src, allow_pickle=True)
+    members, codec, report = {}, {}, {}
+    for key in z.files:
+        arr = z[key]
+        if key not in keys or arr.dtype.kind != "f" or arr.ndim < 2:
+            members[key] = arr
+            continue
+
+        if mode == "int16":
+            d, nan, lo, scale, err = encode_int16(arr)
+            if err <= max_error:
+                members[key + "__q"] = d
+                if nan is not None:
+                    members[key + "__nan"] = nan
+                codec[key] = {"mode": "int16", "shape": list(arr.shape), "dtype": arr.dtype.str,
+                              "lo": lo.tolist(), "scale": scale.tolist(), "max_error": err}
+                report[key] = ("int16", err, d.nbytes + (0 if nan is None else nan.nbytes))
+                continue
+
+        a32 = arr.astype(np.float32)
+        finite = np.isfinite(arr)
+        err = float(np.abs(a32[finite].astype(np.float64) - arr[finite]).max(initial=0.0))
+        if err <= max_error:
+            members[key] = a32
+            report[key] = ("float32", err, a32.nbytes)
+        else:
+            members[key] = arr
+            report[key] = (arr.dtype.name, 0.0, arr.nbytes)
+
+    members[CODEC_KEY] = np.array(json.dumps({"version": 1, "max_error": max_error, "members": codec}))
+    (np.savez_compressed if compress else np.savez)(dst, **members)
+    return report
+
+
+class QuantizedArchive:
+    # NpzFile-like view (files / in / [] / close) of an archive written by
+    # write_archive, NPZ or rollout_store directory; quantized members are
+    # dequantized on access (full member) or streamed with iter_rows.
+
+    def __init__(self, source, path):
+        self.source = source
+        self.path = path
+        self.codec = json.loads(str(source[CODEC_KEY]))["members"]
+        internal = {CODEC_KEY} | {k + s for k in self.codec for s in ("__q", "__nan")}
+        self.files = [k for k in source.files if k not in internal] + list(self.codec)
+        self._cache = {}
+
+    def __contains__(self, key):
+        return key in self.files
+
+    def is_quantized(self, key):
+        return key in self.codec
+
+    def shape(self, key):
+        if key in self.codec:
+            return tuple(self.codec[key]["shape"])
+        return member_shape(self.source, self.path, key)
+
+    def __getitem__(self, key):
+        if key not in self.codec:
+            return self.source[key]
+        if key not in self._cache:
+            spec = self.codec[key]
+            d = np.asarray(self.source[key + "__q"])
+            nan = np.asarray(self.source[key + "__nan"]) if key + "__nan" in self.source.files else None
+            out = np.empty(d.shape, dtype=spec["dtype"])
+            dequantize_rows(d, nan, spec, out, np.empty(d.shape, dtype=np.uint16))
+            self._cache[key] = out.reshape(spec["shape"])
+        return self._cache[key]
+
+    def iter_rows(self, key, r0, r1, rows_per_chunk, dtype=None, reuse_buffer=True):
+        # (start, rows) of a quantized (N, T, ..., C) member, dequantized one
+        # chunk at a time into a buffer allocated once (reuse_buffer=True:
+        # each yielded array is overwritten by the next chunk)
+        spec = self.codec[key]
+        dtype = np.dtype(dtype or spec["dtype"])
+        has_nan = key + "__nan" in self.source.files
+        if isinstance(self.source, RolloutStore):
+            d_all = self.source[key + "__q"]
+            nan_all = self.source[key + "__nan"] if has_nan else None
+            d_chunks = ((a, d_all[a:min(a + rows_per_chunk, r1)]) for a in range(r0, r1, rows_per_chunk))
+            nan_chunks = (None if nan_all is None else nan_all[a:min(a + rows_per_chunk, r1)]
+                          for a in range(r0, r1, rows_per_chunk))
+        else:
+            d_chunks = iter_npz_rows(self.path, key + "__q", r0, r1, rows_per_chunk)
+            nan_chunks = ((n for _, n in iter_npz_rows(self.path, key + "__nan", r0, r1, rows_per_chunk))
+                          if has_nan else itertools.repeat(None))
+
+        yield from self._dequantize_chunks(spec, dtype, d_chunks, nan_chunks,
+                                           min(rows_per_chunk, max(r1 - r0, 0)), reuse_buffer)
+
+    def iter_rows_at(self, key, indices, rows_per_chunk, dtype=None, reuse_buffer=True):
+        # (indices, rows) of the listed rollouts only, like iter_rows
+        spec = self.codec[key]
+        dtype = np.dtype(dtype or spec["dtype"])
+        has_nan = key + "__nan" in self.source.files
+        if isinstance(self.source, RolloutStore):
+            d_all = self.source[key + "__q"]
+            nan_all = self.source[key + "__nan"] if has_nan else None
+            groups = list(row_groups(indices, rows_per_chunk))
+            d_chunks = ((picked, d_all[picked]) for picked in groups)
+            nan_chunks = (None if nan_all is None else nan_all[picked] for picked in groups)
+        else:
+            d_chunks = iter_npz_rows_at(self.path, key + "__q", indices, rows_per_chunk)
+            nan_chunks = ((n for _, n in iter_npz_rows_at(self.path, key + "__nan", indices, rows_per_chunk))
+                          if has_nan else itertools.repeat(None))
+        yield from self._dequantize_chunks(spec, dtype, d_chunks, nan_chunks,
+                                           min(rows_per_chunk, len(np.unique(indices))), reuse_buffer)
+
+    def _dequantize_chunks(self, spec, dtype, d_chunks, nan_chunks, max_rows, reuse_buffer):
+        shape = tuple(spec["shape"])
+        full = (max_rows,) + shape[1:]
+        out, scratch = np.empty(full, dtype=dtype), np.empty(full, dtype=np.uint16)
+        for (a, d), nan in zip(d_chunks, nan_chunks):
+            n = len(d)
+            if not reuse_buffer:
+                out = np.empty((n,) + shape[1:], dtype=dtype)
+            yield a, dequantize_rows(d, nan, spec, out[:n], scratch[:n])
+
+    def close(self):
+        self._cache.clear()
+        self.source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a reduced-precision copy of a rollout archive.")
+    parser.add_argument("src")
+    parser.add_argument("dst")
+    parser.add_argument("--mode", choices=MODES, default="int16")
+    parser.add_argument("--max-error", type=float, default=MAX_ERROR, help="absolute round-trip error bound")
+    args = parser.parse_args()
+
+    report = write_archive(args.src, args.dst, args.mode, args.max_error)
+    for key, (enc, err, nbytes) in report.items():
+        print(f"[Encode] {key:<10} {enc:<8} max error {err:.2e}  {nbytes / 1024:.1f} KiB raw")
+    print(f"[Saved] {args.dst}: {os.path.getsize(args.src) / 1024:.1f} KiB -> {os.path.getsize(args.dst) / 1024:.1f} KiB")
@@ -0,0 +1,177 @@
+import os
+import sys
+import zipfile
+import numpy as np
+
+# ============================
+# Ragged rollout container
+# ============================
+# Padded archives store rollouts as a dense (N, T, D) `paths` array plus
+# `lengths`, so every rollout costs T rows however short it is. The ragged
+# layout keeps only the valid rows:
+#
+#   vertices (V, D) float32   all rollouts' rows back to back
+#   offsets  (N + 1,) int64   rollout i is vertices[offsets[i]:offsets[i + 1]]
+#
+# Rollout i is a zero-copy view into `vertices`. A ragged NPZ carries every
+# other member of the padded archive unchanged (goal_point, obs_center, ...),
+# and rollout_store.iter_rollout_chunks streams it as padded chunks, so the
+# plotting, classification and metric code reads either layout.
+RAGGED_KEYS = ("vertices", "offsets")
+# members of the padded layouts that the ragged one replaces
+PADDED_KEYS = ("paths", "lengths", "xs")
+
+
+def is_ragged(source):
+    return all(k in source.files for k in RAGGED_KEYS)
+
+
+class RaggedTrajectories:
+    def __init__(self, vertices, offsets):
+        self.vertices = vertices
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.vertices[self.offsets[i]:self.offsets[i + 1]]
+
+    def __iter__(self):
+        for a, b in zip(self.offsets[:-1], self.offsets[1:]):
+            yield self.vertices[a:b]
+
+    @property
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    @property
+    def max_length(self):
+        return int(self.lengths.max()) if len(self) else 0
+
+    @property
+    def dim(self):
+        return self.vertices.shape[1]
+
+    def rollout_ids(self):
+        # rollout index of every vertex
+        return np.repeat(np.arange(len(self)), self.lengths)
+
+    def subset(self, r0=None, r1=None):
+        # rollouts [r0, r1) sharing this container's vertex buffer
+        r0, r1, _ = slice(r0, r1).indices(len(self))
+        offsets = self.offsets[r0:r1 + 1]
+        return RaggedTrajectories(self.vertices[offsets[0]:offsets[-1]], offsets - offsets[0])
+
+    def take(self, indices):
+        # the listed rollouts, gathered into a new vertex buffer
+        indices = np.asarray(indices, dtype=np.int64)
+        lengths = self.lengths[indices]
+        offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        starts = np.repeat(self.offsets[indices], lengths)
+        within = np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths)
+        return RaggedTrajectories(self.vertices[starts + within], offsets)
+
+    @classmethod
+    def from_padded(cls, paths, lengths=None, dtype=np.float32):
+        # lengths=None: the leading run of finite rows (NaN-padded tails)
+        paths = np.asarray(paths)
+        N, T = paths.shape[:2]
+        if lengths is None:
+            finite = np.isfinite(paths[..., :2]).all(axis=-1)
+            lengths = np.where(finite.all(axis=1), T, np.argmin(finite, axis=1))
+        lengths = np.clip(np.asarray(lengths).astype(np.int64), 0, T)
+        offsets = np.zeros(N + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return cls(paths[np.arange(T) < lengths[:, None]].astype(dtype, copy=False), offsets)
+
+    def to_padded(self, T=None, fill=np.nan):
+        # -> (paths (N, T, D), lengths); rows past a rollout's length = fill
+        lengths = self.lengths
+        T = self.max_length if T is None else T
+        out = np.full((len(self), T, self.dim), fill, dtype=self.vertices.dtype)
+        keep = np.minimum(lengths, T)
+        rows = np.repeat(np.arange(len(self)), keep)
+        starts = np.repeat(self.offsets[:-1], keep)
+        cols = np.arange(keep.sum()) - np.repeat(np.cumsum(keep) - keep, keep)
+        out[rows, cols] = self.vertices[starts + cols]
+        return out, np.minimum(lengths, T)
+
+
+def as_ragged(paths, lengths=None):
+    # Passes a RaggedTrajectories through; padded (N, T, D) rollouts keep
+    # their valid rows in their own dtype (lengths=None: finite prefix)
+    if isinstance(paths, RaggedTrajectories):
+        return paths
+    paths = np.asarray(paths)
+    return RaggedTrajectories.from_padded(paths, lengths, dtype=paths.dtype)
+
+
+def iter_padded_chunks(ragged, rows_per_chunk, rollout_range=None, time_range=None):
+    # (start, padded chunk, lengths) over rollout_range; every chunk is
+    # padded to the longest rollout so chunks stack along axis 0
+    from rollout_store import select_rollouts
+
+    T = ragged.max_length
+    r0, r1, _ = slice(*(rollout_range or (None, None))).indices(len(ragged))
+    for a in range(r0, r1, rows_per_chunk):
+        paths, lengths = ragged.subset(a, min(a + rows_per_chunk, r1)).to_padded(T)
+        yield (a,) + select_rollouts(paths, lengths, None, time_range)
+
+
+# ------------------------------------------------------------
+# Converters between the padded and ragged NPZ layouts
+# ------------------------------------------------------------
+def _members(path):
+    with zipfile.ZipFile(path) as zf:
+        return [n[:-len(".npy")] for n in zf.namelist() if n.endswith(".npy")]
+
+
+def padded_to_ragged(src, dst, key=None, compress=True):
+    # key defaults to "paths" (with "lengths") or "xs" (finite prefix)
+    z = np.load(src, allow_pickle=True)
+    key = key or ("paths" if "paths" in z.files else "xs")
+    lengths = z["lengths"] if key == "paths" and "lengths" in z.files else None
+    paths = z[key]
+    if paths.ndim == 2:
+        paths = paths[None]
+    ragged = RaggedTrajectories.from_padded(paths, lengths)
+    extra = {k: z[k] for k in _members(src) if k not in PADDED_KEYS}
+    (np.savez_compressed if compress else np.savez)(
+        dst, vertices=ragged.vertices, offsets=ragged.offsets, ragged_key=np.array(key), **extra
+    )
+    return ragged
+
+
+def ragged_to_padded(src, dst, compress=True):
+    # restores the original member name; "paths" archives get their lengths
+    z = np.load(src, allow_pickle=True)
+    ragged = RaggedTrajectories(z["vertices"], z["offsets"])
+    key = str(z["ragged_key"]) if "ragged_key" in z.files else "paths"
+    paths, lengths = ragged.to_padded()
+    out = {key: paths}
+    if key == "paths":
+        out["lengths"] = lengths.astype(np.int32)
+    extra = {k: z[k] for k in _members(src) if k not in RAGGED_KEYS + ("ragged_key",)}
+    (np.savez_compressed if compress else np.savez)(dst, **out, **extra)
+
+
+def load_ragged(path):
+    # NPZ (read into memory) or rollout_store directory (memmapped vertices)
+    from rollout_store import open_rollouts
+
+    source = open_rollouts(path)
+    return RaggedTrajectories(source["vertices"], np.asarray(source["offsets"]))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] not in ("to-ragged", "to-padded"):
+        sys.exit("usage: python ragged.py to-ragged|to-padded SRC.npz DST.npz")
+    cmd, src, dst = sys.argv[1:]
+    if cmd == "to-ragged":
+        r = padded_to_ragged(src, dst)
+        print(f"[Ragged] {len(r)} rollouts, {len(r.vertices)} vertices (max length {r.max_length})")
+    else:
+        ragged_to_padded(src, dst)
+    print(f"[Saved] {dst}: {os.path.getsize(src) / 1024:.1f} KiB -> {os.path.getsize(dst) / 1024:.1f} KiB")
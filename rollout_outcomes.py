@@ -0,0 +1,169 @@
+import sys
+import numpy as np
+
+from ragged import RaggedTrajectories
+from rollout_store import open_rollouts, iter_rollout_chunks
+from safety_metrics import obstacles_from
+
+# ============================
+# Rollout outcome classifier
+# ============================
+# Every rollout is labelled from its geometry over all valid timesteps:
+#
+#   COLLIDED  some position is inside an obstacle (||p - c_k|| < r_k)
+#   GOAL      some position is within goal_tol of the goal, before any collision
+#   TIMEOUT   neither happened within the rollout's length
+#
+# together with the index of that first event (-1 for TIMEOUT). A collision
+# and a goal arrival on the same step count as a collision. Steps at or past
+# lengths[i] are ignored, so NaN- or garbage-padded ragged paths both work;
+# a RaggedTrajectories is classified directly on its flat vertex buffer.
+TIMEOUT, GOAL, COLLIDED = 0, 1, 2
+LABEL_NAMES = {TIMEOUT: "timeout", GOAL: "goal", COLLIDED: "collided"}
+MAX_CHUNK_BYTES = 256 << 20
+BLOCK_ROWS = 256
+
+
+def _first_true(mask):
+    # (N, T) bool -> first True column per row, -1 if none
+    return np.where(mask.any(axis=1), mask.argmax(axis=1), -1)
+
+
+def _inside(x, y, center, radius, out):
+    # out = (x - cx)^2 + (y - cy)^2 < r^2, squared and summed in place
+    dx = np.subtract(x, center[0])
+    dy = np.subtract(y, center[1])
+    dx *= dx
+    dy *= dy
+    dx += dy
+    return np.less(dx, radius * radius, out=out)
+
+
+def _first_per_rollout(mask, offsets):
+    # flat per-vertex mask -> first local step per rollout, -1 if none
+    first = np.full(len(offsets) - 1, -1)
+    idx = np.flatnonzero(mask)
+    rollout = np.searchsorted(offsets, idx, side="right") - 1
+    rollout, at = np.unique(rollout, return_index=True)
+    first[rollout] = idx[at] - offsets[rollout]
+    return first
+
+
+def _labels(first_hit, first_goal):
+    collided = (first_hit >= 0) & ((first_goal < 0) | (first_hit <= first_goal))
+    reached = (first_goal >= 0) & ~collided
+    labels = np.full(len(first_hit), TIMEOUT, dtype=np.int8)
+    labels[reached] = GOAL
+    labels[collided] = COLLIDED
+    index = np.where(collided, first_hit, np.where(reached, first_goal, -1)).astype(np.int32)
+    return labels, index
+
+
+def _classify_ragged(ragged, centers, radii, goal, goal_tol):
+    N = len(ragged)
+    first_hit = np.full(N, -1)
+    first_goal = np.full(N, -1)
+    for a in range(0, N, BLOCK_ROWS):
+        block = ragged.subset(a, a + BLOCK_ROWS)
+        x, y = block.vertices[:, 0], block.vertices[:, 1]
+        hit = np.zeros(len(x), dtype=bool)
+        tmp = np.empty(len(x), dtype=bool)
+        for c, r in zip(centers, radii):
+            hit |= _inside(x, y, c, r, tmp)
+        first_hit[a:a + BLOCK_ROWS] = _first_per_rollout(hit, block.offsets)
+        if goal is not None:
+            first_goal[a:a + BLOCK_ROWS] = _first_per_rollout(_inside(x, y, goal, goal_tol, tmp), block.offsets)
+    return _labels(first_hit, first_goal)
+
+
+def classify(paths, lengths=None, centers=(), radii=(), goal=None, goal_tol=None):
+    # paths (N, T, D>=2) or RaggedTrajectories
+    #   -> (labels int8 (N,), event index int32 (N,))
+    centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+    radii = np.ravel(radii)
+    use_goal = goal is not None and goal_tol is not None
+    if use_goal:
+        goal = np.ravel(goal)[:2]
+        goal_tol = float(goal_tol)
+    if isinstance(paths, RaggedTrajectories):
+        return _classify_ragged(paths, centers, radii, goal if use_goal else None, goal_tol)
+
+    N, T = paths.shape[:2]
+    steps = np.arange(T)
+    first_hit = np.full(N, -1)
+    first_goal = np.full(N, -1)
+    # Blocks of rollouts keep the float temporaries cache-resident
+    for a in range(0, N, BLOCK_ROWS):
+        x = paths[a:a + BLOCK_ROWS, :, 0]
+        y = paths[a:a + BLOCK_ROWS, :, 1]
+        valid = None if lengths is None else steps < np.asarray(lengths[a:a + BLOCK_ROWS])[:, None]
+        hit = np.zeros(x.shape, dtype=bool)
+        tmp = np.empty(x.shape, dtype=bool)
+        for c, r in zip(centers, radii):
+            hit |= _inside(x, y, c, r, tmp)
+        if valid is not None:
+            hit &= valid
+        first_hit[a:a + BLOCK_ROWS] = _first_true(hit)
+        if use_goal:
+            at_goal = _inside(x, y, goal, goal_tol, tmp)
+            if valid is not None:
+                at_goal &= valid
+            first_goal[a:a + BLOCK_ROWS] = _first_true(at_goal)
+
+    return _labels(first_hit, first_goal)
+
+
+def event_points(paths, index):
+    # -> (N, 2) position of each rollout's first event (NaN for timeouts)
+    if isinstance(paths, RaggedTrajectories):
+        pts = paths.vertices[np.minimum(paths.offsets[:-1] + np.maximum(index, 0), len(paths.vertices) - 1), :2]
+        pts = pts.astype(float)
+    else:
+        rows = np.arange(len(paths))
+        pts = paths[rows, np.maximum(index, 0), :2].astype(float)
+    pts[index < 0] = np.nan
+    return pts
+
+
+def scene_from(source, goal_tol=None):
+    # -> classify() keyword arguments from either archive layout; goal_tol
+    # is the fallback for archives that do not store one
+    centers, radii = obstacles_from(source)
+    goal = None
+    for key in ("goal_point", "x_goal"):
+        if key in source.files:
+            goal = np.asarray(source[key], dtype=float)
+            break
+    if "goal_tol" in source.files:
+        goal_tol = float(source["goal_tol"])
+    return {"centers": centers, "radii": radii, "goal": goal, "goal_tol": goal_tol}
+
+
+def classify_archive(path, key=None, goal_tol=None, max_chunk_bytes=MAX_CHUNK_BYTES):
+    # streamed over an NPZ or rollout_store directory; "paths" archives use
+    # their "lengths", "xs" archives the finite prefix of every rollout
+    source = open_rollouts(path)
+    try:
+        key = key or ("xs" if "xs" in source.files else "paths")
+        lengths_key = "lengths" if key == "paths" and "lengths" in source.files else None
+        scene = scene_from(source, goal_tol)
+    finally:
+        source.close()
+
+    labels, index = [], []
+    for _, paths, lengths in iter_rollout_chunks(path, key, lengths_key, max_chunk_bytes=max_chunk_bytes,
+                                                 bytes_per_value=8, reuse_buffer=True):
+        if lengths is None:
+            lengths = np.isfinite(paths[..., 0]).sum(axis=1)
+        lab, idx = classify(paths, lengths, **scene)
+        labels.append(lab)
+        index.append(idx)
+    return np.concatenate(labels), np.concatenate(index)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        sys.exit("usage: python rollout_outcomes.py ROLLOUTS.npz|ROLLOUTS.store [GOAL_TOL]")
+    labels, index = classify_archive(sys.argv[1], goal_tol=float(sys.argv[2]) if len(sys.argv) == 3 else None)
+    counts = ", ".join(f"{name}={np.count_nonzero(labels == code)}" for code, name in LABEL_NAMES.items())
+    print(f"[Outcomes] {len(labels)} rollouts: {counts}")
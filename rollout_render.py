@@ -0,0 +1,312 @@
+import numpy as np
+
+from ragged import RaggedTrajectories, as_ragged
+
+# matplotlib is imported inside the artist helpers so that the NumPy stages
+# (decimation, rasterization, tube selection) can be used without it.
+
+
+# ============================
+# Batched rollout rendering helpers
+# ============================
+def rollout_polylines(paths, lengths=None):
+    # Ragged-aware split of padded (N, T, D) rollouts (or a
+    # RaggedTrajectories) into a list of (L_i, 2) views, one per rollout.
+    # Rollouts with L_i < 2 are dropped since they cannot form a segment.
+    if isinstance(paths, RaggedTrajectories):
+        return [r[:, :2] for r in paths if len(r) >= 2]
+    paths = np.asarray(paths)
+    N, T = paths.shape[:2]
+    if lengths is None:
+        lengths = np.full(N, T)
+    lengths = np.clip(np.asarray(lengths).astype(np.int64), 0, T)
+
+    xy = paths[..., :2]
+    return [xy[i, :Li] for i, Li in enumerate(lengths) if Li >= 2]
+
+
+def add_rollout_lines(ax, polylines, *, color, linewidth, alpha, zorder):
+    # One LineCollection for all rollouts instead of one Line2D per rollout.
+    # Each polyline is still stroked separately, so alpha stacks exactly like
+    # it does with individual ax.plot calls.
+    from matplotlib.collections import LineCollection
+
+    lc = LineCollection(
+        polylines,
+        colors=color,
+        linewidths=linewidth,
+        alpha=alpha,
+        zorder=zorder,
+        joinstyle="round",
+        capstyle="projecting",
+    )
+    ax.add_collection(lc)
+    return lc
+
+
+def finite_lengths(paths):
+    # Length of the leading run of finite rows per rollout (NaN-padded tails)
+    finite = np.isfinite(np.asarray(paths)[..., :2]).all(axis=-1)
+    T = finite.shape[1]
+    return np.where(finite.all(axis=1), T, np.argmin(finite, axis=1)).astype(np.int64)
+
+
+# ============================
+# Screen-space decimation (level of detail)
+# ============================
+def segment_distance(p, a, b):
+    # Distance from points p to segments a-b, all (M, 2)
+    ab = b - a
+    denom = np.einsum("ij,ij->i", ab, ab)
+    t = np.einsum("ij,ij->i", p - a, ab) / np.where(denom > 0, denom, 1.0)
+    t = np.clip(t, 0.0, 1.0)
+    proj = a + t[:, None] * ab
+    return np.hypot(*(p - proj).T)
+
+
+def rdp_keep_mask(pix, offsets, tol):
+    # Ramer-Douglas-Peucker over all rollouts at once, on the flat (V, 2)
+    # vertices of a ragged batch (rollout i is pix[offsets[i]:offsets[i + 1]]).
+    # Every open interval of every rollout is refined in the same NumPy pass,
+    # so the Python loop runs once per recursion level instead of once per
+    # rollout.
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lengths = np.diff(offsets)
+    keep = np.zeros(len(pix), dtype=bool)
+
+    rows = np.flatnonzero(lengths > 0)
+    keep[offsets[rows]] = True
+    keep[offsets[rows + 1] - 1] = True
+
+    r = np.flatnonzero(lengths > 2)
+    s = offsets[r]
+    e = offsets[r + 1] - 1
+    while s.size:
+        n_in = e - s - 1
+        live = n_in > 0
+        s, e, n_in = s[live], e[live], n_in[live]
+        if not s.size:
+            break
+
+        starts = np.cumsum(n_in) - n_in
+        seg = np.repeat(np.arange(s.size), n_in)
+        idx = s[seg] + 1 + (np.arange(n_in.sum()) - starts[seg])
+
+        d = segment_distance(pix[idx], pix[s][seg], pix[e][seg])
+        dmax = np.maximum.reduceat(d, starts)
+
+        # first vertex attaining the max in each interval
+        hit = np.flatnonzero(d == dmax[seg])
+        first = hit[np.unique(seg[hit], return_index=True)[1]]
+        m = idx[first]
+
+        split = dmax > tol
+        keep[m[split]] = True
+        s, e, m = s[split], e[split], m[split]
+        s, e = np.concatenate([s, m]), np.concatenate([m, e])
+    return keep
+
+
+def decimate_polylines(ax, paths, lengths=None, tol_px=0.5):
+    # Drops vertices that deviate less than tol_px (display pixels at the
+    # figure DPI) from the simplified polyline. Axis limits and aspect must be
+    # final before calling, since the tolerance is applied in screen space.
+    # Padded rollouts are reduced to their valid rows first; a
+    # RaggedTrajectories is used as is.
+    ragged = as_ragged(paths, lengths)
+    lengths = ragged.lengths
+
+    ax.apply_aspect()
+    xy = np.asarray(ragged.vertices)[:, :2].astype(np.float64)
+    pix = ax.transData.transform(np.nan_to_num(xy))
+
+    keep = rdp_keep_mask(pix, ragged.offsets, tol_px)
+    keep[np.repeat(lengths < 2, lengths)] = False
+
+    counts = np.bincount(ragged.rollout_ids(), weights=keep, minlength=len(ragged)).astype(np.int64)
+    kept = xy[keep]
+    polylines = [p for p in np.split(kept, np.cumsum(counts)[:-1]) if len(p) >= 2]
+
+    n_in = int(lengths[lengths >= 2].sum())
+    n_removed = n_in - int(counts.sum())
+    return polylines, n_removed, n_in
+
+
+# ============================
+# Density (occupancy) rendering
+# ============================
+# Working set of rasterize_segments: bytes per vertex (valid-row copy of a
+# padded chunk, cell-space coordinates, clipped endpoints, rollout ids, sample
+# counts) and bytes per sample point (segment id, parameter, cell indices,
+# inside mask, temporaries).
+SEGMENT_BYTES = 128
+SAMPLE_BYTES = 64
+
+
+def density_bytes_per_value(dim, base=64):
+    # bytes_per_value for rollout chunks fed to rasterize_segments: the
+    # caller's own per-value working set plus the per-step segment arrays
+    # spread over the dim values of a padded step
+    return base + -(-SEGMENT_BYTES // dim)
+
+
+def clip_segments(ua, ub, va, vb, nx, ny):
+    # Liang-Barsky clip of cell-space segments to [0, nx] x [0, ny]. Returns
+    # the clipped endpoints and the mask of segments that touch the grid, so
+    # a segment never needs more than max(nx, ny) * samples_per_cell samples.
+    du, dv = ub - ua, vb - va
+    t0 = np.zeros(ua.shape)
+    t1 = np.ones(ua.shape)
+    hit = np.isfinite(du) & np.isfinite(dv)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for p, q in ((-du, ua), (du, nx - ua), (-dv, va), (dv, ny - va)):
+            r = q / p
+            hit &= (p != 0) | (q >= 0)
+            t0 = np.where(p < 0, np.maximum(t0, r), t0)
+            t1 = np.where(p > 0, np.minimum(t1, r), t1)
+    hit &= t0 <= t1
+    return ua + t0 * du, ua + t1 * du, va + t0 * dv, va + t1 * dv, hit
+
+
+def cell_visits(ua, ub, va, vb, rid, n, nx, ny):
+    # Per-cell number of distinct rollouts among the given (whole) rollouts
+    seg = np.repeat(np.arange(n.size), n)
+    t = (np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)) / np.maximum(n - 1, 1)[seg]
+
+    ci = np.floor(ua[seg] + t * (ub - ua)[seg]).astype(np.int64)
+    cj = np.floor(va[seg] + t * (vb - va)[seg]).astype(np.int64)
+    inside = (ci >= 0) & (ci < nx) & (cj >= 0) & (cj < ny)
+
+    # count each (rollout, cell) pair once
+    cell = cj[inside] * nx + ci[inside]
+    visits = np.unique(rid[seg[inside]] * (nx * ny) + cell)
+    return np.bincount(visits % (nx * ny), minlength=nx * ny)
+
+
+def rasterize_segments(paths, lengths, extent, shape, samples_per_cell=2.0, max_bytes=None):
+    # Occupancy histogram: number of rollouts whose polyline passes through
+    # each cell of a (ny, nx) grid over extent = (x0, x1, y0, y1). Every
+    # segment is clipped to the grid and sampled at >= samples_per_cell points
+    # per cell it crosses, so the cost is O(total vertices + covered cells)
+    # with no per-rollout loop. With max_bytes, samples are expanded for
+    # batches of whole rollouts of at most max_bytes // SAMPLE_BYTES samples
+    # (a single rollout of T steps may still need T * (max(nx, ny) *
+    # samples_per_cell + 2) samples).
+    x0, x1, y0, y1 = extent
+    ny, nx = shape
+    ragged = as_ragged(paths, lengths)
+    xy = np.asarray(ragged.vertices)[:, :2]
+
+    # cell-space coordinates
+    u = (xy[:, 0] - x0) * (nx / (x1 - x0))
+    v = (xy[:, 1] - y0) * (ny / (y1 - y0))
+
+    # a segment starts at every vertex but the last of its rollout
+    starts = np.ones(len(xy), dtype=bool)
+    starts[ragged.offsets[1:][ragged.lengths > 0] - 1] = False
+    a = np.flatnonzero(starts)
+    rid = ragged.rollout_ids()[a]
+    ua, ub, va, vb, hit = clip_segments(u[a], u[a + 1], v[a], v[a + 1], nx, ny)
+    ua, ub, va, vb, rid = ua[hit], ub[hit], va[hit], vb[hit], rid[hit]
+    n = np.ceil(np.maximum(np.abs(ub - ua), np.abs(vb - va)) * samples_per_cell).astype(np.int64) + 1
+
+    counts = np.zeros(nx * ny, dtype=np.int64)
+    if not n.size:
+        return counts.reshape(ny, nx)
+
+    # batches end on rollout boundaries so that deduplication stays local
+    cum = np.concatenate([[0], np.cumsum(n)])
+    ends = np.append(np.flatnonzero(rid[1:] != rid[:-1]) + 1, n.size)
+    limit = cum[-1] if max_bytes is None else max(1, int(max_bytes // SAMPLE_BYTES))
+    i = 0
+    while i < n.size:
+        k = np.searchsorted(cum[ends], cum[i] + limit, side="right") - 1
+        j = ends[k] if k >= 0 and ends[k] > i else ends[np.searchsorted(ends, i, side="right")]
+        counts += cell_visits(ua[i:j], ub[i:j], va[i:j], vb[i:j], rid[i:j], n[i:j], nx, ny)
+        i = j
+    return counts.reshape(ny, nx)
+
+
+def add_density_image(ax, counts, extent, *, color, zorder):
+    # Single embedded image; empty cells are fully transparent so the grid and
+    # vector overlays show through. Log scale keeps sparse outliers visible.
+    from matplotlib.colors import LinearSegmentedColormap, LogNorm, to_rgb
+
+    rgb = to_rgb(color)
+    cmap = LinearSegmentedColormap.from_list("rollout_density", [(*rgb, 0.15), (*rgb, 1.0)])
+    img = np.ma.masked_equal(counts, 0)
+    im = ax.imshow(
+        img,
+        extent=extent,
+        origin="lower",
+        cmap=cmap,
+        norm=LogNorm(vmin=1, vmax=max(int(counts.max()), 2)),
+        interpolation="nearest",
+        zorder=zorder,
+    )
+    return im
+
+
+# ============================
+# Tube rectangles
+# ============================
+def valid_tube_mask(lo, up):
+    # Steps whose box has finite, strictly positive width and height
+    w = np.asarray(up, dtype=float) - np.asarray(lo, dtype=float)
+    return np.isfinite(w).all(axis=-1) & (w > 0.0).all(axis=-1)
+
+
+def tube_keep_mask(ax, lo, up, tol_px=1.0):
+    # Automatic tube stride: walks the valid boxes in order and keeps one box
+    # per tol_px of accumulated corner motion on screen, so boxes that overlap
+    # a kept neighbour to within pixel resolution are merged into it. The
+    # first and last valid boxes are always kept.
+    valid = valid_tube_mask(lo, up)
+    keep = np.zeros(valid.shape, dtype=bool)
+    idx = np.flatnonzero(valid)
+    if idx.size == 0:
+        return keep
+
+    ax.apply_aspect()
+    corners = np.concatenate([lo[idx], up[idx]], axis=0).astype(float)
+    pix = ax.transData.transform(corners)
+    pix = np.concatenate([pix[:idx.size], pix[idx.size:]], axis=1)
+
+    motion = np.abs(np.diff(pix, axis=0)).max(axis=1)
+    bucket = np.floor(np.concatenate([[0.0], np.cumsum(motion)]) / tol_px)
+    first = np.concatenate([[True], bucket[1:] != bucket[:-1]])
+    first[-1] = True
+    keep[idx[first]] = True
+    return keep
+
+
+def tube_vertices(lo, up, keep=None):
+    # (M, 4, 2) corner array of the selected boxes, for one PolyCollection
+    lo = np.asarray(lo, dtype=float)
+    up = np.asarray(up, dtype=float)
+    if keep is None:
+        keep = valid_tube_mask(lo, up)
+    l, u = lo[keep], up[keep]
+    return np.stack(
+        [
+            np.stack([l[:, 0], l[:, 1]], axis=-1),
+            np.stack([u[:, 0], l[:, 1]], axis=-1),
+            np.stack([u[:, 0], u[:, 1]], axis=-1),
+            np.stack([l[:, 0], u[:, 1]], axis=-1),
+        ],
+        axis=1,
+    )
+
+
+def add_tube_boxes(ax, verts, *, facecolor, alpha, zorder):
+    from matplotlib.collections import PolyCollection
+
+    pc = PolyCollection(
+        verts,
+        facecolor=facecolor,
+        edgecolor="none",
+        alpha=alpha,
+        zorder=zorder,
+    )
+    ax.add_collection(pc)
+    return pc
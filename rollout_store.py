@@ -0,0 +1,354 @@
+import os
+import sys
+import json
+import zipfile
+import numpy as np
+
+# ============================
+# Memory-mapped rollout store
+# ============================
+# An NPZ is a zip of compressed .npy members, so np.load has to inflate every
+# member it touches into RAM. A store is a plain directory holding one
+# uncompressed .npy file per NPZ key plus a manifest; every numeric member is
+# opened with mmap_mode="r", so slicing a subset of rollouts / timesteps only
+# pages in the bytes that are actually read.
+#
+#   rollouts_xy_data_test.npz   ->   rollouts_xy_data_test.store/
+#                                        manifest.json
+#                                        paths.npy, lengths.npy, ...
+#
+# Every member is carried over, so both the DeepReach schema (paths, lengths,
+# ...) and the GPU-SLS schema (xs, centers, radii, lowers_xy, uppers_xy,
+# plans_xy, ...) open unchanged.
+
+STORE_SUFFIX = ".store"
+MANIFEST = "manifest.json"
+STORE_VERSION = 1
+
+COPY_CHUNK_BYTES = 64 << 20
+
+
+def store_path_for(npz_path):
+    root, _ = os.path.splitext(npz_path)
+    return root + STORE_SUFFIX
+
+
+def is_store(path):
+    return os.path.isfile(os.path.join(path, MANIFEST))
+
+
+def read_npy_header(fp):
+    # Returns (shape, fortran_order, dtype) and leaves fp at the data offset
+    version = np.lib.format.read_magic(fp)
+    if version == (1, 0):
+        return np.lib.format.read_array_header_1_0(fp)
+    if version in ((2, 0), (3, 0)):
+        return np.lib.format.read_array_header_2_0(fp)
+    raise ValueError(f"Unsupported .npy format version {version}")
+
+
+def _copy_member(zf, name, dst):
+    # Streams one NPZ member into an uncompressed .npy without inflating it
+    # fully in memory. Object arrays cannot be memory-mapped and are pickled.
+    with zf.open(name) as fp:
+        shape, fortran, dtype = read_npy_header(fp)
+    if dtype.hasobject:
+        with zf.open(name) as fp:
+            arr = np.lib.format.read_array(fp, allow_pickle=True)
+        np.save(dst, arr, allow_pickle=True)
+        return shape, dtype
+
+    out = np.lib.format.open_memmap(dst, mode="w+", dtype=dtype, shape=shape, fortran_order=fortran)
+    flat = out.reshape(-1, order="F" if fortran else "C").view(np.uint8)
+    with zf.open(name) as fp:
+        read_npy_header(fp)
+        pos = 0
+        while pos < flat.size:
+            buf = fp.read(min(COPY_CHUNK_BYTES, flat.size - pos))
+            if not buf:
+                raise EOFError(f"Truncated NPZ member {name!r}")
+            flat[pos:pos + len(buf)] = np.frombuffer(buf, dtype=np.uint8)
+            pos += len(buf)
+    out.flush()
+    del out
+    return shape, dtype
+
+
+def import_npz(npz_path, store_dir=None, overwrite=False):
+    store_dir = store_dir or store_path_for(npz_path)
+    if is_store(store_dir) and not overwrite:
+        raise FileExistsError(f"Store already exists: {store_dir}")
+    os.makedirs(store_dir, exist_ok=True)
+
+    manifest = {"version": STORE_VERSION, "source": os.path.abspath(npz_path), "keys": {}}
+    with zipfile.ZipFile(npz_path) as zf:
+        for name in zf.namelist():
+            if not name.endswith(".npy"):
+                continue
+            key = name[:-len(".npy")]
+            shape, dtype = _copy_member(zf, name, os.path.join(store_dir, name))
+            manifest["keys"][key] = {"shape": list(shape), "dtype": dtype.str}
+
+    # manifest last: a store without one is treated as incomplete
+    with open(os.path.join(store_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return RolloutStore(store_dir)
+
+
+class RolloutStore:
+    # Read-only, NpzFile-like view of a store directory (supports `.files`,
+    # `key in store` and `store[key]`, so existing `maybe(npz, key)` works).
+
+    def __init__(self, store_dir):
+        if not is_store(store_dir):
+            raise FileNotFoundError(f"Not a rollout store: {store_dir}")
+        self.path = store_dir
+        with open(os.path.join(store_dir, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        self.files = list(self.manifest["keys"])
+        self._cache = {}
+
+    def __contains__(self, key):
+        return key in self.manifest["keys"]
+
+    def __getitem__(self, key):
+        if key not in self:
+            raise KeyError(f"{key} is not a member of {self.path}")
+        if key not in self._cache:
+            fn = os.path.join(self.path, key + ".npy")
+            if np.dtype(self.manifest["keys"][key]["dtype"]).hasobject:
+                self._cache[key] = np.load(fn, allow_pickle=True)
+            else:
+                self._cache[key] = np.load(fn, mmap_mode="r")
+        return self._cache[key]
+
+    def shape(self, key):
+        return tuple(self.manifest["keys"][key]["shape"])
+
+    def rollouts(self, key, rollout_range=None, time_range=None):
+        # Slice of a (N, T, ...) member; only the selected pages are read
+        arr = self[key]
+        r0, r1 = rollout_range or (None, None)
+        t0, t1 = time_range or (None, None)
+        return arr[r0:r1, t0:t1]
+
+    def close(self):
+        self._cache.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def select_rollouts(paths, lengths=None, rollout_range=None, time_range=None):
+    # Basic slicing keeps memmaps lazy; lengths are shifted/clipped to the window
+    r0, r1 = rollout_range or (None, None)
+    t0, t1 = time_range or (None, None)
+    paths = paths[r0:r1, t0:t1]
+    if lengths is not None:
+        start = t0 or 0
+        lengths = np.clip(np.asarray(lengths[r0:r1]).astype(np.int64) - start, 0, paths.shape[1])
+    return paths, lengths
+
+
+def member_shape(source, path, key):
+    # Shape of one member without reading its data
+    if isinstance(source, RolloutStore) or hasattr(source, "is_quantized"):
+        return source.shape(key)
+    with zipfile.ZipFile(path) as zf, zf.open(key + ".npy") as fp:
+        return tuple(read_npy_header(fp)[0])
+
+
+def chunk_rows(row_shape, max_chunk_bytes, bytes_per_value):
+    # Rollouts per chunk so that a chunk's working set stays under the budget
+    row_values = int(np.prod(row_shape)) if len(row_shape) else 1
+    return max(1, int(max_chunk_bytes // max(1, row_values * bytes_per_value)))
+
+
+def read_streamable_header(fp, path, key):
+    # (shape, dtype) of a member whose rollouts are contiguous byte runs.
+    # Fortran-ordered and object members are refused rather than inflated
+    # whole, which would defeat the caller's memory bound (and unpickle
+    # data from the file).
+    shape, fortran, dtype = read_npy_header(fp)
+    if dtype.hasobject:
+        raise ValueError(f"{path}: member {key!r} is an object array and cannot be streamed; "
+                         f"re-save it with a numeric dtype")
+    if fortran:
+        raise ValueError(f"{path}: member {key!r} is Fortran-ordered, so its rollouts are not contiguous "
+                         f"and cannot be streamed; convert the archive once with "
+                         f"`python rollout_store.py {path}` (import_npz) and read the store instead")
+    return shape, dtype
+
+
+def iter_npz_rows(path, key, r0, r1, rows_per_chunk):
+    # Sequentially decodes rows [r0, r1) of a C-ordered NPZ member, one chunk
+    # at a time, so the member is never fully inflated.
+    with zipfile.ZipFile(path) as zf, zf.open(key + ".npy") as fp:
+        shape, dtype = read_streamable_header(fp, path, key)
+        row_bytes = int(np.prod(shape[1:])) * dtype.itemsize
+        fp.seek(r0 * row_bytes, os.SEEK_CUR)
+        for a in range(r0, r1, rows_per_chunk):
+            n = min(rows_per_chunk, r1 - a)
+            buf = fp.read(n * row_bytes)
+            yield a, np.frombuffer(buf, dtype=dtype).reshape((n,) + tuple(shape[1:]))
+
+
+def row_groups(indices, rows_per_chunk):
+    # Sorted unique indices in groups of at most rows_per_chunk
+    indices = np.unique(np.asarray(indices, dtype=np.int64))
+    for a in range(0, len(indices), rows_per_chunk):
+        yield indices[a:a + rows_per_chunk]
+
+
+def iter_npz_rows_at(path, key, indices, rows_per_chunk):
+    # Decodes only the listed rows of a C-ordered NPZ member: the stream is
+    # skipped forward over the rows in between (the zip still inflates them,
+    # but into a fixed scratch buffer, never into arrays).
+    with zipfile.ZipFile(path) as zf, zf.open(key + ".npy") as fp:
+        shape, dtype = read_streamable_header(fp, path, key)
+        row_bytes = int(np.prod(shape[1:])) * dtype.itemsize
+        pos = 0
+        for picked in row_groups(indices, rows_per_chunk):
+            out = np.empty((len(picked),) + tuple(shape[1:]), dtype=dtype)
+            flat = out.reshape(len(picked), -1).view(np.uint8)
+            # runs of consecutive indices are read in one call
+            breaks = np.flatnonzero(np.diff(picked) != 1) + 1
+            for i, j in zip(np.r_[0, breaks], np.r_[breaks, len(picked)]):
+                fp.seek((int(picked[i]) - pos) * row_bytes, os.SEEK_CUR)
+                buf = fp.read((j - i) * row_bytes)
+                if len(buf) != (j - i) * row_bytes:
+                    raise EOFError(f"Truncated NPZ member {key!r}")
+                flat[i:j] = np.frombuffer(buf, dtype=np.uint8).reshape(j - i, -1)
+                pos = int(picked[j - 1]) + 1
+            yield picked, out
+
+
+def iter_rollout_rows(path, key, indices, lengths_key=None, *, max_chunk_bytes=256 << 20,
+                      bytes_per_value=64, time_range=None, reuse_buffer=False):
+    # Like iter_rollout_chunks but over the listed rollouts only, yielding
+    # (indices, chunk, lengths_chunk) in index order. Store members are
+    # fancy-indexed, so only the selected rows are paged in and copied; NPZ
+    # members are streamed past the unselected rows; quantized and ragged
+    # archives gather the selected rows the same way.
+    source = open_rollouts(path)
+    try:
+        if key not in source.files:
+            from ragged import RaggedTrajectories, is_ragged
+
+            if is_ragged(source):
+                ragged = RaggedTrajectories(source["vertices"], np.asarray(source["offsets"]))
+                rows = chunk_rows((ragged.max_length, ragged.dim), max_chunk_bytes, bytes_per_value)
+                for picked in row_groups(indices, rows):
+                    paths, lengths = ragged.take(picked).to_padded(ragged.max_length)
+                    yield (picked,) + select_rollouts(paths, lengths, None, time_range)
+                return
+
+        shape = member_shape(source, path, key)
+        lengths = None if lengths_key is None else np.asarray(source[lengths_key])
+        if len(shape) == 2:
+            # single rollout saved as (T, D)
+            if 0 in np.asarray(indices):
+                one = None if lengths is None else lengths.reshape(1)
+                yield (np.zeros(1, dtype=np.int64),) + select_rollouts(np.asarray(source[key])[None], one, None,
+                                                                       time_range)
+            return
+
+        indices = np.asarray(indices, dtype=np.int64)
+        if len(indices) and (indices.min() < 0 or indices.max() >= shape[0]):
+            raise IndexError(f"rollout indices out of range for {key!r} with {shape[0]} rollouts")
+        rows = chunk_rows(shape[1:], max_chunk_bytes, bytes_per_value)
+        if hasattr(source, "is_quantized") and source.is_quantized(key):
+            chunks = source.iter_rows_at(key, indices, rows, reuse_buffer=reuse_buffer)
+        elif isinstance(source, RolloutStore):
+            arr = source[key]
+            chunks = ((picked, arr[picked]) for picked in row_groups(indices, rows))
+        else:
+            chunks = iter_npz_rows_at(path, key, indices, rows)
+
+        for picked, chunk in chunks:
+            Lc = None if lengths is None else lengths[picked]
+            yield (picked,) + select_rollouts(chunk, Lc, None, time_range)
+    finally:
+        source.close()
+
+
+def iter_rollout_chunks(path, key, lengths_key=None, *, max_chunk_bytes=256 << 20,
+                        bytes_per_value=64, rollout_range=None, time_range=None, reuse_buffer=False):
+    # Yields (start, chunk, lengths_chunk) over the rollouts of `key`, reading
+    # from a store (memmap slices) or an NPZ (streamed zip member). The chunk
+    # size is chosen so that chunk values * bytes_per_value <= max_chunk_bytes;
+    # bytes_per_value should cover the caller's per-value working set.
+    # Ragged archives (ragged.py) are streamed the same way whatever `key`
+    # names their padded source; lengths then come from their offsets.
+    # Quantized members (quantized_archive.py) are dequantized chunk by chunk;
+    # with reuse_buffer=True every chunk lands in the same preallocated buffer,
+    # so callers must not keep references to a chunk past the next one.
+    source = open_rollouts(path)
+    try:
+        if key not in source.files:
+            from ragged import RaggedTrajectories, is_ragged, iter_padded_chunks
+
+            if is_ragged(source):
+                # ragged archive: vertices are padded one chunk at a time
+                ragged = RaggedTrajectories(source["vertices"], np.asarray(source["offsets"]))
+                rows = chunk_rows((ragged.max_length, ragged.dim), max_chunk_bytes, bytes_per_value)
+                yield from iter_padded_chunks(ragged, rows, rollout_range, time_range)
+                return
+
+        shape = member_shape(source, path, key)
+        lengths = None if lengths_key is None else np.asarray(source[lengths_key])
+        if len(shape) == 2:
+            # single rollout saved as (T, D)
+            one = None if lengths is None else lengths.reshape(1)
+            yield (0,) + select_rollouts(np.asarray(source[key])[None], one, None, time_range)
+            return
+
+        r0, r1, _ = slice(*(rollout_range or (None, None))).indices(shape[0])
+        rows = chunk_rows(shape[1:], max_chunk_bytes, bytes_per_value)
+        if hasattr(source, "is_quantized") and source.is_quantized(key):
+            chunks = source.iter_rows(key, r0, r1, rows, reuse_buffer=reuse_buffer)
+        elif isinstance(source, RolloutStore):
+            arr = source[key]
+            chunks = ((a, np.asarray(arr[a:min(a + rows, r1)])) for a in range(r0, r1, rows))
+        else:
+            chunks = iter_npz_rows(path, key, r0, r1, rows)
+
+        for a, chunk in chunks:
+            Lc = None if lengths is None else lengths[a:a + len(chunk)]
+            yield (a,) + select_rollouts(chunk, Lc, None, time_range)
+    finally:
+        source.close()
+
+
+def open_rollouts(path):
+    # Store directories are memory-mapped. For an .npz, a sibling store that
+    # is at least as new as the archive is preferred over inflating the NPZ.
+    # Archives written by quantized_archive.py are wrapped so that their
+    # reduced-precision members read like the originals.
+    if os.path.isdir(path):
+        source = RolloutStore(path)
+    else:
+        store_dir = store_path_for(path)
+        if is_store(store_dir) and os.path.getmtime(os.path.join(store_dir, MANIFEST)) >= os.path.getmtime(path):
+            source, path = RolloutStore(store_dir), store_dir
+        else:
+            source = np.load(path, allow_pickle=True)
+
+    from quantized_archive import CODEC_KEY, QuantizedArchive
+
+    if CODEC_KEY in source.files:
+        return QuantizedArchive(source, path)
+    return source
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print(f"usage: python {os.path.basename(__file__)} ROLLOUTS.npz [STORE_DIR]")
+        sys.exit(2)
+    src = sys.argv[1]
+    dst = sys.argv[2] if len(sys.argv) == 3 else store_path_for(src)
+    store = import_npz(src, dst, overwrite=True)
+    print(f"[Imported] {src} -> {store.path} ({len(store.files)} arrays)")
@@ -0,0 +1,264 @@
+import os
+import re
+import hashlib
+import argparse
+import numpy as np
+
+from figure_cache import sha256_file
+from rollout_store import is_store, open_rollouts, iter_rollout_chunks, iter_rollout_rows
+from rollout_render import finite_lengths
+from rollout_outcomes import LABEL_NAMES, classify, event_points, scene_from
+from safety_metrics import signed_distance
+from segment_index import source_stamp
+
+# ============================
+# Per-rollout summary index
+# ============================
+# One streamed pass over a rollout file reduces every rollout to a row of
+# scalars (length, final position, bounding box, outcome label and event
+# point, minimum obstacle clearance) saved next to it as <file>.summary.npz,
+# one column per member. Figure and statistics code filter on these columns
+# first ("collided", "min_clearance < 0.1") and then read only the matching
+# trajectories with iter_selected(): store members are fancy-indexed, so only
+# the selected rows are paged in; an NPZ member is streamed past the rows in
+# between (still inflated by the zip, but into a scratch buffer, never kept).
+#
+# The sidecar records the source's content hash. A size/mtime change triggers
+# a re-hash; the summary is rebuilt only if the content actually changed.
+SIDECAR_SUFFIX = ".summary.npz"
+SUMMARY_VERSION = 1
+MAX_CHUNK_BYTES = 256 << 20
+
+# column -> dtype; positions are NaN where undefined (empty rollouts,
+# timeouts have no event point, scenes without obstacles no clearance)
+COLUMNS = {
+    "length": np.int32,
+    "final_x": np.float32,
+    "final_y": np.float32,
+    "x_min": np.float32,
+    "x_max": np.float32,
+    "y_min": np.float32,
+    "y_max": np.float32,
+    "label": np.int8,
+    "event_step": np.int32,
+    "event_x": np.float32,
+    "event_y": np.float32,
+    "min_clearance": np.float32,
+    "min_clearance_step": np.int32,
+}
+LABEL_CODES = {name: code for code, name in LABEL_NAMES.items()}
+OPS = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "==": np.equal,
+    "=": np.equal,
+    "!=": np.not_equal,
+}
+CONDITION = re.compile(r"^\s*(\w+)\s*(<=|>=|==|!=|<|>|=)\s*(\S+)\s*$")
+
+
+def sidecar_path_for(path):
+    return path.rstrip(os.sep) + SIDECAR_SUFFIX
+
+
+def content_hash(path):
+    # store directories are hashed through their members
+    if is_store(path):
+        h = hashlib.sha256()
+        for name in sorted(os.listdir(path)):
+            h.update(name.encode())
+            h.update(sha256_file(os.path.join(path, name)).encode())
+        return h.hexdigest()
+    return sha256_file(path)
+
+
+def summarize_chunk(paths, lengths, scene):
+    # paths (N, T, D>=2), lengths (N,) -> {column: (N,) array}
+    N, T = paths.shape[:2]
+    rows = np.arange(N)
+    valid = np.arange(T) < np.asarray(lengths)[:, None]
+    empty = ~valid.any(axis=1)
+    xy = np.where(valid[..., None], paths[..., :2], np.nan).astype(float)
+
+    out = {"length": lengths}
+    final = xy[rows, np.maximum(np.asarray(lengths) - 1, 0)]
+    out["final_x"], out["final_y"] = final[:, 0], final[:, 1]
+    for i, axis in enumerate("xy"):
+        v = xy[..., i]
+        lo = np.where(valid, v, np.inf).min(axis=1)
+        hi = np.where(valid, v, -np.inf).max(axis=1)
+        out[axis + "_min"] = np.where(empty, np.nan, lo)
+        out[axis + "_max"] = np.where(empty, np.nan, hi)
+
+    labels, index = classify(paths, lengths, **scene)
+    event = event_points(paths, index)
+    out.update(label=labels, event_step=index, event_x=event[:, 0], event_y=event[:, 1])
+
+    if len(scene["radii"]):
+        d = np.where(valid, signed_distance(xy, scene["centers"], scene["radii"]).min(axis=-1), np.inf)
+        step = d.argmin(axis=1)
+        clearance = d[rows, step]
+        missing = ~np.isfinite(clearance)
+        out["min_clearance"] = np.where(missing, np.nan, clearance)
+        out["min_clearance_step"] = np.where(missing, -1, step)
+    else:
+        out["min_clearance"] = np.full(N, np.nan)
+        out["min_clearance_step"] = np.full(N, -1)
+    return {name: np.asarray(out[name]).astype(dtype) for name, dtype in COLUMNS.items()}
+
+
+def parse_condition(text):
+    # "column op value" -> (column, op, value); a bare outcome name such as
+    # "collided" means label == collided
+    text = text.strip()
+    if text in LABEL_CODES:
+        return "label", "==", LABEL_CODES[text]
+    m = CONDITION.match(text)
+    if m is None:
+        raise ValueError(f"Cannot parse condition {text!r} (expected e.g. 'min_clearance < 0.1' or 'collided')")
+    column, op, value = m.groups()
+    if column not in COLUMNS:
+        raise ValueError(f"Unknown summary column {column!r}; one of {', '.join(COLUMNS)}")
+    if column == "label" and value in LABEL_CODES:
+        return column, op, LABEL_CODES[value]
+    return column, op, float(value)
+
+
+class RolloutSummary:
+    def __init__(self, columns, goal_tol=None):
+        self.columns = columns              # column -> (N,) array
+        self.goal_tol = goal_tol
+
+    def __len__(self):
+        return len(self.columns["length"])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def mask(self, *conditions):
+        # all conditions hold (NaN compares False)
+        keep = np.ones(len(self), dtype=bool)
+        for cond in conditions:
+            column, op, value = parse_condition(cond) if isinstance(cond, str) else cond
+            keep &= OPS[op](self.columns[column], value)
+        return keep
+
+    def select(self, *conditions):
+        # -> sorted rollout indices matching all conditions
+        return np.flatnonzero(self.mask(*conditions))
+
+    def outcome_counts(self, indices=None):
+        labels = self.columns["label"] if indices is None else self.columns["label"][indices]
+        return np.bincount(labels, minlength=len(LABEL_NAMES))
+
+    @classmethod
+    def build(cls, path, key=None, goal_tol=None, max_chunk_bytes=MAX_CHUNK_BYTES):
+        source = open_rollouts(path)
+        try:
+            key = key or ("xs" if "xs" in source.files else "paths")
+            lengths_key = "lengths" if key == "paths" and "lengths" in source.files else None
+            scene = scene_from(source, goal_tol)
+        finally:
+            source.close()
+
+        # the (T, K, 2) difference and (T, K) distance temporaries dominate
+        bytes_per_value = 8 * (3 * len(scene["radii"]) + 4)
+        parts = []
+        for _, paths, lengths in iter_rollout_chunks(path, key, lengths_key, max_chunk_bytes=max_chunk_bytes,
+                                                     bytes_per_value=bytes_per_value, reuse_buffer=True):
+            if lengths is None:
+                lengths = finite_lengths(paths)
+            parts.append(summarize_chunk(paths, lengths, scene))
+        columns = {name: np.concatenate([p[name] for p in parts]) if parts else np.zeros(0, dtype)
+                   for name, dtype in COLUMNS.items()}
+        return cls(columns, scene["goal_tol"])
+
+    def save(self, sidecar, stamp, digest, key, fallback_goal_tol):
+        # goal_tol: the radius the labels were computed with; fallback_goal_tol:
+        # the caller's fallback the sidecar is valid for (NaN for None)
+        goal_tol = np.nan if self.goal_tol is None else self.goal_tol
+        with open(sidecar, "wb") as f:
+            np.savez(f, version=SUMMARY_VERSION, stamp=stamp, content_hash=digest, key=key,
+                     fallback_goal_tol=fallback_goal_tol, goal_tol=goal_tol, **self.columns)
+
+    @classmethod
+    def load(cls, sidecar):
+        with np.load(sidecar) as z:
+            columns = {name: z[name] for name in COLUMNS}
+            goal_tol = float(z["goal_tol"])
+        return cls(columns, None if np.isnan(goal_tol) else goal_tol)
+
+
+def load_or_build(path, key=None, goal_tol=None, rebuild=False):
+    # goal_tol is the fallback for archives that do not store one; the
+    # sidecar is only reused for the same key and goal_tol
+    if key is None:
+        source = open_rollouts(path)
+        key = "xs" if "xs" in source.files else "paths"
+        source.close()
+    sidecar = sidecar_path_for(path)
+    stamp = source_stamp(path)
+    want_tol = np.nan if goal_tol is None else float(goal_tol)
+    digest = None
+    if not rebuild and os.path.exists(sidecar):
+        with np.load(sidecar) as z:
+            meta = {name: z[name] for name in ("version", "stamp", "content_hash", "key", "fallback_goal_tol")}
+        same_args = (int(meta["version"]) == SUMMARY_VERSION and str(meta["key"]) == key
+                     and np.array_equal(meta["fallback_goal_tol"], want_tol, equal_nan=True))
+        if same_args and np.array_equal(meta["stamp"], stamp):
+            return RolloutSummary.load(sidecar)
+        if same_args:
+            # touched but possibly unchanged: compare contents before rebuilding
+            digest = content_hash(path)
+            if digest == str(meta["content_hash"]):
+                summary = RolloutSummary.load(sidecar)
+                summary.save(sidecar, stamp, digest, key, want_tol)
+                return summary
+
+    summary = RolloutSummary.build(path, key, goal_tol)
+    summary.save(sidecar, stamp, digest or content_hash(path), key, want_tol)
+    print(f"[Summary] {len(summary)} rollouts -> {sidecar}")
+    return summary
+
+
+def iter_selected(path, indices, key, lengths_key=None, *, max_chunk_bytes=MAX_CHUNK_BYTES, bytes_per_value=64,
+                  rollout_range=None, time_range=None):
+    # Yields (indices, chunk, lengths_chunk) for the selected rollouts only,
+    # in index order, in chunks bounded like iter_rollout_chunks; rollout_range
+    # further restricts the selection
+    indices = np.unique(np.asarray(indices, dtype=np.int64))
+    if rollout_range is not None:
+        r0, r1 = rollout_range
+        if r0 is not None:
+            indices = indices[indices >= r0]
+        if r1 is not None:
+            indices = indices[indices < r1]
+    if len(indices) == 0:
+        return
+    yield from iter_rollout_rows(path, key, indices, lengths_key, max_chunk_bytes=max_chunk_bytes,
+                                 bytes_per_value=bytes_per_value, time_range=time_range)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build / filter the per-rollout summary of a rollout file.")
+    parser.add_argument("path", help="NPZ or rollout_store directory")
+    parser.add_argument("--where", action="append", default=[], metavar="COND",
+                        help="filter, e.g. 'collided' or 'min_clearance < 0.1' (repeatable, all must hold)")
+    parser.add_argument("--key", help="trajectory member (default: xs / paths)")
+    parser.add_argument("--goal-tol", type=float, help="goal radius for archives that do not store one")
+    parser.add_argument("--rebuild", action="store_true")
+    args = parser.parse_args()
+
+    summary = load_or_build(args.path, args.key, args.goal_tol, args.rebuild)
+    picked = summary.select(*args.where)
+    counts = summary.outcome_counts(picked)
+    print(f"[Select] {len(picked)}/{len(summary)} rollouts" + (f" where {' and '.join(args.where)}" if args.where else ""))
+    print("[Outcomes] " + ", ".join(f"{name}={counts[code]}" for code, name in LABEL_NAMES.items()))
+    if len(picked):
+        clearance = summary["min_clearance"][picked]
+        print(f"[Length] mean {summary['length'][picked].mean():.1f}, max {summary['length'][picked].max()}")
+        if np.isfinite(clearance).any():
+            print(f"[Clearance] min {np.nanmin(clearance):.4f} m, median {np.nanmedian(clearance):.4f} m")
+        print(f"[Rollouts] {' '.join(map(str, picked[:20]))}{' ...' if len(picked) > 20 else ''}")
@@ -0,0 +1,248 @@
+import sys
+import numpy as np
+
+from rollout_store import open_rollouts, iter_rollout_chunks
+
+# ============================
+# Rollout safety metrics
+# ============================
+# For every rollout n, timestep t and circular obstacle k the signed distance
+#
+#   d[n, t, k] = ||p[n, t] - c[k]|| - r[k]        (< 0: inside obstacle k)
+#
+# is evaluated by broadcasting over (N, T, K), a bounded chunk of rollouts at
+# a time, and folded into running state in one pass over the data: per step
+# the rollout count and min clearance (min_k d), per rollout the
+# first-violation step and the obstacle it hit. Percentile envelopes come
+# from a (T, HISTOGRAM_BINS) count histogram over a shared value range that
+# doubles its bin width whenever a chunk falls outside it, so they are
+# accurate to half a bin width (SafetyMetrics.resolution) and memory does not
+# grow with N. exact=True keeps the full (N, T) clearance instead and takes
+# exact percentiles over it.
+PERCENTILES = (5, 50, 95)
+MAX_CHUNK_BYTES = 256 << 20
+HISTOGRAM_BINS = 1024
+
+
+def obstacles_from(source):
+    # -> (centers (K, 2), radii (K,)) from either archive layout:
+    # sls_vs_deepreach (centers, radii) or the deepreach rollouts
+    # (obs_center, obs_radius)
+    if "centers" in source.files:
+        centers, radii = source["centers"], source["radii"]
+    else:
+        centers, radii = source["obs_center"], source["obs_radius"]
+    centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+    radii = np.broadcast_to(np.asarray(radii, dtype=float).reshape(-1), (len(centers),))
+    return centers, radii
+
+
+def signed_distance(xy, centers, radii):
+    # xy (..., 2) -> (..., K); NaN positions give NaN distances
+    diff = xy[..., None, :] - centers
+    return np.sqrt(np.einsum("...kd,...kd->...k", diff, diff)) - radii
+
+
+def first_below(clearance, threshold=0.0):
+    # first step with clearance < threshold per rollout, -1 if never
+    below = clearance < threshold
+    return np.where(below.any(axis=1), below.argmax(axis=1), -1)
+
+
+class SafetyMetrics:
+    def __init__(self, dt, percentiles=PERCENTILES, exact=False, bins=HISTOGRAM_BINS):
+        self.dt = dt                        # None: unknown, times are in steps
+        self.percentile_levels = tuple(percentiles)
+        self.exact = exact
+        self.bins = bins + bins % 2         # halved when the range doubles
+        self.n_rollouts = 0
+        self.count = None                   # (T,) rollouts still running at each step
+        self.min = None                     # (T,) min clearance across rollouts
+        self.first_violation = []           # (N,) first step inside an obstacle, -1 if never
+        self.violation_obstacle = []        # (N,) obstacle hit at that step, -1 if never
+        self.clearance, self.nearest = [], []   # exact=True only: (N, T) each
+        self.hist = None                    # (T, bins) counts of clearance values
+        self.lo, self.width = 0.0, 0.0      # left edge / width of the histogram bins
+        self.percentiles = {}
+
+    def add(self, clearance, nearest):
+        # clearance (n, T) min signed distance over obstacles (NaN past a
+        # rollout's end), nearest (n, T) index of the closest obstacle
+        n, T = clearance.shape
+        valid = np.isfinite(clearance)
+        if self.count is None:
+            self.count = np.zeros(T, dtype=np.int64)
+            self.min = np.full(T, np.inf)
+        self.n_rollouts += n
+        self.count += valid.sum(axis=0)
+        np.fmin(self.min, np.where(valid, clearance, np.inf).min(axis=0), out=self.min)
+        first = first_below(clearance)
+        self.first_violation.append(first)
+        self.violation_obstacle.append(np.where(first >= 0, nearest[np.arange(n), np.maximum(first, 0)], -1))
+        if self.exact:
+            self.clearance.append(clearance)
+            self.nearest.append(nearest)
+        elif valid.any():
+            self._histogram(clearance, valid)
+
+    def _histogram(self, clearance, valid):
+        values = clearance[valid]
+        lo, hi = float(values.min()), float(values.max())
+        if self.hist is None:
+            self.hist = np.zeros((clearance.shape[1], self.bins), dtype=np.int64)
+            self.lo, self.width = lo, max(hi - lo, 1e-6) * (1 + 1e-6) / self.bins
+        while lo < self.lo or hi >= self.lo + self.bins * self.width:
+            # merge bin pairs and pad the side that is out of range
+            half = self.bins // 2
+            merged = self.hist.reshape(len(self.hist), half, 2).sum(axis=-1)
+            pad = np.zeros_like(merged)
+            self.width *= 2
+            if lo < self.lo:
+                self.hist = np.concatenate([pad, merged], axis=1)
+                self.lo -= half * self.width
+            else:
+                self.hist = np.concatenate([merged, pad], axis=1)
+        steps = np.broadcast_to(np.arange(clearance.shape[1]), clearance.shape)[valid]
+        bins = np.minimum(((values - self.lo) / self.width).astype(np.int64), self.bins - 1)
+        self.hist += np.bincount(steps * self.bins + bins, minlength=self.hist.size).reshape(self.hist.shape)
+
+    def finish(self):
+        if self.count is None:
+            raise ValueError("No rollouts added")
+        steps = self.count > 0
+        self.min[~steps] = np.nan
+        self.first_violation = np.concatenate(self.first_violation)
+        self.violation_obstacle = np.concatenate(self.violation_obstacle)
+        if self.exact:
+            self.clearance = np.concatenate(self.clearance)
+            self.nearest = np.concatenate(self.nearest)
+        for q in self.percentile_levels:
+            env = np.full(len(self.count), np.nan)
+            if self.exact:
+                env[steps] = np.nanpercentile(self.clearance[:, steps], q, axis=0)
+            elif self.hist is not None:
+                env[steps] = self._histogram_percentile(q)[steps]
+            self.percentiles[q] = env
+        return self
+
+    def _histogram_percentile(self, q):
+        # numpy's linear interpolation between the order statistics around
+        # rank q/100 * (n - 1), each taken as the centre of its bin
+        cum = np.cumsum(self.hist, axis=1)
+        rank = q / 100 * np.maximum(self.count - 1, 0)
+        k = np.floor(rank)
+
+        def order_statistic(k):
+            b = np.minimum((cum <= k[:, None]).sum(axis=1), self.bins - 1)
+            return np.maximum(self.lo + (b + 0.5) * self.width, self.min)
+
+        lower = order_statistic(k)
+        upper = order_statistic(np.minimum(k + 1, np.maximum(self.count - 1, 0)))
+        return lower + (rank - k) * (upper - lower)
+
+    @property
+    def resolution(self):
+        # bound on the percentile error in metres (0: exact)
+        return 0.0 if self.exact else self.width
+
+    @property
+    def time_scale(self):
+        return 1.0 if self.dt is None else self.dt
+
+    @property
+    def time_label(self):
+        return "Step" if self.dt is None else "Time [s]"
+
+    @property
+    def time(self):
+        return np.arange(len(self.count)) * self.time_scale
+
+    @property
+    def violated(self):
+        return self.first_violation >= 0
+
+    @property
+    def violation_times(self):
+        # time of the first violation (seconds, or steps without dt),
+        # violating rollouts only
+        return self.first_violation[self.violated] * self.time_scale
+
+    @property
+    def violation_obstacles(self):
+        return self.violation_obstacle[self.violated]
+
+    def summary(self):
+        n = self.n_rollouts
+        dt = "unknown (times in steps)" if self.dt is None else f"{self.dt:g}"
+        lines = [
+            f"rollouts: {n}, steps: {len(self.count)}, dt: {dt}",
+            f"min clearance: {np.nanmin(self.min):.4f} m",
+            f"violating rollouts: {self.violated.sum()} / {n}",
+        ]
+        if self.violated.any():
+            first = self.violation_times.min()
+            lines.append("earliest violation: " + (f"step {first:.0f}" if self.dt is None else f"{first:.3f} s"))
+        if not self.exact:
+            lines.append(f"percentile resolution: {self.resolution:.2e} m")
+        return "\n".join(lines)
+
+
+def compute(path, key=None, lengths_key=None, *, dt=None, max_chunk_bytes=MAX_CHUNK_BYTES,
+            rollout_range=None, time_range=None, rollouts=None, percentiles=PERCENTILES, exact=False):
+    # path: NPZ or rollout_store directory. key defaults to "xs" / "paths"
+    # (whichever exists); steps past a rollout's length are ignored. dt
+    # defaults to the archive's; without one, times are reported in steps.
+    # rollouts: indices (e.g. RolloutSummary.select(...)) to restrict to;
+    # rows of the result follow their sorted order. exact: keep the (N, T)
+    # clearance for exact percentiles (memory grows with N * T).
+    source = open_rollouts(path)
+    try:
+        key = key or ("xs" if "xs" in source.files else "paths")
+        if lengths_key is None and key == "paths" and "lengths" in source.files:
+            lengths_key = "lengths"
+        centers, radii = obstacles_from(source)
+        if dt is None:
+            dt = float(source["dt"]) if "dt" in source.files else None
+    finally:
+        source.close()
+
+    # per value of a (T, D) rollout row: the (T, K, 2) difference and (T, K)
+    # distance temporaries in float64 dominate
+    bytes_per_value = 8 * (3 * len(centers) + 2)
+    if rollouts is None:
+        chunks = iter_rollout_chunks(
+            path, key, lengths_key, max_chunk_bytes=max_chunk_bytes, bytes_per_value=bytes_per_value,
+            rollout_range=rollout_range, time_range=time_range, reuse_buffer=True,
+        )
+    else:
+        from rollout_summary import iter_selected
+
+        chunks = iter_selected(
+            path, rollouts, key, lengths_key, max_chunk_bytes=max_chunk_bytes, bytes_per_value=bytes_per_value,
+            rollout_range=rollout_range, time_range=time_range,
+        )
+    metrics = SafetyMetrics(dt, percentiles, exact)
+    for _, chunk, lengths in chunks:
+        xy = np.asarray(chunk[..., :2], dtype=float)
+        if lengths is not None:
+            xy = np.where((np.arange(xy.shape[1]) < np.asarray(lengths)[:, None])[..., None], xy, np.nan)
+        d = signed_distance(xy, centers, radii)
+        finite = np.isfinite(d).all(axis=-1)
+        metrics.add(np.where(finite, d.min(axis=-1), np.nan).astype(np.float32),
+                    np.where(finite, np.nan_to_num(d, nan=np.inf).argmin(axis=-1), -1).astype(np.int32))
+
+    if metrics.count is None:
+        raise ValueError(f"No rollouts selected from {path}")
+    return metrics.finish()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit("usage: python safety_metrics.py ROLLOUTS.npz|ROLLOUTS.store [CONDITION ...]")
+    rollouts = None
+    if len(sys.argv) > 2:
+        # e.g. collided "min_clearance < 0.1" (see rollout_summary.py)
+        from rollout_summary import load_or_build
+
+        rollouts = load_or_build(sys.argv[1]).select(*sys.argv[2:])
+    print(compute(sys.argv[1], rollouts=rollouts).summary())
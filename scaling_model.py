@@ -0,0 +1,203 @@
+import argparse
+import numpy as np
+
+# ============================
+# Log-log solver scaling models
+# ============================
+# Solve time t [ms] is modelled in log10 space as a function of the horizon
+# h and, for the decision-variable grid, the number of decision variables n:
+#
+#   "power": log t = c0 + c1 log h                (+ c2 log n)
+#   "quad":  log t = quadratic polynomial in log h (and log n)
+#
+# Confidence intervals come from a case-resampling bootstrap; all N_BOOT
+# refits are solved at once as one stacked pseudo-inverse. n_boot=0 skips it
+# for callers that only need the point fit.
+KINDS = ("power", "quad")
+N_BOOT = 2000
+CI_LEVEL = 0.9
+SEED = 0
+# budget queries search horizons on a log grid up to this factor past the
+# longest fitted horizon; further out the fit says nothing
+MAX_EXTRAPOLATION = 4.0
+QUERY_POINTS = 4000
+
+
+def poly2_features(a, b):
+    # Same column order as sklearn's PolynomialFeatures(degree=2):
+    # 1, a, b, a^2, a*b, b^2
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    return np.stack([np.ones_like(a), a, b, a * a, a * b, b * b], axis=-1)
+
+
+def features(kind, log_h, log_n=None):
+    log_h = np.asarray(log_h, dtype=float)
+    one = np.ones_like(log_h)
+    if log_n is None:
+        cols = [one, log_h] if kind == "power" else [one, log_h, log_h * log_h]
+        return np.stack(cols, axis=-1)
+    log_n = np.broadcast_to(np.asarray(log_n, dtype=float), log_h.shape)
+    if kind == "power":
+        return np.stack([one, log_n, log_h], axis=-1)
+    return poly2_features(log_n, log_h)
+
+
+class ScalingModel:
+    def __init__(self, kind, coef, boot_coef, log_h, log_n, log_t):
+        self.kind = kind
+        self.coef = coef
+        self.boot_coef = boot_coef  # (n_boot, p); empty when fitted with n_boot=0
+        self.log_h, self.log_n, self.log_t = log_h, log_n, log_t
+
+    @property
+    def uses_n_vars(self):
+        return self.log_n is not None
+
+    @property
+    def horizon_range(self):
+        return 10 ** self.log_h.min(), 10 ** self.log_h.max()
+
+    @property
+    def aic(self):
+        resid = self.log_t - features(self.kind, self.log_h, self.log_n) @ self.coef
+        m, p = len(resid), len(self.coef)
+        return m * np.log(max(np.mean(resid ** 2), 1e-300)) + 2 * p
+
+    def _x(self, horizon, n_vars):
+        if self.uses_n_vars and n_vars is None:
+            raise ValueError("this model was fitted on (n_vars, horizon); pass n_vars")
+        log_n = np.log10(n_vars) if self.uses_n_vars else None
+        return features(self.kind, np.log10(horizon), log_n)
+
+    def predict(self, horizon, n_vars=None):
+        return 10 ** (self._x(horizon, n_vars) @ self.coef)
+
+    def interval(self, horizon, n_vars=None, level=CI_LEVEL):
+        # -> (lo, hi) pointwise bootstrap percentile band in ms
+        if not len(self.boot_coef):
+            raise ValueError("this model was fitted without a bootstrap (n_boot=0)")
+        log_t = self._x(horizon, n_vars) @ self.boot_coef.T  # (..., N_BOOT)
+        q = 50 * (1 - level), 50 * (1 + level)
+        lo, hi = np.percentile(log_t, q, axis=-1)
+        return 10 ** lo, 10 ** hi
+
+    def budget_horizon(self, budget_ms, n_vars=None, level=None, max_factor=MAX_EXTRAPOLATION):
+        # Largest horizon whose predicted solve time (the upper CI bound when
+        # `level` is given) stays within budget_ms for every shorter horizon.
+        # NaN if even the shortest fitted horizon is over budget, inf if the
+        # budget is never reached up to query_limit(max_factor).
+        h = np.logspace(self.log_h.min(), np.log10(self.query_limit(max_factor)), QUERY_POINTS)
+        t = self.predict(h, n_vars) if level is None else self.interval(h, n_vars, level)[1]
+        over = np.flatnonzero(t > budget_ms)
+        if over.size == 0:
+            return float("inf")
+        if over[0] == 0:
+            return float("nan")
+        return float(h[over[0] - 1])
+
+    def query_limit(self, max_factor=MAX_EXTRAPOLATION):
+        return self.horizon_range[1] * max_factor
+
+
+def fit(horizon, times_ms, n_vars=None, kind="quad", n_boot=N_BOOT, seed=SEED):
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {KINDS}, got {kind!r}")
+    h = np.asarray(horizon, dtype=float)
+    t = np.asarray(times_ms, dtype=float)
+    n = None if n_vars is None else np.asarray(n_vars, dtype=float)
+    ok = np.isfinite(t) & (t > 0)
+    log_h, log_t = np.log10(h[ok]), np.log10(t[ok])
+    log_n = None if n is None else np.log10(n[ok])
+
+    X = features(kind, log_h, log_n)
+    m, p = X.shape
+    if m < p:
+        raise ValueError(f"{kind!r} model needs at least {p} finite points, got {m}")
+    coef, *_ = np.linalg.lstsq(X, log_t, rcond=None)
+
+    # (n_boot, m) resample indices -> stacked design matrices, solved together
+    if n_boot:
+        idx = np.random.default_rng(seed).integers(0, m, size=(n_boot, m))
+        boot_coef = (np.linalg.pinv(X[idx]) @ log_t[idx][..., None])[..., 0]
+    else:
+        boot_coef = np.zeros((0, p))
+    return ScalingModel(kind, coef, boot_coef, log_h, log_n, log_t)
+
+
+def fit_horizon_table(horizon, data, kind="quad", **kwargs):
+    # time_comparisons.data layout -> {solver: ScalingModel}; solvers with too
+    # few finite points for `kind` are left out
+    models = {}
+    for solver, values in data.items():
+        try:
+            models[solver] = fit(horizon, values, kind=kind, **kwargs)
+        except ValueError:
+            pass
+    return models
+
+
+def fit_grid(rows, kind="quad", **kwargs):
+    # decision_variable_scalings.data layout: (M, 3) of (n_vars, horizon, ms)
+    rows = np.asarray(rows, dtype=float)
+    return fit(rows[:, 1], rows[:, 2], n_vars=rows[:, 0], kind=kind, **kwargs)
+
+
+def best_kind(horizon, times_ms, n_vars=None, **kwargs):
+    # kind with the lowest AIC on this data
+    models = {}
+    for kind in KINDS:
+        try:
+            models[kind] = fit(horizon, times_ms, n_vars, kind, n_boot=0, **kwargs)
+        except ValueError:
+            pass
+    return min(models, key=lambda k: models[k].aic)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Largest horizon whose fitted solve time fits a budget "
+                    "(decision_variable_scalings grid, or time_comparisons per solver)."
+    )
+    parser.add_argument("budget_ms", type=float)
+    parser.add_argument("--n-vars", type=float, default=None,
+                        help="query the decision-variable grid model at this many variables")
+    parser.add_argument("--kind", choices=KINDS, default="quad")
+    parser.add_argument("--level", type=float, default=CI_LEVEL, help="CI level for the conservative horizon")
+    parser.add_argument("--measured", action="store_true",
+                        help="fit solver_bench.py's solver_timings.json instead of the paper tables")
+    args = parser.parse_args()
+
+    if args.n_vars is not None:
+        import decision_variable_scalings as dvs
+
+        models = {"grid": fit_grid(dvs.load_data(dvs.TIMINGS_PATH if args.measured else None), args.kind)}
+        n_vars = args.n_vars
+    else:
+        import time_comparisons as tc
+
+        horizon, data, _ = tc.load_data(tc.TIMINGS_PATH if args.measured else None)
+        models = fit_horizon_table(horizon, data, args.kind)
+        n_vars = None
+
+    def cell(h, model):
+        # "*": past the fitted range, ">limit": budget never reached
+        if np.isinf(h):
+            return f">{model.query_limit():.0f}"
+        return f"{h:.0f}" + ("*" if np.isfinite(h) and h > model.horizon_range[1] else "")
+
+    width = max(len(s) for s in models)
+    print(f"{'model':<{width}}  {'horizon (fit)':>13}  {'horizon (' + format(args.level, '.0%') + ' CI)':>16}  fitted range")
+    cells = []
+    for name, model in models.items():
+        h_fit = model.budget_horizon(args.budget_ms, n_vars)
+        h_safe = model.budget_horizon(args.budget_ms, n_vars, level=args.level)
+        lo, hi = model.horizon_range
+        row = [cell(h_fit, model), cell(h_safe, model)]
+        cells += row
+        print(f"{name:<{width}}  {row[0]:>13}  {row[1]:>16}  {lo:.0f}-{hi:.0f}")
+    if any(c.endswith("*") for c in cells):
+        print("* extrapolated past the fitted horizon range")
+    if any(c.startswith(">") for c in cells):
+        print(f"> budget never reached within {MAX_EXTRAPOLATION:g}x the longest fitted horizon "
+              f"(no horizon is predicted from the fit further out)")
@@ -0,0 +1,301 @@
+import os
+import time
+import argparse
+import numpy as np
+
+from rollout_store import MANIFEST, is_store, open_rollouts, iter_rollout_chunks
+from rollout_render import finite_lengths, segment_distance
+
+# ============================
+# Uniform-grid spatial index over rollout segments
+# ============================
+# Every segment p[i, t] -> p[i, t + 1] of every rollout (a single-point
+# rollout counts as one zero-length segment) is bucketed into the cells of a
+# uniform grid its bounding box overlaps (CSR layout: cell_start /
+# cell_items). Queries only test the segments of the cells they touch, then
+# apply the exact geometric test, so "which rollouts pass within r of this
+# obstacle" or "which rollouts enter the init box" cost O(local segments)
+# instead of a pass over all N x T positions.
+#
+# The index is built once per rollout file and saved next to it as
+# <file>.segidx.npz; it is rebuilt when the source's size or mtime changes.
+SIDECAR_SUFFIX = ".segidx.npz"
+INDEX_VERSION = 2
+# average number of segments per grid cell the cell size is chosen for
+SEGMENTS_PER_CELL = 4.0
+MAX_GRID_SIDE = 4096
+MAX_CHUNK_BYTES = 256 << 20
+
+
+def sidecar_path_for(path):
+    return path.rstrip(os.sep) + SIDECAR_SUFFIX
+
+
+def source_stamp(path):
+    # store directories change through their manifest
+    st = os.stat(os.path.join(path, MANIFEST) if is_store(path) else path)
+    return np.array([st.st_size, st.st_mtime_ns], dtype=np.int64)
+
+
+def _first_per_rollout(rollouts, steps):
+    # -> (unique rollout ids, smallest step of each)
+    if rollouts.size == 0:
+        return rollouts.astype(np.int64), steps.astype(np.int64)
+    order = np.lexsort((steps, rollouts))
+    r, s = rollouts[order], steps[order]
+    first = np.r_[True, r[1:] != r[:-1]]
+    return r[first].astype(np.int64), s[first].astype(np.int64)
+
+
+def _segments_hit_box(a, b, x0, x1, y0, y1):
+    # Liang-Barsky clip of every segment a-b against the box, vectorized
+    d = b - a
+    t0 = np.zeros(len(a))
+    t1 = np.ones(len(a))
+    ok = np.ones(len(a), dtype=bool)
+    for p, q in (
+        (-d[:, 0], a[:, 0] - x0),
+        (d[:, 0], x1 - a[:, 0]),
+        (-d[:, 1], a[:, 1] - y0),
+        (d[:, 1], y1 - a[:, 1]),
+    ):
+        parallel = p == 0
+        ok &= ~(parallel & (q < 0))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r = q / p
+        t0 = np.where(p < 0, np.maximum(t0, r), t0)
+        t1 = np.where(p > 0, np.minimum(t1, r), t1)
+    return ok & (t0 <= t1)
+
+
+class SegmentIndex:
+    def __init__(self, a, b, rollout, step, seg_counts, extent, shape, cell_start, cell_items):
+        self.a, self.b = a, b                # (S, 2) float32 segment endpoints
+        self.rollout, self.step = rollout, step
+        self.seg_counts = seg_counts         # (N,) segments per rollout
+        self.extent = extent                 # (x0, x1, y0, y1)
+        self.shape = shape                   # (ny, nx)
+        self.cell_start = cell_start         # (ny * nx + 1,)
+        self.cell_items = cell_items         # segment ids, grouped by cell
+
+    @property
+    def n_rollouts(self):
+        return len(self.seg_counts)
+
+    @property
+    def cell_size(self):
+        x0, x1, _, _ = self.extent
+        return (x1 - x0) / self.shape[1]
+
+    # --------------------------------------------------------
+    # Construction / persistence
+    # --------------------------------------------------------
+    @classmethod
+    def from_segments(cls, a, b, rollout, step, n_rollouts):
+        S = len(a)
+        seg_counts = np.bincount(rollout, minlength=n_rollouts).astype(np.int64)
+        lo = np.minimum(a, b)
+        hi = np.maximum(a, b)
+        if S == 0:
+            extent = np.array([0.0, 1.0, 0.0, 1.0])
+        else:
+            extent = np.array([lo[:, 0].min(), hi[:, 0].max(), lo[:, 1].min(), hi[:, 1].max()], dtype=float)
+        w = max(extent[1] - extent[0], 1e-9)
+        h = max(extent[3] - extent[2], 1e-9)
+
+        # square cells holding ~SEGMENTS_PER_CELL segments, never shorter
+        # than a typical segment (which would put each one in many cells)
+        cell = np.sqrt(w * h * SEGMENTS_PER_CELL / max(S, 1))
+        if S:
+            cell = max(cell, float(np.median(np.hypot(*(b - a).T))))
+        cell = max(cell, w / MAX_GRID_SIDE, h / MAX_GRID_SIDE)
+        nx, ny = int(np.ceil(w / cell)) or 1, int(np.ceil(h / cell)) or 1
+        extent[1] = extent[0] + nx * cell
+        extent[3] = extent[2] + ny * cell
+
+        i0 = np.clip(((lo[:, 0] - extent[0]) // cell).astype(np.int64), 0, nx - 1)
+        i1 = np.clip(((hi[:, 0] - extent[0]) // cell).astype(np.int64), 0, nx - 1)
+        j0 = np.clip(((lo[:, 1] - extent[2]) // cell).astype(np.int64), 0, ny - 1)
+        j1 = np.clip(((hi[:, 1] - extent[2]) // cell).astype(np.int64), 0, ny - 1)
+        wi = i1 - i0 + 1
+        span = wi * (j1 - j0 + 1)
+
+        # one (segment, cell) pair per covered cell of each bounding box
+        seg = np.repeat(np.arange(S), span)
+        k = np.arange(span.sum()) - np.repeat(np.cumsum(span) - span, span)
+        cells = (j0[seg] + k // wi[seg]) * nx + i0[seg] + k % wi[seg]
+        order = np.argsort(cells, kind="stable")
+        cell_items = seg[order].astype(np.int64)
+        cell_start = np.zeros(nx * ny + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cells, minlength=nx * ny), out=cell_start[1:])
+        return cls(a, b, rollout, step, seg_counts, extent, (ny, nx), cell_start, cell_items)
+
+    @classmethod
+    def build(cls, path, key=None, max_chunk_bytes=MAX_CHUNK_BYTES):
+        # "paths" archives use their "lengths"; "xs" archives the finite
+        # prefix of each rollout
+        source = open_rollouts(path)
+        try:
+            key = key or ("xs" if "xs" in source.files else "paths")
+            lengths_key = "lengths" if key == "paths" and "lengths" in source.files else None
+        finally:
+            source.close()
+
+        parts = []
+        n_rollouts = 0
+        for start, paths, lengths in iter_rollout_chunks(path, key, lengths_key, max_chunk_bytes=max_chunk_bytes,
+                                                         reuse_buffer=True):
+            N, T = paths.shape[:2]
+            n_rollouts = start + N
+            if lengths is None:
+                lengths = finite_lengths(paths)
+            lengths = np.clip(np.asarray(lengths).astype(np.int64), 0, T)
+            # a single-point rollout is one degenerate segment (a == b) so that
+            # point and box queries still find it
+            n_seg = np.where(lengths == 1, 1, np.maximum(lengths - 1, 0))
+            rows, steps = np.nonzero(np.arange(max(T - 1, 1))[None, :] < n_seg[:, None])
+            xy = np.asarray(paths[..., :2], dtype=np.float32)
+            parts.append((xy[rows, steps], xy[rows, np.minimum(steps + 1, lengths[rows] - 1)],
+                          (rows + start).astype(np.int32), steps.astype(np.int32)))
+
+        if not parts:
+            empty = np.zeros((0, 2), dtype=np.float32)
+            return cls.from_segments(empty, empty, np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32), 0)
+        a, b, rollout, step = (np.concatenate(p) for p in zip(*parts))
+        return cls.from_segments(a, b, rollout, step, n_rollouts)
+
+    def save(self, path, stamp):
+        np.savez(
+            path,
+            version=INDEX_VERSION, stamp=stamp,
+            a=self.a, b=self.b, rollout=self.rollout, step=self.step, seg_counts=self.seg_counts,
+            extent=self.extent, shape=np.array(self.shape), cell_start=self.cell_start, cell_items=self.cell_items,
+        )
+
+    @classmethod
+    def load(cls, path):
+        z = np.load(path)
+        return cls(z["a"], z["b"], z["rollout"], z["step"], z["seg_counts"], z["extent"],
+                   tuple(int(v) for v in z["shape"]), z["cell_start"], z["cell_items"])
+
+    # --------------------------------------------------------
+    # Queries (all return rollout ids, ascending)
+    # --------------------------------------------------------
+    def candidates(self, x0, x1, y0, y1, disc=None):
+        # ids of segments bucketed in any cell overlapping the box (superset);
+        # disc=(px, py, r) additionally drops cells farther than r from (px, py)
+        ny, nx = self.shape
+        ex0, _, ey0, _ = self.extent
+        cs = self.cell_size
+        if x1 < self.extent[0] or x0 > self.extent[1] or y1 < self.extent[2] or y0 > self.extent[3]:
+            return np.zeros(0, dtype=np.int64)
+        i0, i1 = np.clip([int((x0 - ex0) // cs), int((x1 - ex0) // cs)], 0, nx - 1)
+        j0, j1 = np.clip([int((y0 - ey0) // cs), int((y1 - ey0) // cs)], 0, ny - 1)
+        ci, cj = np.meshgrid(np.arange(i0, i1 + 1), np.arange(j0, j1 + 1))
+        if disc is not None:
+            px, py, r = disc
+            gx = np.clip(px, ex0 + ci * cs, ex0 + (ci + 1) * cs) - px
+            gy = np.clip(py, ey0 + cj * cs, ey0 + (cj + 1) * cs) - py
+            near = gx * gx + gy * gy <= r * r
+            ci, cj = ci[near], cj[near]
+        cells = (cj * nx + ci).ravel()
+        starts, ends = self.cell_start[cells], self.cell_start[cells + 1]
+        n = ends - starts
+        idx = np.repeat(starts - (np.cumsum(n) - n), n) + np.arange(n.sum())
+        return np.unique(self.cell_items[idx])
+
+    def within(self, point, radius, return_steps=False):
+        # rollouts passing within `radius` of `point` (and their first step)
+        px, py = point
+        cand = self.candidates(px - radius, px + radius, py - radius, py + radius, (px, py, radius))
+        p = np.broadcast_to(np.array([px, py], dtype=float), (len(cand), 2))
+        hit = cand[segment_distance(p, self.a[cand].astype(float), self.b[cand].astype(float)) <= radius]
+        ids, steps = _first_per_rollout(self.rollout[hit], self.step[hit])
+        return (ids, steps) if return_steps else ids
+
+    def in_box(self, lo, hi, mode="intersects", return_steps=False):
+        # mode="intersects": rollouts with any segment touching the box
+        # mode="contains":   rollouts lying entirely inside the box
+        x0, y0 = lo
+        x1, y1 = hi
+        cand = self.candidates(x0, x1, y0, y1)
+        a, b = self.a[cand].astype(float), self.b[cand].astype(float)
+        if mode == "intersects":
+            hit = cand[_segments_hit_box(a, b, x0, x1, y0, y1)]
+            ids, steps = _first_per_rollout(self.rollout[hit], self.step[hit])
+            return (ids, steps) if return_steps else ids
+        if mode != "contains":
+            raise ValueError(f"Unknown mode: {mode!r}")
+        inside = ((a >= (x0, y0)) & (a <= (x1, y1)) & (b >= (x0, y0)) & (b <= (x1, y1))).all(axis=1)
+        n_inside = np.bincount(self.rollout[cand[inside]], minlength=self.n_rollouts)
+        ids = np.flatnonzero((n_inside == self.seg_counts) & (self.seg_counts > 0))
+        return (ids, np.zeros_like(ids)) if return_steps else ids
+
+    def nearest(self, point):
+        # -> (rollout, step, distance) of the segment closest to `point`.
+        # Discs around the point grow until one holds a segment; its distance
+        # d then bounds the answer, so one more query of radius d is exact.
+        px, py = point
+        x0, x1, y0, y1 = self.extent
+        if len(self.a) == 0:
+            return -1, -1, float("inf")
+        # Euclidean distance from the point to the grid, then rings of
+        # 1, 2, 4, ... cells beyond it
+        outside = np.hypot(max(x0 - px, 0.0, px - x1), max(y0 - py, 0.0, py - y1))
+        step = self.cell_size
+        while True:
+            r = outside + step
+            cand = self.candidates(px - r, px + r, py - r, py + r, (px, py, r))
+            if len(cand):
+                break
+            step *= 2
+        p = np.array([px, py], dtype=float)
+        d = segment_distance(np.broadcast_to(p, (len(cand), 2)), self.a[cand].astype(float), self.b[cand].astype(float))
+        if d.min() > r:
+            r = float(d.min())
+            cand = self.candidates(px - r, px + r, py - r, py + r, (px, py, r))
+            d = segment_distance(np.broadcast_to(p, (len(cand), 2)), self.a[cand].astype(float), self.b[cand].astype(float))
+        best = int(np.argmin(d))
+        s = cand[best]
+        return int(self.rollout[s]), int(self.step[s]), float(d[best])
+
+
+def load_or_build(path, key=None, rebuild=False):
+    sidecar = sidecar_path_for(path)
+    stamp = source_stamp(path)
+    if not rebuild and os.path.exists(sidecar):
+        with np.load(sidecar) as z:
+            fresh = int(z["version"]) == INDEX_VERSION and np.array_equal(z["stamp"], stamp)
+        if fresh:
+            return SegmentIndex.load(sidecar)
+    index = SegmentIndex.build(path, key)
+    index.save(sidecar, stamp)
+    print(f"[SegmentIndex] {len(index.a)} segments, grid {index.shape[1]}x{index.shape[0]} -> {sidecar}")
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build/query the segment index of a rollout file.")
+    parser.add_argument("path", help="rollout NPZ or rollout_store directory")
+    parser.add_argument("--rebuild", action="store_true")
+    parser.add_argument("--near", nargs=3, type=float, metavar=("X", "Y", "R"),
+                        help="rollouts passing within R of (X, Y)")
+    parser.add_argument("--box", nargs=4, type=float, metavar=("X0", "Y0", "X1", "Y1"),
+                        help="rollouts entering the box")
+    parser.add_argument("--contains", action="store_true", help="with --box: rollouts entirely inside it")
+    parser.add_argument("--nearest", nargs=2, type=float, metavar=("X", "Y"))
+    args = parser.parse_args()
+
+    index = load_or_build(args.path, rebuild=args.rebuild)
+
+    def timed(name, f, *a, **kw):
+        t0 = time.perf_counter()
+        out = f(*a, **kw)
+        print(f"[{name}] {out}  ({(time.perf_counter() - t0) * 1e3:.2f} ms)")
+
+    if args.near:
+        timed("Near", index.within, args.near[:2], args.near[2])
+    if args.box:
+        timed("Box", index.in_box, args.box[:2], args.box[2:], "contains" if args.contains else "intersects")
+    if args.nearest:
+        timed("Nearest", index.nearest, args.nearest)
@@ -0,0 +1,299 @@
+import os
+import json
+import time
+import socket
+import platform
+import argparse
+import datetime
+import multiprocessing as mp
+import numpy as np
+
+# ============================
+# Solver benchmark harness
+# ============================
+# Produces the solve-time tables that time_comparisons.py (time vs horizon)
+# and decision_variable_scalings.py (time vs decision variables x horizon)
+# plot when run with --measured. Every registered solver is timed on a horizon x decision-variable
+# grid in a separate process (so a hung cell can be killed); cells that hit
+# the timeout or fail become NaN, exactly like the gaps in the paper tables.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+TIMINGS_PATH = os.path.join(SCRIPT_DIR, "solver_timings.json")
+
+HORIZONS = [10, 25, 50, 75, 100, 200, 500, 1000, 2000, 3000]
+N_VARS = [10, 25, 50, 75, 100]
+WARMUP = 1
+REPEATS = 5
+# limit on warmup + timed repeats of one cell; problem setup has its own
+# looser limit and does not count against it
+TIMEOUT_S = 30.0
+SETUP_TIMEOUT_S = 300.0
+DENSE_KKT_MAX_BYTES = 2 << 30
+
+# name -> setup(horizon, n_vars) returning a zero-argument solve callable.
+# Setup (problem generation) is not timed; only the returned callable is.
+SOLVERS = {}
+
+
+def register_solver(name):
+    def deco(setup):
+        SOLVERS[name] = setup
+        return setup
+    return deco
+
+
+# ------------------------------------------------------------
+# Reference CPU solvers: box-free LQR on a random stable system with
+# n_vars decision variables per stage (nx states + nu inputs)
+# ------------------------------------------------------------
+def lqr_problem(horizon, n_vars, seed=0):
+    nx = max(1, (2 * n_vars) // 3)
+    nu = max(1, n_vars - nx)
+    rng = np.random.default_rng(seed)
+    A = np.eye(nx) + 0.01 * rng.standard_normal((nx, nx))
+    B = 0.1 * rng.standard_normal((nx, nu))
+    Q = np.eye(nx)
+    R = 0.1 * np.eye(nu)
+    x0 = rng.standard_normal(nx)
+    return A, B, Q, R, x0, horizon
+
+
+@register_solver("Riccati LQR (NumPy)")
+def riccati_setup(horizon, n_vars):
+    A, B, Q, R, x0, N = lqr_problem(horizon, n_vars)
+
+    def solve():
+        P = Q.copy()
+        Ks = []
+        for _ in range(N):
+            BtP = B.T @ P
+            K = np.linalg.solve(R + BtP @ B, BtP @ A)
+            P = Q + A.T @ P @ (A - B @ K)
+            Ks.append(K)
+        x = x0
+        for K in reversed(Ks):
+            x = (A - B @ K) @ x
+        return x
+
+    return solve
+
+
+@register_solver("Dense KKT (NumPy)")
+def dense_kkt_setup(horizon, n_vars):
+    # Whole-horizon equality-constrained QP solved as one dense KKT system;
+    # O((N * n_vars)^3), so long horizons run into the timeout.
+    A, B, Q, R, x0, N = lqr_problem(horizon, n_vars)
+    nx, nu = B.shape
+    nz = N * (nx + nu)
+    nc = N * nx
+    if (nz + nc) ** 2 * 8 > DENSE_KKT_MAX_BYTES:
+        raise MemoryError(f"dense KKT of size {nz + nc} exceeds DENSE_KKT_MAX_BYTES")
+
+    H = np.zeros((nz, nz))
+    C = np.zeros((nc, nz))
+    d = np.zeros(nc)
+    for k in range(N):
+        u, x = k * (nx + nu), k * (nx + nu) + nu
+        H[u:u + nu, u:u + nu] = R
+        H[x:x + nx, x:x + nx] = Q
+        r = k * nx
+        C[r:r + nx, x:x + nx] = -np.eye(nx)
+        C[r:r + nx, u:u + nu] = B
+        if k == 0:
+            d[r:r + nx] = -A @ x0
+        else:
+            C[r:r + nx, x - (nx + nu):x - (nx + nu) + nx] = A
+    K = np.block([[H, C.T], [C, np.zeros((nc, nc))]])
+    rhs = np.concatenate([np.zeros(nz), d])
+
+    def solve():
+        return np.linalg.solve(K, rhs)
+
+    return solve
+
+
+# ------------------------------------------------------------
+# Timing
+# ------------------------------------------------------------
+def _time_cell(name, horizon, n_vars, warmup, repeats, conn):
+    try:
+        solve = SOLVERS[name](horizon, n_vars)
+        # the parent starts the cell's timeout clock here
+        conn.send(("ready", None))
+        for _ in range(warmup):
+            solve()
+        samples = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            solve()
+            samples.append((time.perf_counter() - t0) * 1e3)
+        conn.send(("ok", samples))
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+def time_cell(name, horizon, n_vars, warmup=WARMUP, repeats=REPEATS, timeout_s=TIMEOUT_S,
+              setup_timeout_s=SETUP_TIMEOUT_S):
+    ctx = mp.get_context("fork" if "fork" in mp.get_all_start_methods() else "spawn")
+    recv, send = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_time_cell, args=(name, horizon, n_vars, warmup, repeats, send))
+    proc.start()
+    send.close()
+    status, payload = "timeout", None
+    try:
+        if recv.poll(setup_timeout_s):
+            message = recv.recv()
+            if message[0] != "ready":
+                status, payload = message        # setup failed
+            elif recv.poll(timeout_s):
+                status, payload = recv.recv()
+    except EOFError:
+        status, payload = "error", "worker exited without a result"
+    if proc.is_alive():
+        proc.terminate()
+    proc.join()
+    return status, payload
+
+
+def summarize(samples):
+    if not samples:
+        return float("nan"), float("nan")
+    q1, med, q3 = np.percentile(samples, [25, 50, 75])
+    return float(med), float(q3 - q1)
+
+
+def machine_info():
+    return {
+        "hostname": socket.gethostname(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+    }
+
+
+def run_benchmark(solvers=None, horizons=HORIZONS, n_vars=N_VARS, warmup=WARMUP,
+                  repeats=REPEATS, timeout_s=TIMEOUT_S, setup_timeout_s=SETUP_TIMEOUT_S):
+    solvers = list(solvers or SOLVERS)
+    results = []
+    for name in solvers:
+        for n in n_vars:
+            # solve time grows with the horizon: once a cell times out, the
+            # longer horizons for this (solver, n_vars) are NaN without running
+            timed_out = False
+            for h in sorted(horizons):
+                if timed_out:
+                    status, payload = "skipped", None
+                else:
+                    status, payload = time_cell(name, h, n, warmup, repeats, timeout_s, setup_timeout_s)
+                    timed_out = status == "timeout"
+                samples = payload if status == "ok" else None
+                med, iqr = summarize(samples)
+                results.append({
+                    "solver": name,
+                    "horizon": int(h),
+                    "n_vars": int(n),
+                    "status": status,
+                    "median_ms": med,
+                    "iqr_ms": iqr,
+                    "samples_ms": samples,
+                    "error": payload if status == "error" else None,
+                })
+                shown = f"{med:10.3f} ms (IQR {iqr:.3f})" if status == "ok" else status
+                print(f"[Bench] {name:<24} n_vars={n:<4} horizon={h:<5} {shown}")
+    return {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "machine": machine_info(),
+        "warmup": warmup,
+        "repeats": repeats,
+        "timeout_s": timeout_s,
+        "setup_timeout_s": setup_timeout_s,
+        "horizons": sorted(int(h) for h in horizons),
+        "n_vars": [int(n) for n in n_vars],
+        "results": results,
+    }
+
+
+def save_results(report, path=TIMINGS_PATH):
+    # NaN is not valid JSON; missing cells are written as null
+    def clean(v):
+        return None if isinstance(v, float) and not np.isfinite(v) else v
+    report = dict(report, results=[{k: clean(v) for k, v in r.items()} for r in report["results"]])
+    with open(path, "w") as f:
+        json.dump(report, f, indent=1)
+
+
+# ------------------------------------------------------------
+# Readers used by the plotting scripts
+# ------------------------------------------------------------
+def load_results(path=TIMINGS_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _median(r):
+    return np.nan if r["median_ms"] is None else float(r["median_ms"])
+
+
+def horizon_table(report, n_vars=None):
+    # -> (horizon array, {solver: [median ms per horizon]}) at one n_vars
+    # (default: the largest measured), the layout of time_comparisons.data
+    n_vars = n_vars if n_vars is not None else max(report["n_vars"])
+    horizon = np.array(report["horizons"])
+    data = {}
+    for r in report["results"]:
+        if r["n_vars"] != n_vars:
+            continue
+        row = data.setdefault(r["solver"], [np.nan] * len(horizon))
+        row[int(np.flatnonzero(horizon == r["horizon"])[0])] = _median(r)
+    return horizon, data
+
+
+def grid_table(report, solver=None):
+    # -> (M, 3) array of (decision vars, horizon, ms) for finite cells, the
+    # layout of decision_variable_scalings.data
+    solver = solver or report["results"][0]["solver"]
+    rows = [
+        [r["n_vars"], r["horizon"], _median(r)]
+        for r in report["results"]
+        if r["solver"] == solver and r["median_ms"] is not None
+    ]
+    return np.array(rows, dtype=float).reshape(-1, 3)
+
+
+def _int_list(s):
+    return [int(v) for v in s.split(",") if v]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time registered solvers over a horizon x decision-variable grid.")
+    parser.add_argument("--solvers", type=lambda s: s.split(","), default=None,
+                        help=f"comma-separated subset of: {', '.join(SOLVERS)}")
+    parser.add_argument("--horizons", type=_int_list, default=HORIZONS)
+    parser.add_argument("--n-vars", type=_int_list, default=N_VARS)
+    parser.add_argument("--warmup", type=int, default=WARMUP)
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--timeout", type=float, default=TIMEOUT_S, help="seconds per cell, after setup")
+    parser.add_argument("--setup-timeout", type=float, default=SETUP_TIMEOUT_S, help="seconds for a cell's setup")
+    parser.add_argument("--out", default=TIMINGS_PATH)
+    parser.add_argument("--history", nargs="?", const="", default=None, metavar="DB",
+                        help="also append the run to the timing history (bench_history.py)")
+    args = parser.parse_args()
+
+    unknown = [s for s in args.solvers or [] if s not in SOLVERS]
+    if unknown:
+        parser.error(f"unknown solvers: {unknown}")
+
+    report = run_benchmark(args.solvers, args.horizons, args.n_vars, args.warmup, args.repeats, args.timeout,
+                           args.setup_timeout)
+    save_results(report, args.out)
+    print(f"[Saved] {args.out}")
+
+    if args.history is not None:
+        import bench_history
+
+        db = bench_history.connect(args.history or bench_history.HISTORY_PATH)
+        print(f"[History] run {bench_history.ingest(report, db)} appended")
+        db.close()
@@ -0,0 +1,71 @@
+import functools
+import itertools
+import math
+
+import numpy as np
+
+from bench_history import mann_whitney_greater, min_p_value
+
+
+def pairwise_u(base, new):
+    # U of `new` from pair counts (ties count one half)
+    d = np.subtract.outer(np.asarray(new, dtype=float), np.asarray(base, dtype=float))
+    return (d > 0).sum() + 0.5 * (d == 0).sum()
+
+
+def p_reference(base, new):
+    # P(U >= observed) over every relabelling of the pooled sample
+    pooled = np.concatenate([base, new]).astype(float)
+    n2 = len(new)
+    observed = pairwise_u(base, new)
+    hits = count = 0
+    for idx in itertools.combinations(range(len(pooled)), n2):
+        mask = np.zeros(len(pooled), dtype=bool)
+        mask[list(idx)] = True
+        count += 1
+        hits += pairwise_u(pooled[~mask], pooled[mask]) >= observed - 1e-9
+    return hits / count
+
+
+def u_tail_no_ties(n1, n2, u):
+    # P(U >= u) from the classic recurrence on the number of arrangements
+    @functools.lru_cache(maxsize=None)
+    def ways(m, n, k):
+        if k < 0 or k > m * n:
+            return 0
+        if m == 0 or n == 0:
+            return int(k == 0)
+        return ways(m - 1, n, k - n) + ways(m, n - 1, k)
+
+    return sum(ways(n1, n2, k) for k in range(math.ceil(u), n1 * n2 + 1)) / math.comb(n1 + n2, n2)
+
+
+def test_exact_p_matches_reference():
+    rng = np.random.default_rng(0)
+    for n1, n2 in ((3, 3), (4, 6), (5, 5)):
+        base = rng.normal(10.0, 1.0, n1)
+        new = rng.normal(10.8, 1.0, n2)
+        u, p = mann_whitney_greater(base, new)
+        assert u == pairwise_u(base, new)
+        assert math.isclose(p, u_tail_no_ties(n1, n2, u))
+
+        # rounded timings tie often
+        base, new = np.round(base), np.round(new)
+        u, p = mann_whitney_greater(base, new)
+        assert u == pairwise_u(base, new)
+        assert math.isclose(p, p_reference(base, new))
+
+
+def test_exact_p_extremes():
+    assert mann_whitney_greater([1, 2, 3], [4, 5, 6])[1] == min_p_value(3, 3) == 1 / 20
+    assert mann_whitney_greater([4, 5, 6], [1, 2, 3])[1] == 1.0
+    assert math.isnan(mann_whitney_greater([], [1.0])[1])
+
+
+def test_normal_approximation_is_close_to_exact():
+    rng = np.random.default_rng(1)
+    base = rng.normal(10.0, 1.0, 12)
+    new = rng.normal(10.5, 1.0, 12)
+    u, p = mann_whitney_greater(base, new)
+    assert math.comb(24, 12) > 20000   # past the exact cutoff
+    assert abs(p - u_tail_no_ties(12, 12, u)) < 0.01
@@ -0,0 +1,37 @@
+import numpy as np
+
+from live_min_distance import LineParser, FileTailSource
+
+
+def test_numeric_lines():
+    parser = LineParser()
+    np.testing.assert_array_equal(parser.feed(b"0.5\n0.1 0.4\n0.2,0.3\n"), [0.5, 0.4, 0.3])
+    assert parser.skipped == 0
+
+
+def test_partial_line_is_kept_for_the_next_feed():
+    parser = LineParser()
+    np.testing.assert_array_equal(parser.feed(b"0.5\n0.2"), [0.5])
+    np.testing.assert_array_equal(parser.feed(b"5\n"), [0.25])
+    np.testing.assert_array_equal(parser.feed(b"0.7", final=True), [0.7])
+
+
+def test_non_numeric_lines_are_skipped_and_counted():
+    parser = LineParser()
+    values = parser.feed(b"t distance\n0.0 0.5\n[controller] warm start\n\n0.01 0.4\n0.02 0.\x00\xff3\n0.03 0.3\n")
+    np.testing.assert_array_equal(values, [0.5, 0.4, 0.3])
+    assert parser.skipped == 3
+    # the parser keeps going afterwards
+    np.testing.assert_array_equal(parser.feed(b"0.04 0.2\n"), [0.2])
+
+
+def test_file_source_survives_a_header(tmp_path):
+    path = tmp_path / "trace.txt"
+    path.write_text("min_distance\n0.9\n")
+    source = FileTailSource(str(path))
+    np.testing.assert_array_equal(source.read(), [0.9])
+    with open(path, "a") as f:
+        f.write("0.8\n")
+    np.testing.assert_array_equal(source.read(), [0.8])
+    source.close()
+    assert source.parser.skipped == 1
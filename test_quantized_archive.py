@@ -0,0 +1,37 @@
+import numpy as np
+
+from quantized_archive import QMAX, encode_int16, write_archive
+from rollout_store import open_rollouts
+
+
+def test_int16_error_bound_and_nan_mask(tmp_path):
+    rng = np.random.default_rng(0)
+    paths = np.cumsum(rng.normal(0.0, 0.01, (20, 50, 3)), axis=1)
+    paths[3, 30:] = np.nan
+    paths[7, :, 1] = np.nan
+    src, dst = tmp_path / "src.npz", tmp_path / "dst.npz"
+    np.savez(src, paths=paths, lengths=np.full(20, 50))
+
+    report = write_archive(str(src), str(dst))
+    assert report["paths"][0] == "int16"
+
+    # half a code step per component
+    bound = (np.nanmax(paths, axis=(0, 1)) - np.nanmin(paths, axis=(0, 1))) / QMAX / 2
+    source = open_rollouts(str(dst))
+    decoded = source["paths"]
+    np.testing.assert_array_equal(np.isnan(decoded), np.isnan(paths))
+    err = np.abs(decoded - paths)
+    assert (np.nanmax(err, axis=(0, 1)) <= bound * (1 + 1e-9)).all()
+    assert np.nanmax(err) <= report["paths"][1] * (1 + 1e-9)
+    source.close()
+
+
+def test_all_nan_component_and_infinities():
+    a = np.random.default_rng(1).normal(size=(4, 10, 3))
+    a[..., 2] = np.nan
+    d, nan, lo, scale, err = encode_int16(a)
+    assert np.isfinite(lo).all() and np.isfinite(scale).all() and np.isfinite(err)
+    assert nan is not None
+
+    a[0, 0, 0] = np.inf
+    assert encode_int16(a)[-1] == np.inf
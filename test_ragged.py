@@ -0,0 +1,55 @@
+import numpy as np
+
+from ragged import RaggedTrajectories, padded_to_ragged, ragged_to_padded
+
+
+def make_padded(rng, N=30, T=20):
+    paths = rng.normal(size=(N, T, 3))
+    lengths = rng.integers(0, T + 1, N)
+    lengths[:2] = [0, T]
+    paths[np.arange(T) >= lengths[:, None]] = np.nan
+    return paths, lengths
+
+
+def test_padded_ragged_round_trip():
+    paths, lengths = make_padded(np.random.default_rng(0))
+    ragged = RaggedTrajectories.from_padded(paths, lengths, dtype=np.float64)
+    assert len(ragged) == len(paths) and len(ragged.vertices) == lengths.sum()
+    np.testing.assert_array_equal(ragged.lengths, lengths)
+    for r, p, L in zip(ragged, paths, lengths):
+        np.testing.assert_array_equal(r, p[:L])
+
+    back, back_lengths = ragged.to_padded(paths.shape[1])
+    np.testing.assert_array_equal(back, paths)   # NaN == NaN here
+    np.testing.assert_array_equal(back_lengths, lengths)
+
+    # lengths=None takes the finite prefix of NaN-padded rollouts
+    np.testing.assert_array_equal(RaggedTrajectories.from_padded(paths).lengths, lengths)
+
+
+def test_subset_and_take():
+    paths, lengths = make_padded(np.random.default_rng(1))
+    ragged = RaggedTrajectories.from_padded(paths, lengths, dtype=np.float64)
+    sub = ragged.subset(5, 12)
+    assert np.shares_memory(sub.vertices, ragged.vertices)
+    for i, r in enumerate(sub):
+        np.testing.assert_array_equal(r, ragged[5 + i])
+
+    idx = [7, 0, 7, 29, 3]
+    taken = ragged.take(idx)
+    np.testing.assert_array_equal(taken.lengths, lengths[idx])
+    for r, i in zip(taken, idx):
+        np.testing.assert_array_equal(r, ragged[i])
+
+
+def test_npz_round_trip(tmp_path):
+    paths, lengths = make_padded(np.random.default_rng(2))
+    src, mid, dst = tmp_path / "padded.npz", tmp_path / "ragged.npz", tmp_path / "back.npz"
+    np.savez(src, paths=paths.astype(np.float32), lengths=lengths, goal_point=np.array([1.0, 2.0]))
+    padded_to_ragged(str(src), str(mid))
+    ragged_to_padded(str(mid), str(dst))
+
+    z = np.load(dst)
+    np.testing.assert_array_equal(z["lengths"], lengths)
+    np.testing.assert_array_equal(z["paths"], paths.astype(np.float32)[:, :lengths.max()])
+    np.testing.assert_array_equal(z["goal_point"], [1.0, 2.0])
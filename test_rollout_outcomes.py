@@ -0,0 +1,57 @@
+import numpy as np
+
+from ragged import RaggedTrajectories
+from rollout_outcomes import COLLIDED, GOAL, TIMEOUT, classify, event_points
+
+
+CENTERS = np.array([[0.3, 0.0], [-0.2, 0.4]])
+RADII = np.array([0.2, 0.15])
+GOAL_POINT = np.array([0.5, 0.5])
+GOAL_TOL = 0.2
+
+
+def classify_reference(path, length):
+    # walk one rollout step by step
+    for t in range(length):
+        x, y = path[t, :2]
+        if any(np.hypot(x - cx, y - cy) < r for (cx, cy), r in zip(CENTERS, RADII)):
+            return COLLIDED, t
+        if np.hypot(x - GOAL_POINT[0], y - GOAL_POINT[1]) < GOAL_TOL:
+            return GOAL, t
+    return TIMEOUT, -1
+
+
+def test_classify_matches_a_step_by_step_walk():
+    rng = np.random.default_rng(0)
+    N, T = 400, 60
+    paths = np.cumsum(rng.normal(0.0, 0.05, (N, T, 3)), axis=1)
+    lengths = rng.integers(0, T + 1, N)
+    # garbage past each rollout's end must be ignored
+    paths[np.arange(T) >= lengths[:, None]] = CENTERS[0, 0]
+
+    ref = [classify_reference(p, L) for p, L in zip(paths, lengths)]
+    ref_labels = np.array([r[0] for r in ref])
+    ref_index = np.array([r[1] for r in ref])
+    assert {TIMEOUT, GOAL, COLLIDED} <= set(ref_labels.tolist())
+
+    scene = {"centers": CENTERS, "radii": RADII, "goal": GOAL_POINT, "goal_tol": GOAL_TOL}
+    labels, index = classify(paths, lengths, **scene)
+    np.testing.assert_array_equal(labels, ref_labels)
+    np.testing.assert_array_equal(index, ref_index)
+
+    ragged = RaggedTrajectories.from_padded(paths, lengths, dtype=np.float64)
+    labels, index = classify(ragged, **scene)
+    np.testing.assert_array_equal(labels, ref_labels)
+    np.testing.assert_array_equal(index, ref_index)
+
+    # crash markers sit on the first contact
+    pts = event_points(ragged, index)
+    hit = ref_index >= 0
+    np.testing.assert_allclose(pts[hit], paths[hit, ref_index[hit], :2])
+    assert np.isnan(pts[~hit]).all()
+
+
+def test_collision_and_goal_on_the_same_step_is_a_collision():
+    paths = np.array([[[0.0, -0.5, 0.0], [0.4, 0.1, 0.0]]])
+    labels, index = classify(paths, [2], CENTERS, RADII, goal=[0.4, 0.1], goal_tol=0.1)
+    assert labels[0] == COLLIDED and index[0] == 1
@@ -0,0 +1,52 @@
+import numpy as np
+
+from rollout_render import rdp_keep_mask, segment_distance
+
+
+def distance_to_chord(inner, a, b):
+    n = len(inner)
+    return segment_distance(inner, np.repeat(a[None], n, 0), np.repeat(b[None], n, 0))
+
+
+def rdp_reference(pts, tol):
+    # textbook recursive Ramer-Douglas-Peucker, one polyline at a time
+    keep = np.zeros(len(pts), dtype=bool)
+    keep[[0, -1]] = True
+
+    def refine(s, e):
+        if e - s < 2:
+            return
+        d = distance_to_chord(pts[s + 1:e], pts[s], pts[e])
+        m = s + 1 + int(np.argmax(d))
+        if d.max() > tol:
+            keep[m] = True
+            refine(s, m)
+            refine(m, e)
+
+    refine(0, len(pts) - 1)
+    return keep
+
+
+def test_rdp_matches_reference_and_tolerance():
+    rng = np.random.default_rng(0)
+    lengths = np.array([0, 1, 2, 3, 40, 200, 17])
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    pix = np.cumsum(rng.normal(0.0, 2.0, (offsets[-1], 2)), axis=0)
+
+    for tol in (0.0, 0.5, 3.0):
+        keep = rdp_keep_mask(pix, offsets, tol)
+        for a, b in zip(offsets[:-1], offsets[1:]):
+            if b == a:
+                continue
+            np.testing.assert_array_equal(keep[a:b], rdp_reference(pix[a:b], tol))
+
+            # every dropped vertex is within tol of the kept polyline around it
+            kept = a + np.flatnonzero(keep[a:b])
+            for s, e in zip(kept[:-1], kept[1:]):
+                assert (distance_to_chord(pix[s + 1:e], pix[s], pix[e]) <= tol).all()
+
+
+def test_rdp_zero_tolerance_keeps_every_corner():
+    pix = np.array([[0, 0], [1, 0], [2, 0], [2, 1], [2, 2]], dtype=float)
+    keep = rdp_keep_mask(pix, [0, 5], 0.0)
+    np.testing.assert_array_equal(keep, [True, False, True, False, True])
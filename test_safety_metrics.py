@@ -0,0 +1,70 @@
+import numpy as np
+
+from safety_metrics import SafetyMetrics, compute
+
+
+def random_clearance(rng, n, T, shift):
+    c = (rng.normal(shift, 0.3, (n, T)) + np.linspace(0.0, 1.0, T)).astype(np.float32)
+    ends = rng.integers(1, T + 1, n)
+    c[np.arange(T) >= ends[:, None]] = np.nan
+    return c
+
+
+def test_histogram_percentiles_match_numpy_to_half_a_bin():
+    rng = np.random.default_rng(0)
+    # later chunks fall outside the first chunk's range, so the bins double
+    chunks = [random_clearance(rng, 300, 40, shift) for shift in (0.0, 0.5, -2.0, 3.0)]
+    levels = (0, 5, 50, 95, 100)
+    m = SafetyMetrics(0.1, levels)
+    for c in chunks:
+        m.add(c, np.zeros(c.shape, dtype=np.int32))
+    m.finish()
+
+    all_c = np.concatenate(chunks)
+    assert m.n_rollouts == len(all_c)
+    np.testing.assert_array_equal(m.count, np.isfinite(all_c).sum(axis=0))
+    np.testing.assert_allclose(m.min, np.nanmin(all_c, axis=0))
+    for q in levels:
+        ref = np.nanpercentile(all_c, q, axis=0)
+        assert np.abs(m.percentiles[q] - ref).max() <= m.resolution / 2 + 1e-6
+
+
+def test_compute_matches_brute_force(tmp_path):
+    rng = np.random.default_rng(1)
+    N, T = 60, 25
+    paths = np.cumsum(rng.normal(0.0, 0.1, (N, T, 3)), axis=1)
+    lengths = rng.integers(1, T + 1, N)
+    centers = np.array([[0.2, 0.1], [-0.3, 0.0]])
+    radii = np.array([0.15, 0.2])
+    path = tmp_path / "rollouts.npz"
+    np.savez(path, paths=paths, lengths=lengths, obs_center=centers, obs_radius=radii, dt=0.05)
+
+    m = compute(str(path), max_chunk_bytes=1 << 14, exact=True)
+
+    d = np.linalg.norm(paths[:, :, None, :2] - centers, axis=-1) - radii
+    clearance = d.min(axis=-1)
+    clearance[np.arange(T) >= lengths[:, None]] = np.nan
+    np.testing.assert_allclose(m.clearance, clearance, rtol=1e-6, atol=1e-6)
+    for q in m.percentile_levels:
+        np.testing.assert_allclose(m.percentiles[q], np.nanpercentile(m.clearance, q, axis=0))
+
+    below = clearance < 0
+    first = np.where(below.any(axis=1), below.argmax(axis=1), -1)
+    np.testing.assert_array_equal(m.first_violation, first)
+    hit = first >= 0
+    np.testing.assert_array_equal(m.violation_obstacles, d.argmin(axis=-1)[hit, first[hit]])
+    np.testing.assert_allclose(m.violation_times, first[hit] * 0.05)
+
+
+def test_missing_dt_reports_steps(tmp_path):
+    paths = np.zeros((2, 5, 3))
+    paths[:, :, 0] = np.linspace(-1.0, 0.0, 5)
+    path = tmp_path / "rollouts.npz"
+    np.savez(path, paths=paths, lengths=[5, 3], obs_center=[[0.0, 0.0]], obs_radius=[0.3])
+
+    m = compute(str(path))
+    assert m.dt is None and m.time_label == "Step"
+    np.testing.assert_array_equal(m.time, np.arange(5))
+    np.testing.assert_array_equal(m.violation_times, [3])
+    assert "step 3" in m.summary()
+    assert compute(str(path), dt=0.1).time_label == "Time [s]"
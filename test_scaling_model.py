@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from scaling_model import features, fit, fit_grid
+
+
+HORIZONS = np.array([5, 10, 20, 40, 80, 160, 320], dtype=float)
+
+
+def test_power_fit_recovers_a_noiseless_power_law():
+    model = fit(HORIZONS, 3.0 * HORIZONS ** 1.5, kind="power", n_boot=50)
+    np.testing.assert_allclose(model.coef, [np.log10(3.0), 1.5], atol=1e-12)
+    np.testing.assert_allclose(model.predict([7.0, 100.0]), 3.0 * np.array([7.0, 100.0]) ** 1.5, rtol=1e-10)
+
+    # every resample of exact data refits the same curve
+    lo, hi = model.interval(100.0)
+    np.testing.assert_allclose([lo, hi], 3.0 * 100.0 ** 1.5, rtol=1e-8)
+
+    # analytic budget horizon, to the resolution of the query grid
+    budget = 3.0 * 200.0 ** 1.5
+    h = model.budget_horizon(budget)
+    assert h <= 200.0 and h > 200.0 * 0.999
+    assert model.budget_horizon(1e12) == float("inf")
+    assert np.isnan(model.budget_horizon(1.0))
+
+
+def test_bootstrap_refits_match_direct_least_squares():
+    rng = np.random.default_rng(3)
+    n_vars = np.repeat([100.0, 400.0, 1600.0], 5)
+    horizon = np.tile([10.0, 20.0, 40.0, 80.0, 160.0], 3)
+    ms = 0.01 * n_vars ** 1.1 * horizon ** 1.3 * np.exp(rng.normal(0.0, 0.05, len(n_vars)))
+    rows = np.stack([n_vars, horizon, ms], axis=1)
+    model = fit_grid(rows, n_boot=20, seed=7)
+
+    X = features("quad", np.log10(horizon), np.log10(n_vars))
+    np.testing.assert_allclose(model.coef, np.linalg.lstsq(X, np.log10(ms), rcond=None)[0], rtol=1e-8, atol=1e-10)
+    idx = np.random.default_rng(7).integers(0, len(ms), size=(20, len(ms)))
+    for i in (0, 9, 19):
+        ref = np.linalg.lstsq(X[idx[i]], np.log10(ms)[idx[i]], rcond=None)[0]
+        np.testing.assert_allclose(model.boot_coef[i], ref, rtol=1e-6, atol=1e-8)
+
+
+def test_interval_brackets_the_truth_on_noisy_data():
+    rng = np.random.default_rng(0)
+    h = np.repeat(HORIZONS, 4)
+    ms = 2.0 * h ** 1.2 * np.exp(rng.normal(0.0, 0.1, len(h)))
+    model = fit(h, ms, kind="power")
+    lo, hi = model.interval(HORIZONS)
+    truth = 2.0 * HORIZONS ** 1.2
+    assert (lo <= model.predict(HORIZONS)).all() and (model.predict(HORIZONS) <= hi).all()
+    assert (lo < truth).all() and (truth < hi).all()
+
+
+def test_point_fit_without_bootstrap():
+    model = fit(HORIZONS, 3.0 * HORIZONS ** 1.5, kind="power", n_boot=0)
+    np.testing.assert_allclose(model.coef, [np.log10(3.0), 1.5], atol=1e-12)
+    with pytest.raises(ValueError):
+        model.interval(100.0)
@@ -0,0 +1,93 @@
+import numpy as np
+
+from rollout_render import segment_distance
+from segment_index import SegmentIndex, load_or_build
+
+
+def brute_segments(paths, lengths):
+    # (rollout, step, a, b) of every segment; single points are a == b
+    out = []
+    for i, (p, L) in enumerate(zip(paths, lengths)):
+        if L == 1:
+            out.append((i, 0, p[0, :2], p[0, :2]))
+        for t in range(L - 1):
+            out.append((i, t, p[t, :2], p[t + 1, :2]))
+    return out
+
+
+def brute_within(segments, point, radius):
+    first = {}
+    for i, t, a, b in segments:
+        d = segment_distance(np.array([point], dtype=float), a[None].astype(float), b[None].astype(float))[0]
+        if d <= radius and i not in first:
+            first[i] = t
+    ids = np.array(sorted(first), dtype=np.int64)
+    return ids, np.array([first[i] for i in ids], dtype=np.int64)
+
+
+def brute_hits_box(a, b, lo, hi):
+    # an endpoint inside, or a proper crossing of one of the four edges
+    def inside(p):
+        return (p >= lo).all() and (p <= hi).all()
+
+    def cross(o, p, q):
+        return (p[0] - o[0]) * (q[1] - o[1]) - (p[1] - o[1]) * (q[0] - o[0])
+
+    if inside(a) or inside(b):
+        return True
+    corners = [lo, (hi[0], lo[1]), hi, (lo[0], hi[1])]
+    for c, d in zip(corners, corners[1:] + corners[:1]):
+        if cross(a, b, c) * cross(a, b, d) < 0 and cross(c, d, a) * cross(c, d, b) < 0:
+            return True
+    return False
+
+
+def make_rollouts(tmp_path):
+    rng = np.random.default_rng(0)
+    N, T = 80, 40
+    paths = np.cumsum(rng.normal(0.0, 0.05, (N, T, 3)), axis=1).astype(np.float32)
+    lengths = rng.integers(0, T + 1, N)
+    lengths[:3] = [1, 0, 1]
+    path = tmp_path / "rollouts.npz"
+    np.savez(path, paths=paths, lengths=lengths)
+    return str(path), paths, lengths
+
+
+def test_queries_match_brute_force(tmp_path):
+    path, paths, lengths = make_rollouts(tmp_path)
+    index = load_or_build(path)
+    segments = brute_segments(paths, lengths)
+    assert len(index.a) == len(segments)
+
+    rng = np.random.default_rng(1)
+    for point, radius in [(paths[0, 0, :2], 1e-6)] + [(rng.uniform(-0.6, 0.6, 2), r) for r in (0.02, 0.1, 0.4)]:
+        ids, steps = index.within(point, radius, return_steps=True)
+        ref_ids, ref_steps = brute_within(segments, point, radius)
+        np.testing.assert_array_equal(ids, ref_ids)
+        np.testing.assert_array_equal(steps, ref_steps)
+
+    for point in [paths[2, 0, :2], (0.3, -0.2), (5.0, 5.0)]:
+        _, _, d = index.nearest(point)
+        ref = min(segment_distance(np.array([point], dtype=float), a[None].astype(float), b[None].astype(float))[0]
+                  for _, _, a, b in segments)
+        assert np.isclose(d, ref)
+
+    lo, hi = np.array([-0.1, -0.1]), np.array([0.2, 0.15])
+    contained = [i for i in range(len(paths)) if lengths[i] > 0
+                 and ((paths[i, :lengths[i], :2] >= lo) & (paths[i, :lengths[i], :2] <= hi)).all()]
+    np.testing.assert_array_equal(index.in_box(lo, hi, "contains"), contained)
+    first = {}
+    for i, t, a, b in segments:
+        if i not in first and brute_hits_box(a.astype(float), b.astype(float), lo, hi):
+            first[i] = t
+    ids, steps = index.in_box(lo, hi, return_steps=True)
+    np.testing.assert_array_equal(ids, sorted(first))
+    np.testing.assert_array_equal(steps, [first[i] for i in sorted(first)])
+
+
+def test_empty_source(tmp_path):
+    path = tmp_path / "empty.npz"
+    np.savez(path, paths=np.zeros((0, 5, 3)), lengths=np.zeros(0, dtype=np.int64))
+    index = SegmentIndex.build(str(path))
+    assert len(index.within((0.0, 0.0), 1.0)) == 0
+    assert index.nearest((0.0, 0.0)) == (-1, -1, float("inf"))
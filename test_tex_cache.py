@@ -0,0 +1,19 @@
+import os
+
+from matplotlib.texmanager import TexManager
+
+import tex_cache
+
+
+def test_configure_redirects_tex_output(tmp_path):
+    tex_cache.configure(str(tmp_path / "tex"))
+    base = TexManager.get_basefile("$x$", 12)
+    assert os.path.commonpath([base, str(tmp_path / "tex")]) == str(tmp_path / "tex")
+    assert tex_cache.stats()["redirected"]
+
+
+def test_installed_matplotlib_is_wrapped(tmp_path):
+    # the private TexManager layout configure() wraps; if this fails on a new
+    # matplotlib the cache still works, but hits and calls are not counted
+    tex_cache.configure(str(tmp_path / "tex"))
+    assert tex_cache.stats()["counted"]
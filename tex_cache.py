@@ -0,0 +1,212 @@
+import os
+import time
+import atexit
+
+try:
+    import fcntl
+except ImportError:  # no advisory locks (e.g. Windows): eviction is skipped
+    fcntl = None
+
+# ============================
+# Shared, size-bounded usetex render cache
+# ============================
+# matplotlib's TexManager already names every .tex/.dvi/.png it produces by a
+# hash of the full LaTeX source (string, font preamble, font size) plus DPI,
+# and writes them atomically (temp dir + rename), so it is safe for several
+# processes to fill the same directory. By default that directory is
+# per-user and grows without bound. This module:
+#
+#   * points TexManager at one project-wide cache shared by all scripts and
+#     build workers,
+#   * touches every entry on use, so file mtimes give LRU order,
+#   * evicts least-recently-used entries above MAX_BYTES at exit, and
+#   * counts latex/dvipng invocations so a warm build can be checked for
+#     zero LaTeX calls.
+#
+# Processes that use the cache hold a shared flock on the cache lock file;
+# eviction needs the exclusive lock and is skipped while anyone else is
+# rendering, so entries are never removed under a running build.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+TEX_CACHE_DIR = os.environ.get("TEX_CACHE_DIR", os.path.join(SCRIPT_DIR, ".tex_cache"))
+MAX_BYTES = 256 << 20
+LOCK_NAME = ".lock"
+# configure() wraps these private TexManager classmethods (names -> leading
+# parameters) only when they have this shape (test_tex_cache.py checks it on
+# the installed matplotlib); otherwise only the cache directory is set (no
+# LRU touches, no call counting).
+PATCHED = {
+    "_run_checked_subprocess": ("cls", "command", "tex"),
+    "make_dvi": ("cls", "tex", "fontsize"),
+    "make_png": ("cls", "tex", "fontsize", "dpi"),
+}
+MIN_MATPLOTLIB = (3, 5)
+
+_state = {"dir": None, "max_bytes": MAX_BYTES, "lock": None, "calls": {}, "hits": 0, "seconds": 0.0,
+          "patched": False, "redirected": False}
+
+
+def _touch(path):
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def _patchable(TexManager):
+    import inspect
+    import matplotlib
+
+    version = tuple(int(v) for v in matplotlib.__version__.split(".")[:2] if v.isdigit())
+    if version < MIN_MATPLOTLIB:
+        return False
+    for name, params in PATCHED.items():
+        attr = inspect.getattr_static(TexManager, name, None)
+        if not isinstance(attr, classmethod):
+            return False
+        try:
+            names = tuple(inspect.signature(attr.__func__).parameters)
+        except (TypeError, ValueError):
+            return False
+        if names[:len(params)] != params:
+            return False
+    return True
+
+
+def _redirect(TexManager, cache_dir):
+    # The directory attribute differs across matplotlib versions: a plain
+    # class attribute _texcache (str) or _cache_dir (Path), with `texcache`
+    # a deprecated property over it on newer releases, so assigning the
+    # property would not move anything. The result is checked through
+    # get_basefile(), which is what TeX output is named after.
+    for attr in ("_texcache", "_cache_dir"):
+        if attr in vars(TexManager):
+            setattr(TexManager, attr, type(vars(TexManager)[attr])(cache_dir))
+            break
+    else:
+        TexManager.texcache = cache_dir
+    base = os.path.abspath(TexManager.get_basefile("", 10))
+    _state["redirected"] = os.path.commonpath([base, os.path.abspath(cache_dir)]) == os.path.abspath(cache_dir)
+    if not _state["redirected"]:
+        print(f"[TexCache] WARNING: could not redirect the matplotlib TeX cache to {cache_dir} "
+              f"(TeX output still goes to {os.path.dirname(base)})")
+
+
+def configure(cache_dir=TEX_CACHE_DIR, max_bytes=MAX_BYTES):
+    from matplotlib.texmanager import TexManager
+
+    os.makedirs(cache_dir, exist_ok=True)
+    _state["max_bytes"] = max_bytes
+    if _state["dir"] == cache_dir:
+        return
+    first = _state["dir"] is None
+    _state["dir"] = cache_dir
+
+    _redirect(TexManager, cache_dir)
+
+    if fcntl is not None:
+        if _state["lock"] is not None:
+            _state["lock"].close()
+        _state["lock"] = open(os.path.join(cache_dir, LOCK_NAME), "a+")
+        fcntl.flock(_state["lock"], fcntl.LOCK_SH)
+
+    if not first:
+        return
+    atexit.register(evict)
+    if not _patchable(TexManager):
+        import matplotlib
+
+        print(f"[TexCache] matplotlib {matplotlib.__version__}: TexManager internals differ, "
+              f"using the shared cache directory without LRU touches or call counts")
+        return
+
+    run = TexManager._run_checked_subprocess.__func__
+    make_dvi = TexManager.make_dvi.__func__
+    make_png = TexManager.make_png.__func__
+
+    def counted_run(cls, command, tex, **kwargs):
+        name = os.path.basename(command[0])
+        _state["calls"][name] = _state["calls"].get(name, 0) + 1
+        t0 = time.perf_counter()
+        try:
+            return run(cls, command, tex, **kwargs)
+        finally:
+            _state["seconds"] += time.perf_counter() - t0
+
+    def touched(make):
+        def wrapper(cls, *args, **kwargs):
+            calls = sum(_state["calls"].values())
+            path = make(cls, *args, **kwargs)
+            if sum(_state["calls"].values()) == calls:
+                _state["hits"] += 1
+            _touch(path)
+            return path
+        return wrapper
+
+    TexManager._run_checked_subprocess = classmethod(counted_run)
+    TexManager.make_dvi = classmethod(touched(make_dvi))
+    TexManager.make_png = classmethod(touched(make_png))
+    _state["patched"] = True
+
+
+def evict(cache_dir=None, max_bytes=None):
+    # Deletes least-recently-used files until the cache fits in max_bytes.
+    # Returns the number of bytes freed (0 if another process is rendering).
+    cache_dir = cache_dir or _state["dir"]
+    max_bytes = _state["max_bytes"] if max_bytes is None else max_bytes
+    if cache_dir is None or not os.path.isdir(cache_dir):
+        return 0
+
+    lock = _state["lock"] if cache_dir == _state["dir"] else None
+    own = lock is None
+    if fcntl is None:
+        return 0
+    if own:
+        lock = open(os.path.join(cache_dir, LOCK_NAME), "a+")
+    try:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return 0
+
+        entries = []
+        for root, _, names in os.walk(cache_dir):
+            for name in names:
+                if name == LOCK_NAME:
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(e[1] for e in entries)
+        freed = 0
+        for _, size, path in sorted(entries):
+            if total - freed <= max_bytes:
+                break
+            try:
+                os.remove(path)
+                freed += size
+            except FileNotFoundError:
+                pass
+        return freed
+    finally:
+        if own:
+            lock.close()
+        else:
+            fcntl.flock(lock, fcntl.LOCK_SH)
+
+
+def summary():
+    if _state["dir"] is not None and not _state["patched"]:
+        return f"tex subprocess calls: not counted ({_state['dir']})"
+    calls = ", ".join(f"{k}={v}" for k, v in sorted(_state["calls"].items())) or "none"
+    return f"tex subprocess calls: {calls}; cache hits: {_state['hits']} ({_state['dir']})"
+
+
+def stats():
+    # -> {"calls": {tool: n}, "hits", "seconds"} spent in latex / dvipng
+    # ("counted": False when the TexManager could not be wrapped)
+    return {"calls": dict(_state["calls"]), "hits": _state["hits"], "seconds": _state["seconds"],
+            "counted": _state["patched"], "redirected": _state["redirected"]}
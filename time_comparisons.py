@@ -1,11 +1,13 @@
+import os
+import sys
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.font_manager as fm
+
+import instrument
 
 # -----------------------------
-# Global matplotlib settings
+# Global matplotlib settings (applied in main, pyplot is imported lazily)
 # -----------------------------
-plt.rcParams.update({
+RC_PARAMS = {
     "font.size": 25,
     "font.family": "serif",
     "font.serif": ["cmr10"],
@@ -13,7 +15,23 @@ plt.rcParams.update({
     "text.usetex": False,
     "pdf.fonttype": 42,   # embed fonts in PDF
     "ps.fonttype": 42,
-})
+}
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PDF_OUT = "solver_scaling_log.pdf"
+# Written by solver_bench.py and plotted only with `--measured`; by default
+# the hard-coded paper table below is drawn
+TIMINGS_PATH = os.path.join(SCRIPT_DIR, "solver_timings.json")
+# decision-variable count whose row is plotted (None: largest measured)
+TIMINGS_N_VARS = None
+# Written by bench_history.py; `--history` (with `--measured`) draws the
+# 10-90th percentile band of every stored run behind each solver's line
+HISTORY_PATH = os.path.join(SCRIPT_DIR, "solver_history.sqlite")
+# `--fit` overlays scaling_model fits of this kind (dashed) with their
+# bootstrap band, extrapolated (dotted) EXTRAPOLATE_FACTOR x past the last
+# measured horizon of each solver
+FIT_KIND = "quad"
+EXTRAPOLATE_FACTOR = 3.0
 
 # -----------------------------
 # Data
@@ -30,73 +48,164 @@ data = {
     "cparcon-ADMM":           [1107, 3530, 14189, 61521, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan],
 }
 
-# -----------------------------
-# Figure size (in inches)
-# -----------------------------
-# Recommended for full-width / two-column figure
-fig_width = 18   # inches
-fig_height = 10  # inches
 
-fig, ax = plt.subplots(figsize=(fig_width, fig_height))
+def load_data(timings_path=None, n_vars=TIMINGS_N_VARS):
+    # -> (horizon, {solver: solve times in ms}, measured?); timings_path None
+    # is the paper table, otherwise a solver_bench.py report that must exist
+    if timings_path is None:
+        return horizon, data, False
+    if not os.path.exists(timings_path):
+        raise FileNotFoundError(f"{timings_path} not found; run solver_bench.py first")
+    import solver_bench
 
-# -----------------------------
-# Plot
-# -----------------------------
-for label, values in data.items():
-    y = np.array(values, dtype=float)
-    mask = ~np.isnan(y)
-    ax.plot(
-        horizon[mask],
-        y[mask],
-        marker="o",
-        linewidth=4,
-        markersize=8,
-        label=label,
+    h, d = solver_bench.horizon_table(solver_bench.load_results(timings_path), n_vars)
+    return h, d, True
+
+
+def load_bands(history_path=HISTORY_PATH, n_vars=TIMINGS_N_VARS):
+    if not (history_path and os.path.exists(history_path)):
+        print(f"[History] {history_path} not found, no bands drawn")
+        return {}
+    import bench_history
+
+    db = bench_history.connect(history_path)
+    try:
+        return bench_history.history_bands(db, n_vars)
+    finally:
+        db.close()
+
+
+def draw_fits(ax, models, colors, extrapolate_factor=EXTRAPOLATE_FACTOR):
+    # keep the data's y-range; steep extrapolations are clipped, not rescaled
+    ylim = ax.get_ylim()
+    for label, model in models.items():
+        lo, hi = np.log10(model.horizon_range)
+        fitted = np.logspace(lo, hi, 100)
+        extrapolated = np.logspace(hi, hi + np.log10(extrapolate_factor), 50)
+        h = np.concatenate([fitted, extrapolated[1:]])
+        band_lo, band_hi = model.interval(h)
+        ax.plot(fitted, model.predict(fitted), linestyle="--", linewidth=2, color=colors[label])
+        ax.plot(extrapolated, model.predict(extrapolated), linestyle=":", linewidth=2, color=colors[label])
+        ax.fill_between(h, band_lo, band_hi, color=colors[label], alpha=0.1, linewidth=0)
+    ax.set_ylim(ylim)
+
+
+def main(show=True, timings_path=None, history_path=None, fit_kind=None):
+    with instrument.phase("load"):
+        horizon, data, measured = load_data(timings_path)
+        print(f"[Data] {'measured: ' + timings_path if measured else 'hard-coded paper table'}")
+        if history_path and not measured:
+            # the history holds solver_bench.py's solvers, none of which is
+            # a row of the paper table
+            raise ValueError("history bands need measured timings (--measured); the paper table's "
+                             "solvers are not in the solver_bench.py history")
+        bands = load_bands(history_path) if history_path else {}
+        missing = sorted(set(bands) - set(data))
+        if missing:
+            print(f"[History] no measured line for {', '.join(missing)}; their bands are not drawn")
+    models = {}
+    if fit_kind:
+        import scaling_model
+
+        with instrument.phase("fit"):
+            models = scaling_model.fit_horizon_table(horizon, data, fit_kind)
+
+    with instrument.phase("setup"):
+        import matplotlib.pyplot as plt
+
+        plt.rcParams.update(RC_PARAMS)
+
+    # -----------------------------
+    # Figure size (in inches)
+    # -----------------------------
+    # Recommended for full-width / two-column figure
+    fig_width = 18   # inches
+    fig_height = 10  # inches
+
+    fig, ax = plt.subplots(figsize=(fig_width, fig_height))
+
+    # -----------------------------
+    # Plot
+    # -----------------------------
+    colors = {}
+    with instrument.phase("artists"):
+        for label, values in data.items():
+            y = np.array(values, dtype=float)
+            mask = ~np.isnan(y)
+            (line,) = ax.plot(
+                horizon[mask],
+                y[mask],
+                marker="o",
+                linewidth=4,
+                markersize=8,
+                label=label,
+            )
+            colors[label] = line.get_color()
+            if label in bands:
+                h, (lo, _, hi) = bands[label]
+                ax.fill_between(h, lo, hi, color=line.get_color(), alpha=0.2, linewidth=0, zorder=line.get_zorder() - 0.1)
+
+        ax.set_xscale("log")
+        ax.set_yscale("log")
+        if models:
+            draw_fits(ax, models, colors)
+    ax.set_xlabel("Horizon Length", fontsize=30)
+    ax.set_ylabel("Solve Time (ms)", fontsize=30)
+    # ax.set_title("Solver Scaling vs Horizon Length (Log Scale)")
+    ax.grid(True, which="both", linestyle="--", linewidth=0.5, alpha=0.5)
+
+    # Extend x-range to create space for legend INSIDE axes
+    ax.set_xlim(horizon.min(), horizon.max() * 1.6 * (EXTRAPOLATE_FACTOR if models else 1))
+
+    ax.legend(
+        loc="upper center",
+        bbox_to_anchor=(0.58, 1.02),  # centered below axes
+        ncol=1,                       # adjust columns as needed
+        frameon=False,
+        fontsize=30,
+        columnspacing=1.,
+        handlelength=1.5,
+        labelspacing=0.2,
     )
 
-ax.set_xscale("log")
-ax.set_yscale("log")
-ax.set_xlabel("Horizon Length", fontsize=30)
-ax.set_ylabel("Solve Time (ms)", fontsize=30)
-# ax.set_title("Solver Scaling vs Horizon Length (Log Scale)")
-ax.grid(True, which="both", linestyle="--", linewidth=0.5, alpha=0.5)
-
-# Extend x-range to create space for legend INSIDE axes
-ax.set_xlim(horizon.min(), horizon.max() * 1.6)
-
-ax.legend(
-    loc="upper center",
-    bbox_to_anchor=(0.58, 1.02),  # centered below axes
-    ncol=1,                       # adjust columns as needed
-    frameon=False,
-    fontsize=30,
-    columnspacing=1.,
-    handlelength=1.5,
-    labelspacing=0.2,
-)
-
-ax.plot(
-    1000,
-    60.9,
-    marker="x",
-    markersize=18,
-    markeredgewidth=4,
-    linestyle="None",
-    color="black",   # remove if you want default color cycle
-    zorder=10,
-)
-
-# Leave space at the bottom for the legend
-fig.tight_layout(rect=[0, 0.12, 1, 1])
-
-
-
-# Reserve space on the right for the legend
-fig.tight_layout(rect=[0, 0, 0.72, 1])
+    if not measured:
+        ax.plot(
+            1000,
+            60.9,
+            marker="x",
+            markersize=18,
+            markeredgewidth=4,
+            linestyle="None",
+            color="black",   # remove if you want default color cycle
+            zorder=10,
+        )
 
-# -----------------------------
-# Save / Show
-# -----------------------------
-fig.savefig("solver_scaling_log.pdf", bbox_inches="tight")
-plt.show()
-print('done')
+    with instrument.phase("layout"):
+        # Leave space at the bottom for the legend
+        fig.tight_layout(rect=[0, 0.12, 1, 1])
+
+
+
+        # Reserve space on the right for the legend
+        fig.tight_layout(rect=[0, 0, 0.72, 1])
+
+    # -----------------------------
+    # Save / Show
+    # -----------------------------
+    instrument.record_figure(fig, PDF_OUT)
+    with instrument.phase("savefig"):
+        fig.savefig(PDF_OUT, bbox_inches="tight")
+    if show:
+        plt.show()
+    print('done')
+
+
+if __name__ == "__main__":
+    if "--history" in sys.argv[1:] and "--measured" not in sys.argv[1:]:
+        sys.exit("--history needs --measured: the history bands are keyed by solver_bench.py's solvers, "
+                 "which do not appear in the paper table")
+    main(
+        timings_path=TIMINGS_PATH if "--measured" in sys.argv[1:] else None,
+        history_path=HISTORY_PATH if "--history" in sys.argv[1:] else None,
+        fit_kind=FIT_KIND if "--fit" in sys.argv[1:] else None,
+    )